@@ -0,0 +1,58 @@
+"""initial schema
+
+Исходная схема бота: 'users' и 'users_history' до перевода
+'telegram_id' и 'chat_id' в BIGINT. Бд, созданную раньше
+без миграций, достаточно пометить этой ревизией: 'alembic stamp 0001'.
+Таблицы 'media_files' и 'fsm_storage' создаёт ревизия 0007.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('telegram_id', sa.String(length=50), nullable=False),
+        sa.Column('act_code', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index(
+        'ix_users_telegram_id', 'users', ['telegram_id'], unique=True
+    )
+
+    op.create_table(
+        'users_history',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+        sa.Column('message_id', sa.Integer(), nullable=True),
+        sa.Column('message_content', sa.Text(), nullable=True),
+        sa.Column('state', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_history_id', 'users_history', ['id'])
+    op.create_index('ix_users_history_user_id', 'users_history', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('users_history')
+    op.drop_table('users')
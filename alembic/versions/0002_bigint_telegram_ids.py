@@ -0,0 +1,60 @@
+"""bigint telegram_id and chat_id
+
+'users.telegram_id' переводится из VARCHAR в BIGINT, чтобы поиск
+пользователя был сравнением целых по индексу, а 'users_history.chat_id'
+— из INTEGER в BIGINT: id групповых чатов не помещаются в 32 бита.
+В PostgreSQL индекс 'ix_users_telegram_id' перестраивается
+вместе с колонкой.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column(
+            'telegram_id',
+            existing_type=sa.String(length=50),
+            type_=sa.BigInteger(),
+            existing_nullable=False,
+            postgresql_using='telegram_id::bigint',
+        )
+    with op.batch_alter_table('users_history') as batch_op:
+        batch_op.alter_column(
+            'chat_id',
+            existing_type=sa.Integer(),
+            type_=sa.BigInteger(),
+            existing_nullable=True,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users_history') as batch_op:
+        batch_op.alter_column(
+            'chat_id',
+            existing_type=sa.BigInteger(),
+            type_=sa.Integer(),
+            existing_nullable=True,
+        )
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column(
+            'telegram_id',
+            existing_type=sa.BigInteger(),
+            type_=sa.String(length=50),
+            existing_nullable=False,
+            postgresql_using='telegram_id::varchar(50)',
+        )
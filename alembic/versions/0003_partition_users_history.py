@@ -0,0 +1,153 @@
+"""partition users_history by month
+
+Только PostgreSQL: 'users_history' пересоздаётся как таблица,
+секционированная по диапазону 'created_at', с первичным ключом
+(id, created_at), помесячными секциями 'users_history_pYYYYMM'
+и секцией по умолчанию для строк вне созданных секций.
+Существующие строки переносятся, счётчик 'id' сохраняется.
+Секции создаются на HISTORY_PARTITIONS_AHEAD месяцев вперёд,
+как и в 'ensure_partitions' при старте бота.
+Для других бд ревизия ничего не меняет.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:00:00
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+import src.settings as setting
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = 'id, user_id, chat_id, message_id, message_content, state, created_at'
+
+
+def month_start(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(value: datetime.date) -> datetime.date:
+    if value.month == 12:
+        return datetime.date(value.year + 1, 1, 1)
+    return datetime.date(value.year, value.month + 1, 1)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE users_history RENAME TO users_history_old')
+    op.execute(
+        'ALTER TABLE users_history_old '
+        'RENAME CONSTRAINT users_history_pkey TO users_history_old_pkey'
+    )
+    op.execute(
+        'ALTER INDEX ix_users_history_id RENAME TO ix_users_history_old_id'
+    )
+    op.execute(
+        'ALTER INDEX ix_users_history_user_id '
+        'RENAME TO ix_users_history_old_user_id'
+    )
+    op.execute('ALTER SEQUENCE users_history_id_seq OWNED BY NONE')
+    op.execute("""
+        CREATE TABLE users_history (
+            id INTEGER NOT NULL DEFAULT nextval('users_history_id_seq'),
+            user_id INTEGER REFERENCES users (id) ON DELETE CASCADE,
+            chat_id BIGINT,
+            message_id INTEGER,
+            message_content TEXT,
+            state VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute(
+        'ALTER SEQUENCE users_history_id_seq OWNED BY users_history.id'
+    )
+    op.execute('CREATE INDEX ix_users_history_id ON users_history (id)')
+    op.execute(
+        'CREATE INDEX ix_users_history_user_id ON users_history (user_id)'
+    )
+    op.execute(
+        'CREATE TABLE users_history_default '
+        'PARTITION OF users_history DEFAULT'
+    )
+
+    oldest = None
+    if not context.is_offline_mode():
+        oldest = op.get_bind().execute(
+            sa.text('SELECT min(created_at) FROM users_history_old')
+        ).scalar()
+    today = datetime.date.today()
+    month = month_start(oldest.date() if oldest else today)
+    last = month_start(today)
+    for _ in range(setting.HISTORY_PARTITIONS_AHEAD):
+        last = next_month(last)
+    while month <= last:
+        op.execute(
+            f'CREATE TABLE users_history_p{month:%Y%m} '
+            f'PARTITION OF users_history '
+            f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+        )
+        month = next_month(month)
+
+    op.execute(
+        f'INSERT INTO users_history ({COLUMNS}) '
+        f'SELECT id, user_id, chat_id, message_id, message_content, state, '
+        f'coalesce(created_at, now()) FROM users_history_old'
+    )
+    op.execute('DROP TABLE users_history_old')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE users_history RENAME TO users_history_partitioned')
+    op.execute(
+        'ALTER TABLE users_history_partitioned '
+        'RENAME CONSTRAINT users_history_pkey TO users_history_partitioned_pkey'
+    )
+    op.execute(
+        'ALTER INDEX ix_users_history_id '
+        'RENAME TO ix_users_history_partitioned_id'
+    )
+    op.execute(
+        'ALTER INDEX ix_users_history_user_id '
+        'RENAME TO ix_users_history_partitioned_user_id'
+    )
+    op.execute('ALTER SEQUENCE users_history_id_seq OWNED BY NONE')
+    op.execute("""
+        CREATE TABLE users_history (
+            id INTEGER NOT NULL DEFAULT nextval('users_history_id_seq'),
+            user_id INTEGER REFERENCES users (id) ON DELETE CASCADE,
+            chat_id BIGINT,
+            message_id INTEGER,
+            message_content TEXT,
+            state VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute(
+        'ALTER SEQUENCE users_history_id_seq OWNED BY users_history.id'
+    )
+    op.execute('CREATE INDEX ix_users_history_id ON users_history (id)')
+    op.execute(
+        'CREATE INDEX ix_users_history_user_id ON users_history (user_id)'
+    )
+    op.execute(
+        f'INSERT INTO users_history ({COLUMNS}) '
+        f'SELECT {COLUMNS} FROM users_history_partitioned'
+    )
+    op.execute('DROP TABLE users_history_partitioned CASCADE')
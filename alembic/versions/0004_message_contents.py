@@ -0,0 +1,75 @@
+"""message contents dictionary
+
+Словарь текстов 'message_contents', ссылка 'users_history.content_id'
+и представление 'users_history_full', которое возвращает историю
+в прежнем виде: текст из строки истории или из словаря.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'message_contents',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_message_contents_id', 'message_contents', ['id'])
+    op.create_index(
+        'ix_message_contents_content_hash',
+        'message_contents',
+        ['content_hash'],
+        unique=True
+    )
+    with op.batch_alter_table('users_history') as batch_op:
+        batch_op.add_column(
+            sa.Column('content_id', sa.Integer(), nullable=True)
+        )
+        batch_op.create_foreign_key(
+            'fk_users_history_content_id',
+            'message_contents',
+            ['content_id'],
+            ['id'],
+        )
+    op.execute("""
+        CREATE VIEW users_history_full AS
+        SELECT h.id, h.user_id, h.chat_id, h.message_id,
+               coalesce(h.message_content, c.content) AS message_content,
+               h.state, h.created_at
+        FROM users_history h
+        LEFT JOIN message_contents c ON c.id = h.content_id
+    """)
+
+
+def downgrade() -> None:
+    op.execute('DROP VIEW users_history_full')
+    op.execute("""
+        UPDATE users_history SET message_content = (
+            SELECT c.content FROM message_contents c
+            WHERE c.id = users_history.content_id
+        )
+        WHERE content_id IS NOT NULL
+    """)
+    with op.batch_alter_table('users_history') as batch_op:
+        batch_op.drop_constraint(
+            'fk_users_history_content_id',
+            type_='foreignkey'
+        )
+        batch_op.drop_column('content_id')
+    op.drop_table('message_contents')
@@ -0,0 +1,53 @@
+"""act counters
+
+Счётчики воронки 'act_counters'. Начальные значения считаются
+по 'users' и записываются в строку 'shard = 0'; распределение
+по строкам выполняет сверка при старте бота.
+'reached' изначально равен числу пользователей на 'act_code':
+прошлые переходы по 'users' восстановить нельзя.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'act_counters',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('act_code', sa.String(), nullable=False),
+        sa.Column('shard', sa.Integer(), nullable=False),
+        sa.Column('players', sa.Integer(), nullable=False),
+        sa.Column('reached', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'act_code',
+            'shard',
+            name='uq_act_counters_code_shard'
+        ),
+    )
+    op.create_index('ix_act_counters_id', 'act_counters', ['id'])
+    op.execute("""
+        INSERT INTO act_counters (act_code, shard, players, reached, updated_at)
+        SELECT act_code, 0, count(*), count(*), CURRENT_TIMESTAMP
+        FROM users
+        GROUP BY act_code
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('act_counters')
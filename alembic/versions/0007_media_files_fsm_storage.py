@@ -0,0 +1,73 @@
+"""media files and fsm storage
+
+Таблицы 'media_files' (file_id загруженных медиафайлов) и 'fsm_storage'
+(состояние сцен при FSM_STORAGE=sql). Раньше они создавались ревизией 0001,
+которой помечаются бд, созданные без миграций, поэтому в таких бд
+их не было. Уже существующие таблицы пропускаются.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not has_table('media_files'):
+        op.create_table(
+            'media_files',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('file_name', sa.String(), nullable=False),
+            sa.Column('file_id', sa.String(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_media_files_id', 'media_files', ['id'])
+        op.create_index(
+            'ix_media_files_content_hash',
+            'media_files',
+            ['content_hash'],
+            unique=True
+        )
+
+    if not has_table('fsm_storage'):
+        op.create_table(
+            'fsm_storage',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('key', sa.String(length=255), nullable=False),
+            sa.Column('state', sa.String(), nullable=True),
+            sa.Column('data', sa.Text(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_fsm_storage_id', 'fsm_storage', ['id'])
+        op.create_index(
+            'ix_fsm_storage_key',
+            'fsm_storage',
+            ['key'],
+            unique=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('fsm_storage')
+    op.drop_table('media_files')
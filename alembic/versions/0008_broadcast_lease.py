@@ -0,0 +1,49 @@
+"""broadcast lease
+
+Аренда рассылки: 'owner' — процесс, отправляющий рассылку,
+'lease_until' — до какого времени аренда действует. Частичный
+уникальный индекс допускает только одну рассылку в статусе 'running'.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 17:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RUNNING = sa.text("status = 'running'")
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('broadcasts') as batch_op:
+        batch_op.add_column(
+            sa.Column('owner', sa.String(length=64), nullable=True)
+        )
+        batch_op.add_column(
+            sa.Column('lease_until', sa.DateTime(), nullable=True)
+        )
+    op.create_index(
+        'ux_broadcasts_running',
+        'broadcasts',
+        ['status'],
+        unique=True,
+        postgresql_where=RUNNING,
+        sqlite_where=RUNNING,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ux_broadcasts_running', table_name='broadcasts')
+    with op.batch_alter_table('broadcasts') as batch_op:
+        batch_op.drop_column('lease_until')
+        batch_op.drop_column('owner')
@@ -0,0 +1,174 @@
+"""
+Поиск по строковому и по нативному типу параметра: план запроса и время.
+
+Сравниваются:
+- 'telegram_id' в VARCHAR со строковым параметром (схема до ревизии 0002)
+  и в BIGINT с целым параметром;
+- 'users_history.user_id', сравниваемый как текст (колонка приводится
+  к строке, индекс не используется), и сравнение целых по индексу.
+
+Таблицы бенчмарка создаются рядом с таблицами приложения
+с префиксом 'bench_binding_' и удаляются после замера.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_binding --rows 1000000
+    python -m benchmarks.bench_binding --db-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    cast,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+SEED_CHUNK: int = 50000
+HISTORY_PER_USER: int = 10
+
+metadata = MetaData()
+users_text = Table(
+    'bench_binding_users_text',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('telegram_id', String(50), unique=True, index=True),
+)
+users_bigint = Table(
+    'bench_binding_users_bigint',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('telegram_id', BigInteger, unique=True, index=True),
+)
+history = Table(
+    'bench_binding_history',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, index=True),
+)
+
+CASES = {
+    'telegram_id varchar = str': lambda n: (
+        select(users_text.c.id)
+        .where(users_text.c.telegram_id == str(n))
+    ),
+    'telegram_id bigint = int': lambda n: (
+        select(users_bigint.c.id)
+        .where(users_bigint.c.telegram_id == n)
+    ),
+    'user_id::text = str': lambda n: (
+        select(history.c.id)
+        .where(cast(history.c.user_id, String) == str(n))
+    ),
+    'user_id = int': lambda n: (
+        select(history.c.id)
+        .where(history.c.user_id == n)
+    ),
+}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--calls', type=int, default=300)
+    parser.add_argument(
+        '--db-url',
+        default=None,
+        help='по умолчанию — временная база SQLite'
+    )
+    return parser.parse_args(argv)
+
+
+async def seed(connection: AsyncConnection, rows: int) -> None:
+    await connection.run_sync(metadata.drop_all)
+    await connection.run_sync(metadata.create_all)
+    users = max(1, rows // HISTORY_PER_USER)
+    for start in range(0, rows, SEED_CHUNK):
+        numbers = range(start + 1, min(rows, start + SEED_CHUNK) + 1)
+        await connection.execute(insert(users_text), [
+            {'id': n, 'telegram_id': str(n)} for n in numbers
+        ])
+        await connection.execute(insert(users_bigint), [
+            {'id': n, 'telegram_id': n} for n in numbers
+        ])
+        await connection.execute(insert(history), [
+            {'id': n, 'user_id': n % users + 1} for n in numbers
+        ])
+    if connection.dialect.name == 'postgresql':
+        await connection.execute(text(
+            'ANALYZE bench_binding_users_text, '
+            'bench_binding_users_bigint, bench_binding_history'
+        ))
+
+
+async def explain(connection: AsyncConnection, stmt) -> str:
+    sql = str(stmt.compile(
+        dialect=connection.dialect,
+        compile_kwargs={'literal_binds': True}
+    ))
+    if connection.dialect.name == 'postgresql':
+        prefix, column = 'EXPLAIN (ANALYZE, BUFFERS) ', 0
+    else:
+        prefix, column = 'EXPLAIN QUERY PLAN ', -1
+    result = await connection.execute(text(prefix + sql))
+    return '\n'.join(f'    {row[column]}' for row in result)
+
+
+async def run(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.db_url)
+    rnd = random.Random(1)
+    users = max(1, args.rows // HISTORY_PER_USER)
+    try:
+        async with engine.begin() as connection:
+            started = time.perf_counter()
+            await seed(connection, args.rows)
+            print(
+                f'{engine.url.get_backend_name()}, rows={args.rows}: '
+                f'заполнено за {time.perf_counter() - started:.1f} c\n'
+            )
+
+        async with engine.connect() as connection:
+            for name, build in CASES.items():
+                upper = users if name.startswith('user_id') else args.rows
+                print(f'{name}:')
+                print(await explain(connection, build(upper // 2)))
+
+                samples = []
+                for _ in range(args.calls):
+                    stmt = build(rnd.randint(1, upper))
+                    started = time.perf_counter()
+                    (await connection.execute(stmt)).all()
+                    samples.append(time.perf_counter() - started)
+                samples.sort()
+                print(
+                    f'    p50 {samples[len(samples) // 2] * 1e6:.1f} us, '
+                    f'p95 {samples[int(len(samples) * 0.95)] * 1e6:.1f} us\n'
+                )
+
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.drop_all)
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='quest-bench-') as tmp:
+        if args.db_url is None:
+            args.db_url = f'sqlite+aiosqlite:///{Path(tmp) / "bench.db"}'
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
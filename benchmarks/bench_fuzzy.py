@@ -0,0 +1,52 @@
+"""
+Стоимость нечёткого поиска интента на одно сообщение.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_fuzzy
+"""
+import random
+import string
+import time
+import warnings
+
+warnings.filterwarnings('ignore', module='fuzzywuzzy')
+
+from src.bot.service.fuzzy import TrigramIndex  # noqa: E402
+import src.bot.service.msg_text as msg  # noqa: E402
+
+ROUNDS = 2000
+SCALES = (1, 10, 100, 1000)
+QUERIES = ['приветт', 'помошь', 'пмоги', 'подсказк', 'абракадабра', 'ок']
+
+
+def vocabulary(scale: int) -> list[str]:
+    """Словарь бота, дополненный случайными словами до 'scale' раз."""
+
+    words = [w.lower() for w in msg.START_WORDS + msg.HELP_WORDS]
+    rnd = random.Random(scale)
+    alphabet = 'абвгдежзийклмнопрстуфхцчшщыэюя' + string.ascii_lowercase
+    while len(words) < scale * len(msg.START_WORDS + msg.HELP_WORDS):
+        words.append(''.join(rnd.choices(alphabet, k=rnd.randint(4, 12))))
+    return words
+
+
+def main() -> None:
+    print(f'{"words":>8} {"build, ms":>10} {"us/message":>11}')
+    for scale in SCALES:
+        words = vocabulary(scale)
+        started = time.perf_counter()
+        index = TrigramIndex(words)
+        build = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            for query in QUERIES:
+                index.match(query)
+        per_message = (
+            (time.perf_counter() - started) / (ROUNDS * len(QUERIES)) * 1e6
+        )
+        print(f'{len(index):>8} {build:>10.2f} {per_message:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Размер 'users_history' с текстами в строках и со словарём текстов.
+
+Записи истории генерируются из словаря бота (приветствия, слова помощи,
+подсказка, коды актов) с долей длинных произвольных сообщений
+и сбрасываются в бд через 'HistoryWriter' пачками, как в боте.
+Для SQLite сравнивается размер файла бд, для PostgreSQL —
+размер таблиц с индексами и объём WAL.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_history_dedup --rows 200000
+    python -m benchmarks.bench_history_dedup --db-url postgresql+asyncpg://... --recreate
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument(
+        '--free-text',
+        type=float,
+        default=0.05,
+        help='доля длинных произвольных сообщений'
+    )
+    parser.add_argument(
+        '--db-url',
+        default=None,
+        help='по умолчанию — временные базы SQLite'
+    )
+    parser.add_argument(
+        '--recreate',
+        action='store_true',
+        help='разрешить пересоздание таблиц в базе из --db-url'
+    )
+    return parser.parse_args(argv)
+
+
+def configure(args: argparse.Namespace, workdir: Path) -> None:
+    """Окружение до импорта 'src': настройки читаются при импорте."""
+
+    if args.db_url is not None and not args.recreate:
+        sys.exit('Таблицы в --db-url будут удалены: добавьте --recreate.')
+    os.environ['DATABASE_URL'] = (
+        args.db_url or f'sqlite+aiosqlite:///{workdir / "core.db"}'
+    )
+    os.environ.setdefault('LOG_MODE', 'production')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('SQL_ECHO_SAMPLE_RATE', '0')
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+
+
+def vocabulary() -> list[str]:
+    import src.bot.service.constants as const
+    import src.bot.service.msg_text as msg
+
+    return (
+        msg.START_WORDS + msg.HELP_WORDS + msg.MISTAKE_KEYS
+        + [const.HINT, msg.FIRST_ACT_KEY, msg.SECOND_ACT_KEY,
+           msg.THIRD_ACT_KEY, '/start']
+    )
+
+
+def records(args: argparse.Namespace, users: int) -> list[dict]:
+    rnd = random.Random(1)
+    words = vocabulary()
+    now = datetime.datetime.now()
+    result = []
+    for number in range(args.rows):
+        if rnd.random() < args.free_text:
+            content = ' '.join(
+                rnd.choice(words) for _ in range(rnd.randint(8, 20))
+            )
+        else:
+            content = rnd.choice(words)
+        result.append({
+            'user_id': number % users + 1,
+            'chat_id': number % users + 1,
+            'message_id': number,
+            'message_content': content,
+            'state': '',
+            'created_at': now,
+        })
+    return result
+
+
+async def measure(args: argparse.Namespace, url: str, dedup: bool) -> dict:
+    from sqlalchemy import insert, text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from src.db.base import Base
+    from src.db.models import UsersProfile
+    from src.manager.content_dictionary import ContentDictionary
+    from src.manager.history_writer import HistoryWriter
+
+    engine = create_async_engine(url)
+    postgres = engine.dialect.name == 'postgresql'
+    users = max(1, args.rows // 100)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(UsersProfile), [
+            {'id': number, 'telegram_id': number, 'act_code': '000'}
+            for number in range(1, users + 1)
+        ])
+        if postgres:
+            wal_start = (await connection.execute(
+                text('SELECT pg_current_wal_lsn()')
+            )).scalar()
+
+    contents = ContentDictionary()
+    writer = HistoryWriter(
+        sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False),
+        dedup=dedup,
+        contents=contents,
+    )
+    batch = records(args, users)
+    for start in range(0, len(batch), args.batch):
+        await writer._flush(batch[start:start + args.batch])
+
+    async with engine.connect() as connection:
+        if postgres:
+            await connection.execute(text('CHECKPOINT'))
+            size = (await connection.execute(text(
+                "SELECT pg_total_relation_size('users_history') "
+                "+ pg_total_relation_size('message_contents')"
+            ))).scalar()
+            wal = (await connection.execute(
+                text('SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), :start)'),
+                {'start': wal_start}
+            )).scalar()
+        else:
+            await connection.exec_driver_sql('VACUUM')
+            size = (await connection.exec_driver_sql(
+                'SELECT page_count * page_size '
+                'FROM pragma_page_count(), pragma_page_size()'
+            )).scalar()
+            wal = None
+        await connection.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+    return {
+        'size_mb': round(size / 2 ** 20, 2),
+        'wal_mb': round(int(wal) / 2 ** 20, 2) if wal is not None else None,
+        'flushed': writer.flushed,
+        'cache': contents.stats(),
+    }
+
+
+async def run(args: argparse.Namespace, workdir: Path) -> None:
+    results = {}
+    for dedup in (False, True):
+        url = args.db_url or (
+            f'sqlite+aiosqlite:///{workdir / f"dedup_{dedup}.db"}'
+        )
+        results[dedup] = await measure(args, url, dedup)
+        print(f'dedup={dedup}: {results[dedup]}')
+    plain, dedup = results[False], results[True]
+    print(f'размер: x{plain["size_mb"] / dedup["size_mb"]:.2f}')
+    if plain['wal_mb']:
+        print(f'WAL: x{plain["wal_mb"] / dedup["wal_mb"]:.2f}')
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='quest-bench-') as tmp:
+        configure(args, Path(tmp))
+        asyncio.run(run(args, Path(tmp)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Пропускная способность моста logging -> Loguru (записей в секунду).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_logging
+"""
+import inspect
+import logging
+import time
+
+from loguru import logger
+
+from src.logs.config import InterceptHandler, SqlEchoSampler, bot_logger
+
+RECORDS = 20000
+
+
+class LegacyInterceptHandler(logging.Handler):
+    """Прежний мост: поиск кадра и bind на каждую запись."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level = bot_logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        frame, depth = inspect.currentframe(), 0
+        while frame and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+            frame = frame.f_back
+            depth += 1
+
+        (
+            bot_logger
+            .bind(logger_name=record.name)
+            .opt(depth=depth, exception=record.exc_info)
+            .log(level, record.getMessage())
+        )
+
+
+def measure(
+        handler: logging.Handler,
+        level: int,
+        record_level: int = logging.INFO,
+        log_filter: logging.Filter | None = None,
+) -> float:
+    """Записей в секунду через 'handler'."""
+
+    std_logger = logging.getLogger('bench')
+    std_logger.handlers = [handler]
+    std_logger.filters = [log_filter] if log_filter else []
+    std_logger.propagate = False
+    std_logger.setLevel(level)
+
+    started = time.perf_counter()
+    for number in range(RECORDS):
+        std_logger.log(record_level, 'SELECT %s FROM users_profile', number)
+    return RECORDS / (time.perf_counter() - started)
+
+
+def main() -> None:
+    logger.remove()
+    logger.add(lambda message: None, level='DEBUG', format='{message}')
+
+    # Прежняя настройка: basicConfig(level=0), уровень не отсекал записи.
+    cases = [
+        ('legacy, INFO', LegacyInterceptHandler(), 0, logging.INFO, None),
+        ('bridge, INFO', InterceptHandler(), 0, logging.INFO, None),
+        (
+            'bridge, INFO, SQL sample 0.1',
+            InterceptHandler(),
+            0,
+            logging.INFO,
+            SqlEchoSampler(0.1)
+        ),
+        ('legacy, DEBUG', LegacyInterceptHandler(), 0, logging.DEBUG, None),
+        (
+            'bridge, DEBUG gated by INFO',
+            InterceptHandler(),
+            logging.INFO,
+            logging.DEBUG,
+            None
+        ),
+    ]
+    print(f'{"case":<32} {"records/s":>12}')
+    for name, handler, level, record_level, log_filter in cases:
+        rate = measure(handler, level, record_level, log_filter)
+        print(f'{name:<32} {rate:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main()
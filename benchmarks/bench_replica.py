@@ -0,0 +1,226 @@
+"""
+Проверка чтений через реплику ('replica_router') на двух базах.
+
+По умолчанию основная бд и реплика — два временных файла SQLite.
+Репликация — копирование таблицы 'users' из основной бд в реплику
+по команде, поэтому реплика отстаёт на всё, что записано после копирования.
+Проверяется:
+- read-your-writes: после 'set_act_code' чтение 'get_act_code' в течение
+  '--sticky' секунд идёт в основную бд и видит новое значение;
+- после этого чтения снова идут в реплику (видно её отставание);
+- прочитанное из реплики не попадает в 'progress_cache'.
+
+С '--db-url' и '--replica-url' проверяются настоящие основная бд и реплика:
+данные реплицирует сама бд, поэтому отставание не проверяется.
+Пользователи бенчмарка и их счётчики воронки удаляются после проверки.
+При нарушении команда завершается с кодом 1.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_replica --users 200
+    python -m benchmarks.bench_replica --db-url postgresql+asyncpg://... \\
+        --replica-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+USER_ID_OFFSET: int = 2 * 10 ** 9
+OLD_CODE: str = 'replica_old'
+NEW_CODE: str = 'replica_new'
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument(
+        '--sticky',
+        type=float,
+        default=1.0,
+        help='REPLICA_STICKY_SECONDS, с'
+    )
+    parser.add_argument(
+        '--db-url',
+        default=None,
+        help='по умолчанию — временная база SQLite'
+    )
+    parser.add_argument(
+        '--replica-url',
+        default=None,
+        help='по умолчанию — второй временный файл SQLite'
+    )
+    parser.add_argument(
+        '--replica-wait',
+        type=float,
+        default=30.0,
+        help='ожидание репликации настоящей реплики, с'
+    )
+    args = parser.parse_args(argv)
+    if (args.db_url is None) != (args.replica_url is None):
+        parser.error('--db-url и --replica-url задаются вместе')
+    return args
+
+
+def configure(args: argparse.Namespace, workdir: Path) -> None:
+    """Окружение до импорта 'src': настройки читаются при импорте."""
+
+    args.local = args.db_url is None
+    if args.local:
+        args.db_url = f'sqlite+aiosqlite:///{workdir / "primary.db"}'
+        args.replica_url = f'sqlite+aiosqlite:///{workdir / "replica.db"}'
+    os.environ['DATABASE_URL'] = args.db_url
+    os.environ['DATABASE_REPLICA_URL'] = args.replica_url
+    os.environ['REPLICA_STICKY_SECONDS'] = str(args.sticky)
+    os.environ.setdefault('TELEGRAM_TOKEN', '42:BENCH')
+    os.environ.setdefault('LOG_MODE', 'production')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('SQL_ECHO_SAMPLE_RATE', '0')
+    base_dir = str(Path(__file__).resolve().parent.parent)
+    if base_dir not in sys.path:
+        sys.path.insert(0, base_dir)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from sqlalchemy import delete, func, insert, select, update
+
+    from src.db.base import Base
+    from src.db.core import async_session, engine, replica_engine
+    from src.db.models import ActCounter, UsersProfile
+    from src.db.replica import replica_router
+    from src.manager.cache import progress_cache
+    from src.manager.users import UserManager
+
+    users = UsersProfile.__table__
+    counters = ActCounter.__table__
+    numbers = [USER_ID_OFFSET + number for number in range(args.users)]
+    in_range = users.c.telegram_id.between(numbers[0], numbers[-1])
+
+    async def replicate() -> None:
+        """Копирование строк 'users' бенчмарка в реплику."""
+
+        if not args.local:
+            deadline = time.monotonic() + args.replica_wait
+            while True:
+                async with replica_engine.connect() as connection:
+                    count = (await connection.execute(
+                        select(func.count()).select_from(users)
+                        .where(in_range, users.c.act_code == OLD_CODE)
+                    )).scalar()
+                if count == len(numbers):
+                    return
+                if time.monotonic() > deadline:
+                    raise TimeoutError('реплика не догнала основную бд')
+                await asyncio.sleep(0.1)
+        async with engine.connect() as connection:
+            rows = (await connection.execute(
+                select(users).where(in_range)
+            )).mappings().all()
+        async with replica_engine.begin() as connection:
+            await connection.execute(delete(users).where(in_range))
+            await connection.execute(
+                insert(users), [dict(row) for row in rows]
+            )
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(delete(users).where(in_range))
+    if args.local:
+        async with replica_engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    async with async_session() as session:
+        manager = UserManager(session)
+        for tg_id in numbers:
+            await manager.add_user(tg_id)
+    async with engine.begin() as connection:
+        await connection.execute(
+            update(users).where(in_range).values(act_code=OLD_CODE)
+        )
+    await replicate()
+    progress_cache.clear()
+
+    report = {
+        'users': args.users,
+        'db': engine.url.get_backend_name(),
+        'sticky_s': args.sticky,
+        'stale_after_write': 0,
+        'cached_from_replica': 0,
+    }
+
+    # Запись и сразу чтение: отметка 'mark_write' ведёт чтение в основную бд.
+    router_before = replica_router.stats()
+    started = time.perf_counter()
+    for tg_id in numbers:
+        async with async_session() as session:
+            await UserManager(session).set_act_code(tg_id, NEW_CODE)
+        # Промах кэша, как после вытеснения: чтение идёт в бд.
+        progress_cache.invalidate(tg_id)
+        async with async_session() as session:
+            act_code = await UserManager(session).get_act_code(tg_id)
+        if act_code != NEW_CODE:
+            report['stale_after_write'] += 1
+    report['write_read_ms'] = round(
+        (time.perf_counter() - started) * 1000 / len(numbers), 3
+    )
+    report['primary_reads_after_write'] = (
+        replica_router.primary_reads - router_before['primary_reads']
+    )
+
+    # По истечении отметок чтения снова идут в реплику.
+    await asyncio.sleep(args.sticky)
+    router_before = replica_router.stats()
+    stale_from_replica = 0
+    started = time.perf_counter()
+    for tg_id in numbers:
+        progress_cache.invalidate(tg_id)
+        async with async_session() as session:
+            user = await UserManager(session).get_user_by_id(tg_id)
+        if user is not None and user.act_code == OLD_CODE:
+            stale_from_replica += 1
+        if progress_cache.get(tg_id) is not None:
+            report['cached_from_replica'] += 1
+    report['replica_read_ms'] = round(
+        (time.perf_counter() - started) * 1000 / len(numbers), 3
+    )
+    report['replica_reads'] = (
+        replica_router.replica_reads - router_before['replica_reads']
+    )
+    if args.local:
+        # Реплика не обновлялась после записи: её чтения видят старый код.
+        report['stale_from_replica'] = stale_from_replica
+
+    async with engine.begin() as connection:
+        await connection.execute(delete(users).where(in_range))
+        await connection.execute(
+            delete(counters)
+            .where(counters.c.act_code.in_((OLD_CODE, NEW_CODE)))
+        )
+    await engine.dispose()
+    await replica_engine.dispose()
+
+    report['ok'] = (
+        report['stale_after_write'] == 0
+        and report['primary_reads_after_write'] == len(numbers)
+        and report['cached_from_replica'] == 0
+        and report['replica_reads'] == len(numbers)
+        and report.get('stale_from_replica', len(numbers)) == len(numbers)
+    )
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='quest-replica-') as tmp:
+        configure(args, Path(tmp))
+        report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if not report['ok']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import datetime
+import itertools
+from typing import Iterator
+
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+import src.bot.service.constants as const
+import src.bot.service.msg_text as msg
+import src.settings as setting
+
+# Шаги полного прохождения квеста: ('text' | 'callback', значение).
+QUEST_STEPS: list[tuple[str, str]] = [
+    ('text', '/start'),
+    ('text', msg.START_WORDS[2]),
+    ('callback', const.START_QUEST_CMD),
+    ('callback', setting.ACT_STATE['1']),
+    ('text', const.HINT),
+    ('text', msg.FIRST_ACT_KEY),
+    ('text', const.HINT),
+    ('text', msg.SECOND_ACT_KEY),
+    ('text', const.HINT),
+    ('text', msg.THIRD_ACT_KEY),
+    ('text', const.HINT),
+    ('text', msg.MISTAKE_KEYS[-1]),
+    ('text', msg.FINAL_ACT_KEY[0]),
+    ('text', '/help'),
+]
+
+HINT_FILES: tuple[str, ...] = (
+    'hint_1.PNG', 'hint_2.PNG', 'hint_3.PNG', 'hint_final.PNG'
+)
+
+_ids = itertools.count(1)
+
+
+def quest_updates(user_id: int) -> Iterator[Update]:
+    """Апдейты одного игрока, проходящего квест от '/start' до финала."""
+
+    user = User(id=user_id, is_bot=False, first_name=f'player{user_id}')
+    chat = Chat(id=user_id, type='private')
+    for kind, value in QUEST_STEPS:
+        message = Message(
+            message_id=next(_ids),
+            date=datetime.datetime.now(),
+            chat=chat,
+            from_user=user,
+            text=value if kind == 'text' else 'button',
+        )
+        if kind == 'text':
+            yield Update(update_id=next(_ids), message=message)
+        else:
+            yield Update(
+                update_id=next(_ids),
+                callback_query=CallbackQuery(
+                    id=str(next(_ids)),
+                    from_user=user,
+                    chat_instance=str(user_id),
+                    data=value,
+                    message=message,
+                )
+            )
@@ -0,0 +1,70 @@
+import asyncio
+import datetime
+import itertools
+import random
+from collections import Counter
+from typing import Any, AsyncGenerator
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Chat, Message, PhotoSize, User
+
+
+class StubSession(BaseSession):
+    """
+    Сессия бота без сети: запросы к Bot API только учитываются
+    и отвечают с заданной задержкой (секунды, равномерно в [min, max]).
+    """
+
+    def __init__(self, latency: tuple[float, float] = (0.0, 0.0)):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self._message_ids = itertools.count(1)
+        self._random = random.Random(0)
+
+    async def make_request(
+            self,
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+            timeout: int | None = None,
+    ) -> Any:
+        name = type(method).__name__
+        self.calls[name] += 1
+        low, high = self.latency
+        if high > 0:
+            await asyncio.sleep(self._random.uniform(low, high))
+
+        if name == 'GetMe':
+            return User(id=bot.id, is_bot=True, first_name='bot')
+        if method.__returning__ is Message:
+            return self._message(method)
+        return True
+
+    async def stream_content(self, *args, **kwargs) -> AsyncGenerator[bytes, None]:
+        yield b''
+
+    async def close(self) -> None:
+        pass
+
+    def _message(self, method: TelegramMethod) -> Message:
+        extra: dict[str, Any] = {}
+        if getattr(method, 'photo', None) is not None:
+            extra['photo'] = [
+                PhotoSize(
+                    file_id='stub-file-id',
+                    file_unique_id='stub',
+                    width=1,
+                    height=1
+                )
+            ]
+        else:
+            extra['text'] = getattr(method, 'text', None) or ''
+        return Message(
+            message_id=next(self._message_ids),
+            date=datetime.datetime.now(),
+            chat=Chat(id=method.chat_id, type='private'),
+            **extra
+        )
@@ -0,0 +1,3 @@
+from benchmarks.managers.runner import main
+
+main()
@@ -0,0 +1,118 @@
+import datetime
+import itertools
+import random
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from aiogram.types import Chat, Message, User
+
+from src.manager.composite_manager import CompositeManager
+
+Call = Callable[[CompositeManager], Awaitable[Any]]
+
+
+@dataclass
+class Dataset:
+    """Размеры заполненных таблиц и генератор случайных ключей."""
+
+    users: int
+    history_users: int
+    rnd: random.Random
+
+    def user_id(self) -> int:
+        return self.rnd.randint(1, self.users)
+
+    def history_user_id(self) -> int:
+        return self.rnd.randint(1, self.history_users)
+
+
+_new_ids = itertools.count(10 ** 12)
+
+
+def _message(tg_id: int) -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.datetime.now(),
+        chat=Chat(id=tg_id, type='private'),
+        from_user=User(id=tg_id, is_bot=False, first_name='bench'),
+        text='бенчмарк',
+    )
+
+
+def is_exist(data: Dataset) -> Call:
+    tg_id = data.user_id()
+    return lambda manager: manager.is_exist(
+        manager.USER_PROFILE_MODEL, 'telegram_id', tg_id
+    )
+
+
+def get_by_field(data: Dataset) -> Call:
+    tg_id = data.user_id()
+    return lambda manager: manager.get_by_field(
+        manager.USER_PROFILE_MODEL, 'telegram_id', tg_id
+    )
+
+
+def get_all_by_field(data: Dataset) -> Call:
+    user_id = data.history_user_id()
+    return lambda manager: manager.get_all_by_field(
+        manager.USER_HISTORY_MODEL, 'user_id', user_id
+    )
+
+
+def add_instance(data: Dataset) -> Call:
+    fields = {
+        'user_id': data.history_user_id(),
+        'chat_id': 1,
+        'message_id': 1,
+        'message_content': 'бенчмарк',
+        'state': 'bench',
+    }
+    return lambda manager: manager.add_instance(
+        manager.USER_HISTORY_MODEL, dict(fields)
+    )
+
+
+async def _create_user(manager: CompositeManager) -> int:
+    tg_id = next(_new_ids)
+    await manager.get_or_create_user(tg_id)
+    return tg_id
+
+
+def delete_instance(data: Dataset) -> tuple[Callable, Callable]:
+    """Подготовка (без замера): создаётся пользователь, которого удаляют."""
+
+    async def call(manager: CompositeManager, tg_id: int) -> None:
+        await manager.delete_instance(
+            manager.USER_PROFILE_MODEL, 'telegram_id', tg_id
+        )
+
+    return _create_user, call
+
+
+def get_or_create_user_existing(data: Dataset) -> Call:
+    tg_id = data.user_id()
+    return lambda manager: manager.get_or_create_user(tg_id)
+
+
+def get_or_create_user_new(data: Dataset) -> Call:
+    tg_id = next(_new_ids)
+    return lambda manager: manager.get_or_create_user(tg_id)
+
+
+def write_history(data: Dataset) -> Call:
+    message = _message(data.user_id())
+    return lambda manager: manager.write_history(message, 'bench')
+
+
+# Имя -> фабрика вызова. Фабрика, возвращающая пару, задаёт подготовку.
+CASES: dict[str, Callable] = {
+    'is_exist': is_exist,
+    'get_by_field': get_by_field,
+    'get_all_by_field': get_all_by_field,
+    'add_instance': add_instance,
+    'delete_instance': delete_instance,
+    'get_or_create_user.existing': get_or_create_user_existing,
+    'get_or_create_user.new': get_or_create_user_new,
+    'write_history': write_history,
+}
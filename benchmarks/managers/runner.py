@@ -0,0 +1,241 @@
+"""
+Микро-бенчмарки слоя доступа к данным (BaseManager / UserManager).
+
+Для каждого размера таблиц база пересоздаётся и заполняется,
+затем каждый метод вызывается в отдельной сессии с autocommit,
+как вне unit of work. Перед каждым вызовом 'progress_cache' очищается,
+чтобы замер всегда включал запрос к бд.
+
+Запуск из корня репозитория:
+    python -m benchmarks.managers --sizes 1000,100000 --output results.json
+    python -m benchmarks.managers --baseline benchmarks/managers/baseline.json
+    python -m benchmarks.managers --save-baseline benchmarks/managers/baseline.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+SEED_CHUNK: int = 50000
+# Пользователей с историей: на каждого приходится HISTORY_PER_USER записей.
+HISTORY_PER_USER: int = 10
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--sizes',
+        default='1000,10000,100000',
+        help='размеры таблиц через запятую (до 10000000)'
+    )
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--cases', default='', help='имена через запятую')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--db-url',
+        default=None,
+        help='по умолчанию — временная база SQLite'
+    )
+    parser.add_argument(
+        '--recreate',
+        action='store_true',
+        help='разрешить пересоздание таблиц в базе из --db-url'
+    )
+    parser.add_argument('--output', type=Path, help='файл результатов JSON')
+    parser.add_argument('--baseline', type=Path, help='базовые результаты JSON')
+    parser.add_argument('--save-baseline', type=Path)
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='допустимый рост p50 относительно базовых результатов'
+    )
+    return parser.parse_args(argv)
+
+
+def configure(args: argparse.Namespace, workdir: Path) -> None:
+    """Окружение до импорта 'src': настройки читаются при импорте."""
+
+    if args.db_url is None:
+        args.db_url = f'sqlite+aiosqlite:///{workdir / "bench.db"}'
+    elif not args.recreate:
+        sys.exit('Таблицы в --db-url будут удалены: добавьте --recreate.')
+    os.environ['DATABASE_URL'] = args.db_url
+    os.environ.setdefault('LOG_MODE', 'production')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('SQL_ECHO_SAMPLE_RATE', '0')
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+
+
+async def seed(engine, size: int) -> int:
+    """Заполнение 'users' и 'users_history' на 'size' строк каждая."""
+
+    from sqlalchemy import insert
+
+    from src.db.base import Base
+    from src.db.models import UsersHistory, UsersProfile
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    now = datetime.datetime.now()
+    history_users = max(1, size // HISTORY_PER_USER)
+    for start in range(0, size, SEED_CHUNK):
+        stop = min(size, start + SEED_CHUNK)
+        async with engine.begin() as connection:
+            await connection.execute(insert(UsersProfile), [
+                {
+                    'id': number,
+                    'telegram_id': number,
+                    'act_code': '000',
+                    'created_at': now,
+                }
+                for number in range(start + 1, stop + 1)
+            ])
+            await connection.execute(insert(UsersHistory), [
+                {
+                    'user_id': number % history_users + 1,
+                    'chat_id': number,
+                    'message_id': number,
+                    'message_content': 'seed',
+                    'state': 'seed',
+                    'created_at': now,
+                }
+                for number in range(start + 1, stop + 1)
+            ])
+    return history_users
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        'calls': count,
+        'mean_us': round(sum(ordered) / count * 1e6, 1),
+        'p50_us': round(ordered[count // 2] * 1e6, 1),
+        'p95_us': round(ordered[min(count - 1, int(count * 0.95))] * 1e6, 1),
+        'min_us': round(ordered[0] * 1e6, 1),
+    }
+
+
+async def measure(factory, data, calls: int, warmup: int) -> dict:
+    from src.db.core import async_session
+    from src.manager.cache import progress_cache
+    from src.manager.composite_manager import CompositeManager
+
+    samples = []
+    for number in range(warmup + calls):
+        prepared = factory(data)
+        async with async_session() as session:
+            manager = CompositeManager(session)
+            if isinstance(prepared, tuple):
+                setup, call = prepared
+                argument = await setup(manager)
+                progress_cache.clear()
+                started = time.perf_counter()
+                await call(manager, argument)
+            else:
+                progress_cache.clear()
+                started = time.perf_counter()
+                await prepared(manager)
+            elapsed = time.perf_counter() - started
+        if number >= warmup:
+            samples.append(elapsed)
+    return summarize(samples)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import sqlalchemy
+
+    from benchmarks.managers.cases import CASES, Dataset
+    from src.db.core import engine
+
+    names = [name for name in args.cases.split(',') if name] or list(CASES)
+    results = []
+    for size in (int(value) for value in args.sizes.split(',')):
+        started = time.perf_counter()
+        history_users = await seed(engine, size)
+        print(
+            f'size={size}: заполнено за {time.perf_counter() - started:.1f} c',
+            file=sys.stderr
+        )
+        for name in names:
+            data = Dataset(size, history_users, random.Random(args.seed))
+            stats = await measure(CASES[name], data, args.calls, args.warmup)
+            results.append({'case': name, 'size': size, **stats})
+            print(
+                f'  {name:<30} p50 {stats["p50_us"]:>10.1f} us '
+                f'p95 {stats["p95_us"]:>10.1f} us',
+                file=sys.stderr
+            )
+    await engine.dispose()
+
+    return {
+        'meta': {
+            'db': engine.url.get_backend_name(),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'machine': platform.machine(),
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'calls': args.calls,
+        },
+        'results': results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Регрессии p50 относительно базовых результатов."""
+
+    base = {
+        (item['case'], item['size']): item for item in baseline['results']
+    }
+    regressions = []
+    for item in report['results']:
+        reference = base.get((item['case'], item['size']))
+        if reference is None:
+            continue
+        ratio = item['p50_us'] / reference['p50_us']
+        item['baseline_ratio'] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f'{item["case"]} size={item["size"]}: '
+                f'p50 {reference["p50_us"]} -> {item["p50_us"]} us (x{ratio:.2f})'
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='quest-bench-') as tmp:
+        configure(args, Path(tmp))
+        report = asyncio.run(run(args))
+
+    regressions = []
+    if args.baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        regressions = compare(report, baseline, args.tolerance)
+        report['regressions'] = regressions
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding='utf-8')
+    else:
+        print(text)
+    if args.save_baseline:
+        args.save_baseline.write_text(text, encoding='utf-8')
+
+    for regression in regressions:
+        print(f'Регрессия: {regression}', file=sys.stderr)
+    if regressions:
+        sys.exit(1)
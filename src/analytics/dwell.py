@@ -0,0 +1,259 @@
+"""
+Время прохождения актов и использование подсказок по 'users_history'.
+
+История читается потоком через курсор на стороне сервера
+пачками по '--chunk' строк. Каждая пачка переводится в массивы NumPy
+и сворачивается в массивы фиксированного размера по числу пользователей:
+время первого появления каждого этапа и число подсказок в каждом акте.
+Память не зависит от числа строк истории.
+При настроенной реплике запросы идут в неё.
+
+Запуск из корня репозитория:
+    python -m src.analytics.dwell
+    python -m src.analytics.dwell --chunk 100000 --output dwell.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import src.bot.service.constants as const
+from src.db.core import engine, replica_engine
+from src.db.models import UsersHistory, UsersProfile
+import src.settings as setting
+
+# Акты, в которых есть подсказки, в порядке прохождения.
+HINT_ACTS: list[str] = [
+    setting.ACT_STATE['1'],
+    setting.ACT_STATE['2'],
+    setting.ACT_STATE['3'],
+    setting.ACT_STATE['final'],
+]
+# Этапы квеста в порядке прохождения. Запись с состоянием акта
+# делает 'check_code' при решении акта, поэтому разница первых записей
+# соседних этапов — время решения следующего акта. В финальной сцене
+# с состоянием акта пишутся и другие сообщения, поэтому её решение
+# записывается с отдельным суффиксом. Акт HINT_ACTS[i] начинается
+# с этапа STAGES[i] и решается на этапе STAGES[i + 1].
+STAGES: list[str] = [
+    setting.ACT_STATE['start'],
+    setting.ACT_STATE['1'],
+    setting.ACT_STATE['2'],
+    setting.ACT_STATE['3'],
+    setting.ACT_STATE['final'] + const.SOLVED_STATE_SUFFIX,
+]
+PERCENTILES: tuple[int, ...] = (50, 75, 90, 95, 99)
+# Границы логарифмической гистограммы времени, секунды: 1 с ... ~12 дней.
+HISTOGRAM_EDGES = np.concatenate(([0.0], 2.0 ** np.arange(0, 21)))
+
+NOT_SEEN = np.iinfo(np.int64).max
+
+
+class DwellAccumulator:
+    """
+    Свёртка пачек истории в массивы размера (пользователи x этапы).
+
+    'first_seen' — время (мкс) первой записи пользователя в этапе,
+    'hints' — число запросов подсказки в акте.
+    """
+
+    def __init__(self, max_user_id: int):
+        self.max_user_id = max_user_id
+        self.first_seen = np.full(
+            (max_user_id + 1, len(STAGES)),
+            NOT_SEEN,
+            dtype=np.int64
+        )
+        self.hints = np.zeros(
+            (max_user_id + 1, len(HINT_ACTS)),
+            dtype=np.int32
+        )
+        self.rows = 0
+
+    def add(
+            self,
+            user_ids: np.ndarray,
+            codes: np.ndarray,
+            created_at: np.ndarray
+    ) -> None:
+        """
+        Пачка записей: id пользователя, код этапа (0..len(STAGES)-1
+        для этапа, len(STAGES) + i для подсказки в акте i) и время в мкс.
+        """
+
+        keep = (user_ids <= self.max_user_id) & (user_ids > 0)
+        user_ids, codes, created_at = (
+            user_ids[keep], codes[keep], created_at[keep]
+        )
+        stage = codes < len(STAGES)
+        np.minimum.at(
+            self.first_seen,
+            (user_ids[stage], codes[stage]),
+            created_at[stage]
+        )
+        hint = ~stage
+        np.add.at(
+            self.hints,
+            (user_ids[hint], codes[hint] - len(STAGES)),
+            1
+        )
+        self.rows += int(keep.sum())
+
+    def report(self) -> dict:
+        seen = self.first_seen != NOT_SEEN
+        transitions = {}
+        for number in range(1, len(STAGES)):
+            valid = seen[:, number - 1] & seen[:, number]
+            seconds = (
+                self.first_seen[valid, number]
+                - self.first_seen[valid, number - 1]
+            ) / 1e6
+            seconds = seconds[seconds >= 0]
+            name = f'{STAGES[number - 1]}->{STAGES[number]}'
+            transitions[name] = summarize(seconds)
+
+        # Доля считается от игроков, начавших акт,
+        # то есть дошедших до предыдущего этапа.
+        hints = {}
+        for number, act in enumerate(HINT_ACTS):
+            entered = seen[:, number]
+            players = int(entered.sum())
+            hint_users = int((entered & (self.hints[:, number] > 0)).sum())
+            hints[act] = {
+                'players': players,
+                'hint_users': hint_users,
+                'hint_rate': (
+                    round(hint_users / players, 4) if players else 0.0
+                ),
+                'hints_per_player': (
+                    round(
+                        float(self.hints[entered, number].sum()) / players,
+                        3
+                    )
+                    if players else 0.0
+                ),
+            }
+        return {
+            'rows': self.rows,
+            'users': int(seen.any(axis=1).sum()),
+            'transitions': transitions,
+            'hints': hints,
+        }
+
+
+def summarize(seconds: np.ndarray) -> dict:
+    """Перцентили и логарифмическая гистограмма времени, секунды."""
+
+    if not seconds.size:
+        return {'count': 0}
+    values = np.percentile(seconds, PERCENTILES)
+    counts, _ = np.histogram(
+        np.clip(seconds, 0, HISTOGRAM_EDGES[-1]),
+        bins=HISTOGRAM_EDGES
+    )
+    return {
+        'count': int(seconds.size),
+        'mean': round(float(seconds.mean()), 3),
+        **{
+            f'p{percentile}': round(float(value), 3)
+            for percentile, value in zip(PERCENTILES, values)
+        },
+        'histogram': {
+            f'<{int(edge)}s': int(count)
+            for edge, count in zip(HISTOGRAM_EDGES[1:], counts)
+            if count
+        },
+    }
+
+
+def stage_codes() -> dict[str, int]:
+    codes = {state: number for number, state in enumerate(STAGES)}
+    for number, act in enumerate(HINT_ACTS):
+        codes[act + const.HINT_STATE_SUFFIX] = len(STAGES) + number
+    return codes
+
+
+async def collect(
+        source: AsyncEngine,
+        chunk_size: int
+) -> DwellAccumulator:
+    """Потоковое чтение истории и свёртка в 'DwellAccumulator'."""
+
+    codes = stage_codes()
+    async with source.connect() as connection:
+        max_user_id = (await connection.execute(
+            select(func.max(UsersProfile.id))
+        )).scalar() or 0
+        accumulator = DwellAccumulator(max_user_id)
+
+        result = await connection.stream(
+            select(
+                UsersHistory.user_id,
+                case(codes, value=UsersHistory.state),
+                UsersHistory.created_at,
+            )
+            .where(
+                UsersHistory.state.in_(codes),
+                UsersHistory.user_id.is_not(None),
+                UsersHistory.created_at.is_not(None),
+            )
+            .execution_options(yield_per=chunk_size)
+        )
+        async for chunk in result.partitions():
+            user_ids, stage, created_at = zip(*chunk)
+            accumulator.add(
+                np.fromiter(user_ids, dtype=np.int64, count=len(chunk)),
+                np.fromiter(stage, dtype=np.int64, count=len(chunk)),
+                np.array(created_at, dtype='datetime64[us]').astype(np.int64),
+            )
+    return accumulator
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=50000)
+    parser.add_argument(
+        '--primary',
+        action='store_true',
+        help='читать из основной бд, даже если настроена реплика'
+    )
+    parser.add_argument('--output', type=Path, help='файл отчёта JSON')
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    source = replica_engine
+    if args.primary or source is None:
+        source = engine
+    started = time.perf_counter()
+    try:
+        accumulator = await collect(source, args.chunk)
+    finally:
+        await source.dispose()
+    report = accumulator.report()
+    report['elapsed'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding='utf-8')
+    else:
+        print(text)
+    print(
+        f'Обработано {report["rows"]} записей за {report["elapsed"]} с',
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
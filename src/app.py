@@ -1,25 +1,87 @@
 import asyncio
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
 
+from src.bot.broadcast import broadcast_engine
+from src.bot.service.admin import admin_router
 from src.bot.service.errors import error_router
 from src.bot.service.help_info import help_info_router
 from src.bot.main import main_router
+from src.bot.middlewares import (
+    ApiLatencyMiddleware,
+    CommitBeforeRequestMiddleware,
+    DbSessionMiddleware,
+    HandlerLatencyMiddleware,
+    IntentMiddleware,
+    UpdateLatencyMiddleware
+)
+from src.bot.rate_limiter import rate_limiter
+from src.bot.service.routing import route_index
+from src.bot.service.sequencer import sequencer
+from src.bot.webhook import start_webhook
+from src.db.core import async_session, warm_up_pool
+from src.db.history_archive import history_archiver
+from src.db.storage import SqlStorage
+from src.manager.funnel import funnel_reconciler
+from src.manager.history_writer import history_writer
+from src.metrics.latency import latency_stats
+from src.metrics.server import register_collector, start_metrics_server
+from src.metrics.sql import sql_metrics
 from logs.config import bot_logger
-from settings import TELEGRAM_TOKEN
+from settings import BOT_MODE, FSM_STORAGE, TELEGRAM_TOKEN
 
-dp = Dispatcher()
+dp = Dispatcher(
+    storage=SqlStorage() if FSM_STORAGE == 'sql' else MemoryStorage()
+)
+dp.update.outer_middleware(UpdateLatencyMiddleware(latency_stats))
+dp.update.outer_middleware(DbSessionMiddleware(async_session))
+dp.message.outer_middleware(IntentMiddleware(route_index))
+
+handler_latency = HandlerLatencyMiddleware(latency_stats)
+for router in (admin_router, help_info_router, main_router, error_router):
+    router.message.middleware(handler_latency)
+    router.callback_query.middleware(handler_latency)
 
 
 @bot_logger.catch()
 async def main() -> None:
     bot = Bot(token=TELEGRAM_TOKEN)
+    bot.session.middleware(CommitBeforeRequestMiddleware())
+    bot.session.middleware(ApiLatencyMiddleware())
+    bot.session.middleware(rate_limiter)
     dp.include_routers(
+        admin_router,
         help_info_router,
         main_router,
         error_router
     )
-    await dp.start_polling(bot)
+    dp.startup.register(warm_up_pool)
+    dp.startup.register(history_writer.start)
+    dp.startup.register(sequencer.start)
+    dp.startup.register(history_archiver.start)
+    dp.startup.register(funnel_reconciler.start)
+    dp.startup.register(broadcast_engine.start)
+    dp.shutdown.register(broadcast_engine.stop)
+    dp.shutdown.register(funnel_reconciler.stop)
+    dp.shutdown.register(history_archiver.stop)
+    dp.shutdown.register(sequencer.stop)
+    dp.shutdown.register(history_writer.stop)
+    register_collector(sql_metrics.collect)
+    register_collector(latency_stats.collect)
+    register_collector(rate_limiter.collect)
+    register_collector(history_writer.collect)
+    register_collector(sequencer.collect)
+    register_collector(funnel_reconciler.collect)
+    metrics_runner = await start_metrics_server()
+    try:
+        if BOT_MODE == 'webhook':
+            await start_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == '__main__':
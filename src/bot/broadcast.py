@@ -0,0 +1,376 @@
+import asyncio
+import datetime
+import os
+import socket
+import time
+import uuid
+from contextlib import suppress
+from typing import AsyncIterator, Awaitable, TypeVar
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+from sqlalchemy.orm import sessionmaker
+
+from src.bot.rate_limiter import TokenBucket
+from src.db.core import async_session
+from src.db.models import Broadcast
+from src.logs.config import bot_logger
+from src.manager.broadcast import (
+    DELIVERY_BLOCKED,
+    DELIVERY_FAILED,
+    DELIVERY_SENT,
+    STATUS_LEASE_LOST,
+    STATUS_RUNNING,
+    BroadcastManager
+)
+import src.settings as setting
+
+T = TypeVar('T')
+
+
+class BroadcastEngine:
+    """
+    Отправка рассылки всем пользователям в фоне.
+
+    Пользователи читаются страницами (keyset по 'users.id'), страница
+    отправляется не более чем 'concurrency' запросами одновременно
+    и не быстрее 'rate' сообщений в секунду; лимиты чатов и повтор
+    после 'TelegramRetryAfter' обеспечивает 'rate_limiter' сессии бота.
+    После каждой страницы результаты доставки и контрольная точка
+    сохраняются в одной транзакции, поэтому прерванная рассылка
+    продолжается при следующем запуске бота, а не начинается заново.
+    Ошибки бд не останавливают рассылку: чтение страницы, сохранение
+    результатов и завершение повторяются с растущей паузой,
+    отправка продолжается с последней сохранённой контрольной точки.
+
+    При нескольких процессах бота рассылку отправляет только владелец
+    аренды (см. 'BroadcastManager'). Аренда продлевается с каждой
+    контрольной точкой; остальные процессы раз в половину 'lease'
+    проверяют её и продолжают рассылку, если владелец остановился.
+    """
+
+    def __init__(
+            self,
+            session_factory: sessionmaker = async_session,
+            page_size: int = setting.BROADCAST_PAGE_SIZE,
+            concurrency: int = setting.BROADCAST_CONCURRENCY,
+            rate: float = setting.BROADCAST_RATE,
+            retry_backoff: float = setting.BROADCAST_RETRY_BACKOFF,
+            retry_max: float = setting.BROADCAST_RETRY_MAX,
+            lease: float = setting.BROADCAST_LEASE,
+    ):
+        self.session_factory = session_factory
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.retry_backoff = retry_backoff
+        self.retry_max = retry_max
+        self.lease = lease
+        self.owner = (
+            f'{uuid.uuid4().hex[:12]}@{socket.gethostname()}:{os.getpid()}'
+        )[:64]
+        self.bucket = TokenBucket(rate, max(1, int(rate)))
+        self._bot: Bot | None = None
+        self._task: asyncio.Task | None = None
+        self._watcher: asyncio.Task | None = None
+        self._broadcast_id: int | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, bot: Bot) -> None:
+        """
+        Продолжение рассылки, прерванной остановкой бота,
+        и периодическая проверка аренды рассылок других процессов.
+        """
+
+        self._bot = bot
+        self._stopping = False
+        await self.resume()
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def resume(self) -> bool:
+        """
+        Продолжение выполняющейся рассылки, если её аренда свободна
+        или истекла. Возвращает True, если аренда получена.
+        """
+
+        if self.running:
+            return False
+        async with self.session_factory() as session:
+            broadcast = await BroadcastManager(session).claim_broadcast(
+                self.owner, self._lease_until()
+            )
+        if broadcast is None:
+            return False
+        bot_logger.info(
+            f'Продолжение рассылки {broadcast.id} '
+            f'после пользователя {broadcast.last_user_id}'
+        )
+        self._spawn(broadcast)
+        return True
+
+    async def stop(self) -> None:
+        """
+        Остановка отправки. Рассылка остаётся в статусе 'running',
+        аренда освобождается: рассылку сразу продолжит другой процесс
+        или этот при следующем запуске.
+        """
+
+        self._stopping = True
+        # Сначала проверка аренды: она может успеть запустить отправку.
+        for name in ('_watcher', '_task'):
+            task = getattr(self, name)
+            if task is None:
+                continue
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+            setattr(self, name, None)
+        if self._broadcast_id is None:
+            return
+        with suppress(Exception):
+            async with self.session_factory() as session:
+                await BroadcastManager(session).release_broadcast(
+                    self._broadcast_id, self.owner
+                )
+        self._broadcast_id = None
+
+    async def launch(
+            self,
+            bot: Bot,
+            text: str,
+            created_by: int | None = None
+    ) -> Broadcast | None:
+        """
+        Запуск новой рассылки с арендой этого процесса.
+        Возвращает None, если другая рассылка ещё выполняется
+        (в том числе в другом процессе).
+        """
+
+        self._bot = bot
+        if self.running:
+            return None
+        async with self.session_factory() as session:
+            broadcast = await BroadcastManager(session).create_broadcast(
+                text, created_by, self.owner, self._lease_until()
+            )
+        if broadcast is None:
+            return None
+        self._spawn(broadcast)
+        return broadcast
+
+    async def iter_users(
+            self,
+            broadcast_id: int,
+            after_id: int
+    ) -> AsyncIterator[tuple[int, list[tuple[int, int]]]]:
+        """
+        Страницы получателей: последний 'users.id' страницы
+        и пары ('users.id', 'telegram_id').
+        Каждая страница читается в отдельной короткой сессии.
+        """
+
+        while True:
+            last_id, page = await self._uninterrupted(
+                self._users_page(broadcast_id, after_id)
+            )
+            if last_id is None:
+                return
+            yield last_id, page
+            after_id = last_id
+
+    async def _users_page(
+            self,
+            broadcast_id: int,
+            after_id: int
+    ) -> tuple[int | None, list[tuple[int, int]]]:
+        async with self.session_factory() as session:
+            return await BroadcastManager(session).get_users_page(
+                broadcast_id, after_id, self.page_size
+            )
+
+    async def _uninterrupted(self, call: Awaitable[T]) -> T:
+        """
+        Запрос к бд, который не прерывается остановкой: отмена
+        откладывается до его завершения. Прерванный запрос может
+        оставить соединение с открытой транзакцией и блокировками.
+        """
+
+        task = asyncio.ensure_future(call)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            self._stopping = True
+            with suppress(Exception):
+                await task
+            raise
+
+    def _lease_until(self) -> datetime.datetime:
+        return datetime.datetime.now() + datetime.timedelta(seconds=self.lease)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 2)
+            try:
+                await self._uninterrupted(self.resume())
+            except Exception as e:
+                bot_logger.exception(f'Ошибка проверки аренды рассылки: {e}')
+
+    def _spawn(self, broadcast: Broadcast) -> None:
+        self._broadcast_id = broadcast.id
+        self._task = asyncio.create_task(self._run(
+            broadcast.id,
+            broadcast.text,
+            broadcast.last_user_id
+        ))
+
+    async def _run(self, broadcast_id: int, text: str, after_id: int) -> None:
+        attempt = 0
+        while True:
+            try:
+                async for last_id, page in self.iter_users(
+                        broadcast_id, after_id
+                ):
+                    status = await self._send_page(
+                        broadcast_id, text, last_id, page
+                    )
+                    if status is None:
+                        bot_logger.warning(
+                            f'Рассылка {broadcast_id} не найдена в бд'
+                        )
+                        return
+                    if status == STATUS_LEASE_LOST:
+                        bot_logger.warning(
+                            f'Рассылку {broadcast_id} продолжает '
+                            f'другой процесс'
+                        )
+                        return
+                    if status != STATUS_RUNNING:
+                        bot_logger.info(f'Рассылка {broadcast_id}: {status}')
+                        return
+                    after_id = last_id
+                    attempt = 0
+                await self._uninterrupted(self._finish(broadcast_id))
+                bot_logger.info(f'Рассылка {broadcast_id} завершена')
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._backoff(broadcast_id, attempt, e)
+                attempt += 1
+
+    async def _finish(self, broadcast_id: int) -> None:
+        async with self.session_factory() as session:
+            await BroadcastManager(session).finish_broadcast(broadcast_id)
+
+    async def _backoff(
+            self,
+            broadcast_id: int,
+            attempt: int,
+            error: Exception
+    ) -> None:
+        delay = min(self.retry_backoff * 2 ** attempt, self.retry_max)
+        bot_logger.exception(
+            f'Ошибка рассылки {broadcast_id}, '
+            f'повтор через {delay:g} с: {error}'
+        )
+        await asyncio.sleep(delay)
+
+    async def _send_page(
+            self,
+            broadcast_id: int,
+            text: str,
+            last_id: int,
+            page: list[tuple[int, int]]
+    ) -> str | None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            asyncio.create_task(self._send(semaphore, tg_id, text))
+            for _, tg_id in page
+        ]
+        try:
+            outcomes = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # Уже отправленные сообщения записываются без сдвига
+            # контрольной точки, чтобы не отправить их повторно.
+            done = {
+                user_id: task.result()
+                for (user_id, _), task in zip(page, tasks)
+                if task.done() and not task.cancelled()
+            }
+            if done:
+                await asyncio.shield(self._save(broadcast_id, done))
+            raise
+        results = {
+            user_id: outcome
+            for (user_id, _), outcome in zip(page, outcomes)
+        }
+        return await self._uninterrupted(
+            self._save(broadcast_id, results, last_id, retry=True)
+        )
+
+    async def _save(
+            self,
+            broadcast_id: int,
+            outcomes: dict[int, int],
+            last_id: int | None = None,
+            retry: bool = False
+    ) -> str | None:
+        """
+        Сохранение результатов страницы. При 'retry' ошибка бд
+        повторяется до успеха или остановки, чтобы уже отправленные
+        сообщения не были отправлены повторно.
+        """
+
+        attempt = 0
+        while True:
+            try:
+                async with self.session_factory() as session:
+                    return await BroadcastManager(session).save_progress(
+                        broadcast_id,
+                        outcomes,
+                        last_id,
+                        self.owner,
+                        self._lease_until()
+                    )
+            except Exception as e:
+                if not retry or self._stopping:
+                    raise
+                await self._backoff(broadcast_id, attempt, e)
+                attempt += 1
+
+    async def _send(
+            self,
+            semaphore: asyncio.Semaphore,
+            chat_id: int,
+            text: str
+    ) -> int:
+        async with semaphore:
+            wait = self.bucket.reserve(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                await self._bot.send_message(chat_id, text)
+            except TelegramForbiddenError:
+                return DELIVERY_BLOCKED
+            except TelegramAPIError as e:
+                bot_logger.warning(
+                    f'Рассылка в чат {chat_id} не доставлена: {e}'
+                )
+                return DELIVERY_FAILED
+            except Exception as e:
+                # Сетевая ошибка или таймаут не должны срывать всю
+                # страницу: иначе её результаты не сохранятся
+                # и она будет отправлена повторно.
+                bot_logger.warning(
+                    f'Рассылка в чат {chat_id} не доставлена '
+                    f'({type(e).__name__}): {e}'
+                )
+                return DELIVERY_FAILED
+            return DELIVERY_SENT
+
+
+broadcast_engine = BroadcastEngine()
@@ -0,0 +1,263 @@
+import asyncio
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType
+)
+from aiogram.fsm.scene import Scene
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Message, TelegramObject, Update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src.bot.service.routing import TextRouteIndex
+from src.db.core import current_session
+from src.manager.composite_manager import CompositeManager
+from src.metrics.latency import (
+    HandlerTiming,
+    LatencyStats,
+    UpdateTiming,
+    current_timing
+)
+
+
+class UnitOfWork:
+    """Сессия и менеджер апдейта с фиксацией и откатом транзакции."""
+
+    def __init__(self, session: AsyncSession, manager: CompositeManager):
+        self.session = session
+        self.manager = manager
+        self.task = asyncio.current_task()
+
+    async def commit(self) -> None:
+        await self.session.commit()
+        await self.manager.after_commit()
+
+    async def rollback(self) -> None:
+        await self.session.rollback()
+        self.manager.after_rollback()
+
+    async def commit_before_request(self) -> None:
+        """
+        Фиксация открытой транзакции перед запросом к Bot API.
+        Выполняется только в задаче апдейта: задачи, созданные
+        из хэндлера (например, 'sequencer'), наследуют контекст,
+        но не должны использовать чужую сессию.
+        """
+
+        if asyncio.current_task() is not self.task:
+            return
+        if not self.session.in_transaction():
+            return
+        await self.commit()
+
+
+# Unit of work текущего апдейта (см. DbSessionMiddleware).
+current_unit_of_work: ContextVar[UnitOfWork | None] = ContextVar(
+    'current_unit_of_work',
+    default=None
+)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Unit of work на один апдейт.
+
+    Открывает одну сессию на апдейт и передаёт в хэндлеры
+    готовый 'manager' (CompositeManager), в том числе в хэндлеры
+    сцен, куда переходят через 'wizard.goto'.
+    Изменения апдейта фиксируются перед каждым запросом к Bot API
+    (см. 'CommitBeforeRequestMiddleware') и в конце обработки,
+    поэтому соединение и блокировки строк не удерживаются,
+    пока запрос ждёт лимита или ответа Telegram.
+    При ошибке хэндлера или commit — rollback и 'after_rollback'
+    для изменений после последней фиксации.
+    Сессия также доступна через 'current_session',
+    чтобы в ту же транзакцию писали и другие компоненты (FSM-хранилище).
+    """
+
+    def __init__(self, session_factory: sessionmaker):
+        self.session_factory = session_factory
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        async with self.session_factory() as session:
+            manager = CompositeManager(session, autocommit=False)
+            unit = UnitOfWork(session, manager)
+            data['manager'] = manager
+            token = current_session.set(session)
+            unit_token = current_unit_of_work.set(unit)
+            try:
+                result = await handler(event, data)
+                await session.commit()
+            except Exception:
+                await unit.rollback()
+                raise
+            finally:
+                current_unit_of_work.reset(unit_token)
+                current_session.reset(token)
+            await manager.after_commit()
+            return result
+
+
+class CommitBeforeRequestMiddleware(BaseRequestMiddleware):
+    """
+    Фиксация unit of work апдейта перед запросом к Bot API.
+    Регистрируется первой в сессии бота, до 'rate_limiter',
+    чтобы ожидание лимитов шло уже без открытой транзакции.
+    """
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        unit = current_unit_of_work.get()
+        if unit is not None:
+            await unit.commit_before_request()
+        return await make_request(bot, method)
+
+
+class IntentMiddleware(BaseMiddleware):
+    """
+    Определение интента сообщения один раз на апдейт.
+
+    Текст нормализуется и ищется в 'TextRouteIndex' по текущей сцене,
+    результат передаётся фильтрам 'Intent' через 'intent'.
+    """
+
+    def __init__(self, index: TextRouteIndex):
+        self.index = index
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: Message,
+            data: dict[str, Any],
+    ) -> Any:
+        data['intent'] = self.index.resolve(data.get('raw_state'), event.text)
+        data['intent_resolved'] = True
+        return await handler(event, data)
+
+
+class UpdateLatencyMiddleware(BaseMiddleware):
+    """
+    Внешняя middleware замера времени апдейта.
+
+    Создаёт накопитель 'current_timing', в который попадает время бд,
+    Bot API и хэндлеров, и после обработки записывает апдейт в 'LatencyStats'.
+    Регистрируется первой, чтобы учитывать и commit unit of work.
+    """
+
+    def __init__(self, stats: LatencyStats):
+        self.stats = stats
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: dict[str, Any],
+    ) -> Any:
+        timing = UpdateTiming(event.event_type, event.update_id)
+        token = current_timing.set(timing)
+        try:
+            return await handler(event, data)
+        finally:
+            current_timing.reset(token)
+            self.stats.observe_update(timing)
+
+
+class HandlerLatencyMiddleware(BaseMiddleware):
+    """
+    Внутренняя middleware замера времени хэндлера.
+
+    Вызывается только для выбранного хэндлера, в том числе хэндлеров сцен
+    вложенных роутеров. Сцена берётся из хэндлера сцены,
+    иначе — из текущего состояния. Переходы через 'wizard.goto'
+    учитываются во времени вызвавшего их хэндлера.
+    """
+
+    def __init__(self, stats: LatencyStats):
+        self.stats = stats
+        self._names: dict[Callable, tuple[str, str | None]] = {}
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        timing = current_timing.get()
+        if timing is None:
+            return await handler(event, data)
+
+        name, scene = self._describe(data)
+        handler_timing = HandlerTiming(name, scene)
+        db, api = timing.db, timing.api
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_timing.total = time.perf_counter() - started
+            handler_timing.db = timing.db - db
+            handler_timing.api = timing.api - api
+            timing.handlers.append(handler_timing)
+            self.stats.observe_handler(handler_timing)
+
+    def _describe(self, data: dict[str, Any]) -> tuple[str, str]:
+        callback = data['handler'].callback
+        described = self._names.get(callback)
+        if described is None:
+            described = self._names[callback] = self._resolve(callback)
+        name, scene = described
+        return name, scene or data.get('raw_state') or '-'
+
+    @staticmethod
+    def _resolve(callback: Callable) -> tuple[str, str | None]:
+        """Имя хэндлера и состояние сцены, к которой он относится."""
+
+        scene_class = getattr(callback, 'scene', None)
+        if scene_class is not None:
+            callback = callback.handler.callback
+        else:
+            # Хэндлер входа в сцену из 'Scene.as_handler()'.
+            scene_class = inspect.getclosurevars(callback).nonlocals.get('cls')
+            if isinstance(scene_class, type) and issubclass(scene_class, Scene):
+                return (
+                    f'{scene_class.__name__}.as_handler',
+                    scene_class.__scene_config__.state
+                )
+            scene_class = None
+        name = getattr(callback, '__qualname__', repr(callback))
+        state = scene_class.__scene_config__.state if scene_class else None
+        return name, state
+
+
+class ApiLatencyMiddleware(BaseRequestMiddleware):
+    """Учёт времени запросов к Bot API в накопителе текущего апдейта."""
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        timing = current_timing.get()
+        if timing is None:
+            return await make_request(bot, method)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            timing.api += time.perf_counter() - started
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from typing import Iterable
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from src.logs.config import bot_logger
+from src.metrics.histogram import stats_lines
+import src.settings as setting
+
+
+class TokenBucket:
+    """
+    Token bucket с резервированием.
+
+    'reserve' сразу списывает токен (баланс может уйти в минус)
+    и возвращает, сколько нужно подождать до своей очереди,
+    поэтому ожидающие обслуживаются строго в порядке обращения.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def pause(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+    def is_idle(self, now: float) -> bool:
+        return (
+            self.tokens + (now - self.updated) * self.rate >= self.capacity
+            and self.blocked_until <= now
+        )
+
+
+class OutboundRateLimiter(BaseRequestMiddleware):
+    """
+    Ограничение исходящих запросов к Telegram (middleware сессии бота).
+
+    Методы с 'chat_id' сначала ждут своей очереди в бакете чата,
+    затем в глобальном бакете. Так один активный чат не занимает
+    весь глобальный лимит, а чаты обслуживаются по очереди.
+    'TelegramRetryAfter' приостанавливает на указанное время бакет чата
+    и глобальный бакет (flood control Telegram часто действует на весь
+    бот), после чего запрос повторяется.
+    """
+
+    def __init__(
+            self,
+            global_rate: float = setting.RATE_LIMIT_GLOBAL,
+            global_burst: int = setting.RATE_LIMIT_GLOBAL_BURST,
+            chat_rate: float = setting.RATE_LIMIT_CHAT,
+            chat_burst: int = setting.RATE_LIMIT_CHAT_BURST,
+            max_retries: int = setting.RATE_LIMIT_MAX_RETRIES,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: dict[int | str, TokenBucket] = {}
+        self._calls = 0
+
+        self.depth = 0
+        self.max_depth = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.retry_after = 0
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        for attempt in range(self.max_retries + 1):
+            chat_bucket = self._chat_bucket(chat_id)
+            await self._acquire(chat_bucket)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after += 1
+                if attempt == self.max_retries:
+                    raise
+                bot_logger.warning(
+                    f'Flood control в чате {chat_id}, '
+                    f'повтор через {e.retry_after} c'
+                )
+                until = time.monotonic() + e.retry_after
+                chat_bucket.pause(until)
+                self.global_bucket.pause(until)
+
+    def stats(self) -> dict:
+        """Метрики очереди и ожидания."""
+
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'waits': self.waits,
+            'wait_time': round(self.wait_time, 6),
+            'max_wait': round(self.max_wait, 6),
+            'retry_after': self.retry_after,
+            'chats': len(self._chat_buckets),
+        }
+
+    def collect(self) -> Iterable[str]:
+        """Метрики в текстовом формате Prometheus."""
+
+        yield from stats_lines(
+            'bot_rate_limiter',
+            self.stats(),
+            ('waits', 'wait_time', 'retry_after')
+        )
+
+    async def _acquire(self, chat_bucket: TokenBucket) -> None:
+        started = time.monotonic()
+        chat_wait = chat_bucket.reserve(started)
+        if chat_wait <= 0:
+            global_wait = self.global_bucket.reserve(started)
+            if global_wait <= 0:
+                return
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        try:
+            if chat_wait > 0:
+                await asyncio.sleep(chat_wait)
+                global_wait = self.global_bucket.reserve(time.monotonic())
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+        finally:
+            self.depth -= 1
+
+        waited = time.monotonic() - started
+        self.waits += 1
+        self.wait_time += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+
+        self._calls += 1
+        if self._calls % 1000 == 0:
+            now = time.monotonic()
+            self._chat_buckets = {
+                key: value for key, value in self._chat_buckets.items()
+                if key == chat_id or not value.is_idle(now)
+            }
+        return bucket
+
+
+rate_limiter = OutboundRateLimiter()
@@ -0,0 +1,77 @@
+from aiogram import Bot, F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from src.bot.broadcast import broadcast_engine
+import src.bot.service.msg_text as msg
+from src.manager.composite_manager import CompositeManager
+import src.settings as setting
+
+admin_router = Router()
+admin_router.message.filter(F.from_user.id.in_(setting.ADMIN_IDS))
+
+ACT_NAMES = {
+    code: setting.ACT_STATE.get(name, name)
+    for name, code in setting.ACT_CODE.items()
+}
+
+
+@admin_router.message(Command('stats'))
+async def stats_cmd(message: Message, manager: CompositeManager):
+    funnel = await manager.get_funnel()
+    if not funnel:
+        return message.reply(msg.STATS_EMPTY)
+    order = list(setting.ACT_CODE.values())
+    lines = [msg.STATS_TITLE] + [
+        msg.STATS_LINE.format(
+            name=ACT_NAMES.get(act_code, act_code),
+            act_code=act_code,
+            players=players,
+            reached=reached,
+        )
+        for act_code, (players, reached) in sorted(
+            funnel.items(),
+            key=lambda item: (
+                order.index(item[0]) if item[0] in order else len(order)
+            )
+        )
+    ]
+    return message.reply('\n'.join(lines))
+
+
+@admin_router.message(Command('broadcast'))
+async def broadcast_cmd(message: Message, command: CommandObject, bot: Bot):
+    if not command.args:
+        return message.reply(msg.BROADCAST_USAGE)
+    broadcast = await broadcast_engine.launch(
+        bot, command.args, message.from_user.id
+    )
+    if broadcast is None:
+        return message.reply(msg.BROADCAST_BUSY)
+    return message.reply(msg.BROADCAST_STARTED.format(
+        id=broadcast.id, total=broadcast.total
+    ))
+
+
+@admin_router.message(Command('broadcast_status'))
+async def broadcast_status_cmd(message: Message, manager: CompositeManager):
+    broadcast = await manager.get_broadcast()
+    if broadcast is None:
+        return message.reply(msg.BROADCAST_NONE)
+    return message.reply(msg.BROADCAST_STATUS.format(
+        id=broadcast.id,
+        status=broadcast.status,
+        last_user_id=broadcast.last_user_id,
+        total=broadcast.total,
+        sent=broadcast.sent,
+        blocked=broadcast.blocked,
+        failed=broadcast.failed,
+    ))
+
+
+@admin_router.message(Command('broadcast_cancel'))
+async def broadcast_cancel_cmd(message: Message, manager: CompositeManager):
+    broadcast = await manager.cancel_broadcast()
+    if broadcast is None:
+        return message.reply(msg.BROADCAST_NOT_RUNNING)
+    return message.reply(msg.BROADCAST_CANCELLED.format(id=broadcast.id))
@@ -1,5 +1,10 @@
 UNKNOWN_USER_NAME = 'Участник'
 HINT = 'подсказка'
+# Суффикс состояния в истории для запросов подсказки.
+HINT_STATE_SUFFIX = ':hint'
+# Суффикс состояния в истории для решения финального акта: другие
+# сообщения в финальной сцене пишутся с состоянием самого акта.
+SOLVED_STATE_SUFFIX = ':solved'
 
 START_QUEST_CMD = 'start_quest'
 
@@ -7,3 +12,13 @@ FIRST_ACT_NAME = 'Акт первый'
 SECOND_ACT_NAME = 'Акт второй'
 THIRD_ACT_NAME = 'Акт третий'
 FINAL_ACT_NAME = 'Финал'
+
+INTENT_HELP = 'help'
+INTENT_START = 'start'
+INTENT_HINT = 'hint'
+INTENT_FIRST_CODE = 'first_code'
+INTENT_SECOND_CODE = 'second_code'
+INTENT_THIRD_CODE = 'third_code'
+INTENT_MISTAKE = 'mistake'
+INTENT_ANOTHER = 'another'
+INTENT_FINAL_CODE = 'final_code'
@@ -0,0 +1,79 @@
+import heapq
+from collections import Counter
+from typing import Iterable
+
+from fuzzywuzzy import fuzz
+
+import src.settings as setting
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы текста с пробелом по краям."""
+
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Нечёткий поиск слова в словаре с опечатками.
+
+    Индекс триграмм строится один раз: для запроса отбираются
+    'candidates' слов с наибольшим числом общих триграмм
+    (при равенстве — ближайших по длине),
+    и только они сравниваются через 'fuzz.ratio'.
+    Кандидаты, длина которых не позволяет набрать порог,
+    отбрасываются без сравнения.
+    Стоимость поиска определяется длиной запроса и числом кандидатов,
+    а не размером словаря.
+    """
+
+    def __init__(
+            self,
+            words: Iterable[str],
+            threshold: int = setting.FUZZY_THRESHOLD,
+            min_length: int = setting.FUZZY_MIN_LENGTH,
+            candidates: int = 5,
+    ):
+        self.threshold = threshold
+        self.min_length = min_length
+        self.candidates = candidates
+        self._words: list[str] = list(dict.fromkeys(words))
+        self._postings: dict[str, list[int]] = {}
+        for number, word in enumerate(self._words):
+            for gram in trigrams(word):
+                self._postings.setdefault(gram, []).append(number)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def match(self, text: str) -> tuple[str, int] | None:
+        """
+        Поиск ближайшего слова.
+        Возвращает (слово, оценка) или None, если оценка ниже порога.
+        """
+
+        if not self.threshold or len(text) < self.min_length:
+            return None
+
+        shared: Counter[int] = Counter()
+        for gram in trigrams(text):
+            for number in self._postings.get(gram, ()):
+                shared[number] += 1
+        ranked = heapq.nsmallest(
+            self.candidates,
+            shared,
+            key=lambda n: (-shared[n], abs(len(self._words[n]) - len(text)))
+        )
+        best = None
+        for number in ranked:
+            word = self._words[number]
+            shortest = min(len(text), len(word))
+            if 200 * shortest < self.threshold * (len(text) + len(word)):
+                continue
+            score = fuzz.ratio(text, word)
+            if best is None or score > best[1]:
+                best = (word, score)
+        if best is None or best[1] < self.threshold:
+            return None
+        return best
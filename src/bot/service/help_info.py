@@ -1,8 +1,10 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
+import src.bot.service.constants as const
 import src.bot.service.msg_text as msg
+from src.bot.service.routing import Intent
 
 help_info_router = Router()
 
@@ -17,6 +19,6 @@ async def help_cmd(message: Message):
     return message.reply(msg.HELP_MESSAGE)
 
 
-@help_info_router.message(F.text.lower().in_(msg.HELP_WORDS))
+@help_info_router.message(Intent(const.INTENT_HELP))
 async def help_msg(message: Message):
     return message.reply(msg.HELP_MESSAGE)
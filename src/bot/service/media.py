@@ -0,0 +1,95 @@
+import hashlib
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, Message
+
+from src.logs.config import bot_logger
+from src.manager.composite_manager import CompositeManager
+import src.settings as setting
+
+# Фрагменты ответа Telegram на недействительный или устаревший 'file_id'.
+INVALID_FILE_ID_ERRORS: tuple[str, ...] = (
+    'wrong file identifier',
+    'wrong remote file identifier',
+    'file_id_invalid',
+    'wrong file_id',
+    'file reference',
+)
+
+
+class MediaRegistry:
+    """
+    Реестр медиафайлов, загруженных в Telegram.
+
+    Каждый файл загружается один раз, полученный 'file_id'
+    сохраняется в бд по хэшу содержимого и переиспользуется.
+    Хэш пересчитывается только при изменении файла (mtime/размер),
+    поэтому изменённый файл автоматически загружается заново.
+    Если Telegram отклоняет сохранённый 'file_id' как недействительный,
+    файл перезагружается; остальные ошибки запроса пробрасываются.
+    """
+
+    def __init__(self, media_dir: Path = setting.MEDIA_DIR):
+        self.media_dir = media_dir
+        self._hashes: dict[str, tuple[int, int, str]] = {}
+        self._file_ids: dict[str, str] = {}
+
+    def content_hash(self, file_name: str) -> str:
+        """Хэш содержимого файла, пересчитываемый только при его изменении."""
+
+        path = self.media_dir / file_name
+        stat = path.stat()
+        cached = self._hashes.get(file_name)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        content_hash = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._hashes[file_name] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    @staticmethod
+    def is_invalid_file_id(error: TelegramBadRequest) -> bool:
+        message = error.message.lower()
+        return any(fragment in message for fragment in INVALID_FILE_ID_ERRORS)
+
+    async def send_photo(
+            self,
+            bot: Bot,
+            chat_id: int,
+            file_name: str,
+            manager: CompositeManager
+    ) -> Message:
+        """Отправка фото по сохранённому 'file_id' или с загрузкой файла."""
+
+        content_hash = self.content_hash(file_name)
+        file_id = self._file_ids.get(content_hash)
+        if file_id is None:
+            media = await manager.get_media(content_hash)
+            file_id = media.file_id if media else None
+
+        if file_id is not None:
+            try:
+                sent = await bot.send_photo(chat_id=chat_id, photo=file_id)
+                self._file_ids[content_hash] = file_id
+                return sent
+            except TelegramBadRequest as e:
+                if not self.is_invalid_file_id(e):
+                    raise
+                bot_logger.warning(
+                    f'Telegram отклонил file_id для {file_name}, '
+                    f'файл будет загружен заново: {str(e)}'
+                )
+                self._file_ids.pop(content_hash, None)
+
+        sent = await bot.send_photo(
+            chat_id=chat_id,
+            photo=FSInputFile(self.media_dir / file_name)
+        )
+        file_id = sent.photo[-1].file_id
+        await manager.save_media(content_hash, file_name, file_id)
+        self._file_ids[content_hash] = file_id
+        return sent
+
+
+media_registry = MediaRegistry()
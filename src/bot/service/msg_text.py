@@ -137,3 +137,21 @@ EXIT_MSG = (
     'Ты вернулся в начало.\n'
     'Для начала напиши: "привет".'
 )
+
+STATS_TITLE = 'Воронка квеста (сейчас / всего дошли):'
+STATS_LINE = '{name} ({act_code}): {players} / {reached}'
+STATS_EMPTY = 'Счётчики воронки пока пусты.'
+
+BROADCAST_USAGE = 'Текст рассылки: /broadcast <текст сообщения>'
+BROADCAST_STARTED = 'Рассылка {id} запущена, получателей: {total}.'
+BROADCAST_BUSY = (
+    'Уже выполняется другая рассылка: /broadcast_status, /broadcast_cancel.'
+)
+BROADCAST_STATUS = (
+    'Рассылка {id} ({status}): обработано до пользователя {last_user_id}, '
+    'получателей {total}.\n'
+    'Доставлено: {sent}, заблокировали бота: {blocked}, ошибок: {failed}.'
+)
+BROADCAST_NONE = 'Рассылок пока не было.'
+BROADCAST_CANCELLED = 'Рассылка {id} отменена.'
+BROADCAST_NOT_RUNNING = 'Нет выполняющейся рассылки.'
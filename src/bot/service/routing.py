@@ -0,0 +1,203 @@
+from typing import Iterable
+
+from aiogram.filters import Filter
+from aiogram.types import Message
+
+import src.bot.service.constants as const
+from src.bot.service.fuzzy import TrigramIndex
+import src.bot.service.msg_text as msg
+import src.settings as setting
+
+
+def normalize(text: str | None) -> str | None:
+    """Приведение текста сообщения к виду, по которому строится индекс."""
+
+    if text is None:
+        return None
+    return text.strip().lower()
+
+
+class TextRouteIndex:
+    """
+    Предварительно построенный индекс текстовых интентов.
+
+    Вместо цепочки фильтров 'F.text.lower() == ...' и
+    'F.text.lower().in_(...)' текст нормализуется один раз на апдейт,
+    а интент находится одним поиском в словаре
+    по ключу (сцена, нормализованный текст).
+
+    Интенты без сцены действуют в любом состоянии и имеют приоритет
+    над интентами сцены, как и хэндлеры роутеров верхнего уровня.
+    При совпадении слов выигрывает интент, добавленный первым,
+    как и хэндлер, зарегистрированный первым.
+
+    Для интентов с 'fuzzy=True' при промахе текст ищется
+    в 'TrigramIndex' с допуском опечаток. Коды актов нечётко
+    не сопоставляются, чтобы их нельзя было подобрать.
+    """
+
+    def __init__(self):
+        self._routes: dict[tuple[str | None, str], str] = {}
+        self._scenes: set[str] = set()
+        self._filters: dict[str | None, int] = {}
+        self._scope_filters: dict[str | None, int] = {}
+        self._fuzzy_words: set[tuple[str | None, str]] = set()
+        self._fuzzy: dict[str | None, TrigramIndex] = {}
+
+        self.lookups = 0
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.filters_saved = 0
+
+    def add(
+            self,
+            intent: str,
+            words: Iterable[str],
+            scene: str | None = None,
+            fuzzy: bool = False
+    ) -> None:
+        """
+        Регистрация интента: набор слов заменяет один текстовый фильтр.
+        'scene' — состояние сцены, в которой действует интент,
+        'fuzzy' — разрешить поиск с опечатками.
+        """
+
+        for word in words:
+            key = (scene, normalize(str(word)))
+            self._routes.setdefault(key, intent)
+            if fuzzy:
+                self._fuzzy_words.add(key)
+        if scene is not None:
+            self._scenes.add(scene)
+        self._filters[scene] = self._filters.get(scene, 0) + 1
+
+    def freeze(self) -> None:
+        """
+        Слияние глобальных интентов в интенты каждой сцены,
+        чтобы поиск выполнялся одним обращением к словарю.
+        """
+
+        global_routes = {
+            text: intent
+            for (scene, text), intent in self._routes.items()
+            if scene is None
+        }
+        for scene in self._scenes:
+            for text, intent in global_routes.items():
+                self._routes[(scene, text)] = intent
+
+        global_fuzzy = [
+            text for scene, text in self._fuzzy_words if scene is None
+        ]
+        for scope in (None, *self._scenes):
+            words = [
+                text for scene, text in self._fuzzy_words
+                if scene == scope and scope is not None
+            ]
+            self._fuzzy[scope] = TrigramIndex(sorted(global_fuzzy + words))
+
+        global_filters = self._filters.get(None, 0)
+        self._scope_filters = {
+            scene: global_filters + self._filters[scene]
+            for scene in self._scenes
+        }
+        self._scope_filters[None] = global_filters
+
+    def resolve(self, scene: str | None, text: str | None) -> str | None:
+        """Поиск интента для текущей сцены и текста сообщения."""
+
+        if text is None:
+            return None
+        scope = scene if scene in self._scenes else None
+        self.lookups += 1
+        self.filters_saved += self._scope_filters.get(scope, 0)
+        text = normalize(text)
+        intent = self._routes.get((scope, text))
+        if intent is not None:
+            self.hits += 1
+            return intent
+
+        match = self._fuzzy[scope].match(text) if self._fuzzy else None
+        if match is not None:
+            self.fuzzy_hits += 1
+            return self._routes[(scope, match[0])]
+        return None
+
+    def stats(self) -> dict:
+        """
+        Метрики индекса. 'filters_saved_per_update' — сколько
+        текстовых фильтров с 'lower()' и поиском по списку
+        заменил один поиск в словаре.
+        """
+
+        return {
+            'routes': len(self._routes),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'fuzzy_hits': self.fuzzy_hits,
+            'filters_saved': self.filters_saved,
+            'filters_saved_per_update': (
+                round(self.filters_saved / self.lookups, 2)
+                if self.lookups else 0.0
+            ),
+        }
+
+
+class Intent(Filter):
+    """
+    Фильтр по интенту, найденному 'IntentMiddleware'.
+    Без middleware интент вычисляется самим фильтром.
+    """
+
+    def __init__(self, intent: str):
+        self.intent = intent
+
+    async def __call__(
+            self,
+            message: Message,
+            raw_state: str | None = None,
+            intent: str | None = None,
+            intent_resolved: bool = False,
+    ) -> bool:
+        if not intent_resolved:
+            intent = route_index.resolve(raw_state, message.text)
+        return intent == self.intent
+
+
+route_index = TextRouteIndex()
+route_index.add(const.INTENT_HELP, msg.HELP_WORDS, fuzzy=True)
+route_index.add(const.INTENT_START, msg.START_WORDS, fuzzy=True)
+for act_state, code, intent in (
+        (setting.ACT_STATE['1'], msg.FIRST_ACT_KEY, const.INTENT_FIRST_CODE),
+        (setting.ACT_STATE['2'], msg.SECOND_ACT_KEY, const.INTENT_SECOND_CODE),
+        (setting.ACT_STATE['3'], msg.THIRD_ACT_KEY, const.INTENT_THIRD_CODE),
+):
+    route_index.add(intent, [code], scene=act_state)
+    route_index.add(
+        const.INTENT_HINT,
+        [const.HINT],
+        scene=act_state,
+        fuzzy=True
+    )
+route_index.add(
+    const.INTENT_MISTAKE,
+    msg.MISTAKE_KEYS,
+    scene=setting.ACT_STATE['final']
+)
+route_index.add(
+    const.INTENT_ANOTHER,
+    msg.ANOTHER_KEY,
+    scene=setting.ACT_STATE['final']
+)
+route_index.add(
+    const.INTENT_FINAL_CODE,
+    msg.FINAL_ACT_KEY,
+    scene=setting.ACT_STATE['final']
+)
+route_index.add(
+    const.INTENT_HINT,
+    [const.HINT],
+    scene=setting.ACT_STATE['final'],
+    fuzzy=True
+)
+route_index.freeze()
@@ -0,0 +1,165 @@
+import asyncio
+import heapq
+import itertools
+from collections import deque
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Iterable
+
+from src.logs.config import bot_logger
+from src.metrics.histogram import stats_lines
+
+Send = Callable[[], Awaitable[Any]]
+Step = tuple[float, Send]
+
+
+class MessageSequencer:
+    """
+    Планировщик отложенных исходящих сообщений.
+
+    Хэндлер передаёт список шагов (задержка, отправка) и сразу возвращается,
+    вместо того чтобы ждать в 'asyncio.sleep' с занятой блокировкой FSM.
+    Все шаги лежат в одной куче и обслуживаются одной задачей-таймером.
+    Задержка шага отсчитывается от предыдущего шага того же чата,
+    а отправка в каждом чате идёт строго по очереди.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, int, Send]] = []
+        self._counter = itertools.count()
+        self._chat_tail: dict[int, float] = {}
+        self._chat_queues: dict[int, deque[Send]] = {}
+        self._workers: set[asyncio.Task] = set()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+        self.scheduled = 0
+        self.sent = 0
+        self.failed = 0
+        self.max_lag = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Запуск задачи-таймера."""
+
+        self._ensure_started()
+
+    async def stop(self) -> None:
+        """
+        Остановка планировщика.
+        Оставшиеся шаги отправляются сразу, без задержек, с сохранением порядка.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        while self._heap:
+            _, _, chat_id, send = heapq.heappop(self._heap)
+            self._dispatch(chat_id, send)
+        self._chat_tail.clear()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def schedule(self, chat_id: int, steps: list[Step]) -> None:
+        """
+        Постановка шагов в очередь отправки для чата.
+        Задержка каждого шага отсчитывается от предыдущего.
+        """
+
+        self._ensure_started()
+        now = asyncio.get_running_loop().time()
+        due = max(self._chat_tail.get(chat_id, now), now)
+        earliest = self._heap[0][0] if self._heap else None
+        for delay, send in steps:
+            due += delay
+            heapq.heappush(
+                self._heap,
+                (due, next(self._counter), chat_id, send)
+            )
+            self.scheduled += 1
+        self._chat_tail[chat_id] = due
+
+        if earliest is None or self._heap[0][0] < earliest:
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        """Метрики планировщика."""
+
+        return {
+            'pending': len(self._heap),
+            'scheduled': self.scheduled,
+            'sent': self.sent,
+            'failed': self.failed,
+            'max_lag': round(self.max_lag, 6),
+        }
+
+    def collect(self) -> Iterable[str]:
+        """Метрики в текстовом формате Prometheus."""
+
+        yield from stats_lines(
+            'bot_sequencer',
+            self.stats(),
+            ('scheduled', 'sent', 'failed')
+        )
+
+    def _ensure_started(self) -> None:
+        if self.is_running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - loop.time()
+            if delay > 0:
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                continue
+
+            due, _, chat_id, send = heapq.heappop(self._heap)
+            self.max_lag = max(self.max_lag, loop.time() - due)
+            if self._chat_tail.get(chat_id) == due:
+                del self._chat_tail[chat_id]
+            self._dispatch(chat_id, send)
+
+    def _dispatch(self, chat_id: int, send: Send) -> None:
+        queue = self._chat_queues.get(chat_id)
+        if queue is not None:
+            queue.append(send)
+            return
+        self._chat_queues[chat_id] = deque([send])
+        worker = asyncio.create_task(self._drain(chat_id))
+        self._workers.add(worker)
+        worker.add_done_callback(self._workers.discard)
+
+    async def _drain(self, chat_id: int) -> None:
+        queue = self._chat_queues[chat_id]
+        try:
+            while queue:
+                send = queue.popleft()
+                try:
+                    await send()
+                except Exception as e:
+                    self.failed += 1
+                    bot_logger.exception(
+                        f'Ошибка отложенной отправки в чат {chat_id}: {str(e)}'
+                    )
+                else:
+                    self.sent += 1
+        finally:
+            del self._chat_queues[chat_id]
+
+
+sequencer = MessageSequencer()
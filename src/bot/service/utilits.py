@@ -1,17 +1,29 @@
 from aiogram import Bot
-from aiogram.types import FSInputFile, Message
+from aiogram.types import Message
 
-import src.settings as setting
+import src.bot.service.constants as const
+
+from src.bot.service.media import media_registry
+from src.manager.composite_manager import CompositeManager
 
 
 async def send_hint(
         message: Message,
         bot: Bot, hint_text: str,
-        photo_name: str
+        photo_name: str,
+        manager: CompositeManager,
+        state: str
 ) -> None:
+    """
+    Отправка подсказки акта.
+    Запрос подсказки записывается в историю с состоянием
+    '<сцена>:hint' для аналитики использования подсказок.
+    """
+    await manager.write_history(message, state + const.HINT_STATE_SUFFIX)
     await message.reply(hint_text)
-    photo_path = setting.BASE_DIR / 'src' / 'bot' / 'media' / photo_name
-    await bot.send_photo(
-        chat_id=message.chat.id,
-        photo=FSInputFile(photo_path)
+    await media_registry.send_photo(
+        bot,
+        message.chat.id,
+        photo_name,
+        manager
     )
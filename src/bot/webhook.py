@@ -0,0 +1,115 @@
+import asyncio
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import (
+    SimpleRequestHandler,
+    setup_application
+)
+from aiohttp import web
+
+from src.logs.config import bot_logger
+import src.settings as setting
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука с ограничением числа одновременно
+    обрабатываемых апдейтов.
+
+    Место занимается до создания фоновой задачи: если все
+    'max_in_flight' мест заняты, Telegram получает 503 и повторяет
+    доставку позже, поэтому очередь апдейтов в процессе не растёт.
+    Принятый апдейт сразу получает ответ 200 и обрабатывается в фоне.
+    Секретный токен проверяется в 'SimpleRequestHandler'.
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            max_in_flight: int = setting.WEBHOOK_MAX_IN_FLIGHT,
+            **kwargs: Any
+    ):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self.rejected = 0
+
+    async def _handle_request_background(
+            self,
+            bot: Bot,
+            request: web.Request
+    ) -> web.Response:
+        if self._in_flight.locked():
+            self.rejected += 1
+            return web.Response(
+                status=503,
+                headers={'Retry-After': str(setting.WEBHOOK_RETRY_AFTER)}
+            )
+        await self._in_flight.acquire()
+        try:
+            return await super()._handle_request_background(bot, request)
+        except BaseException:
+            self._in_flight.release()
+            raise
+
+    async def _background_feed_update(
+            self,
+            bot: Bot,
+            update: dict[str, Any]
+    ) -> None:
+        try:
+            await super()._background_feed_update(bot, update)
+        finally:
+            self._in_flight.release()
+
+    async def close(self) -> None:
+        """Дожидается обработки принятых апдейтов и закрывает сессию бота."""
+
+        if self._background_feed_update_tasks:
+            await asyncio.gather(
+                *self._background_feed_update_tasks,
+                return_exceptions=True
+            )
+        await super().close()
+
+
+async def set_webhook(bot: Bot) -> None:
+    """Регистрация вебхука в Telegram, если задан публичный 'WEBHOOK_URL'."""
+
+    if not setting.WEBHOOK_URL:
+        return
+    await bot.set_webhook(
+        f'{setting.WEBHOOK_URL}{setting.WEBHOOK_PATH}',
+        secret_token=setting.WEBHOOK_SECRET,
+        max_connections=setting.WEBHOOK_MAX_CONNECTIONS,
+    )
+
+
+async def start_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """
+    Запуск aiohttp-сервера, принимающего апдейты через вебхук.
+    Работает до отмены задачи.
+    """
+
+    app = web.Application()
+    BoundedRequestHandler(
+        dp,
+        bot,
+        secret_token=setting.WEBHOOK_SECRET,
+    ).register(app, path=setting.WEBHOOK_PATH)
+    dp.startup.register(set_webhook)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, setting.WEBHOOK_HOST, setting.WEBHOOK_PORT)
+    await site.start()
+    bot_logger.info(
+        f'Webhook слушает {setting.WEBHOOK_HOST}:{setting.WEBHOOK_PORT}'
+        f'{setting.WEBHOOK_PATH}'
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,14 +1,135 @@
+import asyncio
+from contextvars import ContextVar
+
+from sqlalchemy import text
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
-from src.settings import DATABASES
+from src.logs.config import db_logger
+from src.metrics.sql import InstrumentedQueuePool, sql_metrics
+import src.settings as setting
+
+
+def engine_options(url: str | URL) -> dict:
+    """
+    Параметры пула и соединений для 'create_async_engine' из настроек.
+
+    SQLite работает без пула очередей, поэтому параметры пула
+    для него не передаются и время выдачи соединения не измеряется.
+    Для asyncpg задаются кэш подготовленных запросов
+    и 'statement_timeout' каждого соединения.
+    """
+
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        return {}
 
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': setting.DB_POOL_SIZE,
+        'max_overflow': setting.DB_MAX_OVERFLOW,
+        'pool_timeout': setting.DB_POOL_TIMEOUT,
+        'pool_recycle': setting.DB_POOL_RECYCLE,
+        'pool_pre_ping': setting.DB_POOL_PRE_PING,
+    }
+    if url.get_driver_name() == 'asyncpg':
+        connect_args: dict = {
+            'prepared_statement_cache_size': setting.DB_STATEMENT_CACHE_SIZE,
+        }
+        if setting.DB_STATEMENT_TIMEOUT:
+            connect_args['server_settings'] = {
+                'statement_timeout': str(setting.DB_STATEMENT_TIMEOUT),
+            }
+        options['connect_args'] = connect_args
+    return options
+
+
+# В режиме 'production' эхо SQL идёт только через мост logging -> Loguru
+# (см. 'configure_std_logging'), без собственного хэндлера SQLAlchemy.
 engine = create_async_engine(
-    DATABASES['APP']['URL'], echo=True
+    setting.DATABASES['APP']['URL'],
+    echo=setting.LOG_MODE == 'debug' and setting.SQL_ECHO_SAMPLE_RATE > 0,
+    **engine_options(setting.DATABASES['APP']['URL'])
 )
+sql_metrics.instrument(engine)
 
 async_session = sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False,
 )
+
+# Реплика для чтения, если задан 'DATABASE_REPLICA_URL' (см. 'replica_router').
+replica_engine = (
+    create_async_engine(
+        setting.DATABASES['REPLICA']['URL'],
+        **engine_options(setting.DATABASES['REPLICA']['URL'])
+    )
+    if setting.DATABASES['REPLICA']['URL']
+    else None
+)
+replica_session = None
+if replica_engine is not None:
+    sql_metrics.instrument(replica_engine, role='replica')
+    replica_session = sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
+# Сессия unit of work текущего апдейта (см. DbSessionMiddleware).
+current_session: ContextVar[AsyncSession | None] = ContextVar(
+    'current_session',
+    default=None
+)
+
+
+async def warm_up_pool(count: int = setting.DB_POOL_WARMUP) -> None:
+    """
+    Открытие 'count' соединений при старте, чтобы первые апдейты
+    не ждали установки соединений с бд.
+    """
+
+    if not isinstance(engine.pool, InstrumentedQueuePool):
+        count = min(count, 1)
+    count = min(count, setting.DB_POOL_SIZE)
+    if count <= 0:
+        return
+
+    async def ping(connection) -> None:
+        await connection.execute(text('SELECT 1'))
+
+    connections = [engine.connect() for _ in range(count)]
+    opened = await asyncio.gather(
+        *(connection.start() for connection in connections),
+        return_exceptions=True
+    )
+    try:
+        await asyncio.gather(*(
+            ping(connection)
+            for connection, result in zip(connections, opened)
+            if not isinstance(result, Exception)
+        ))
+    finally:
+        for connection in connections:
+            await connection.close()
+    failed = [result for result in opened if isinstance(result, Exception)]
+    if failed:
+        db_logger.warning(
+            f'Прогрев пула: не удалось открыть {len(failed)} из {count} '
+            f'соединений: {failed[0]}'
+        )
+    db_logger.info(f'Пул соединений прогрет: {pool_stats()}')
+
+
+def pool_stats() -> dict:
+    """
+    Состояние пула соединений: размер, выданные и свободные соединения,
+    переполнение и число ожидающих соединения запросов.
+    """
+
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {'pool': type(pool).__name__}
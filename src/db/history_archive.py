@@ -0,0 +1,456 @@
+import asyncio
+import datetime
+import gzip
+import json
+import re
+from contextlib import suppress
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.db.core import engine
+from src.db.models import MessageContent, UsersHistory
+from src.logs.config import db_logger
+from src.metrics.sql import current_method
+import src.settings as setting
+
+PARTITION_RE = re.compile(r'^users_history_p(\d{4})(\d{2})$')
+ARCHIVE_RE = re.compile(
+    r'^users_history_(\d{4})-(\d{2})(?:\.(\d+))?\.jsonl\.gz$'
+)
+DEFAULT_PARTITION = 'users_history_default'
+
+
+def month_start(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    number = month.year * 12 + month.month - 1 + count
+    return datetime.date(number // 12, number % 12 + 1, 1)
+
+
+def month_datetime(month: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(month, datetime.time())
+
+
+def partition_name(month: datetime.date) -> str:
+    return f'users_history_p{month:%Y%m}'
+
+
+def archive_name(month: datetime.date, last_id: int | None = None) -> str:
+    """
+    Имя файла архива месяца. Каждая выгрузка месяца пишется отдельным
+    файлом с наибольшим 'id' выгруженных строк в имени
+    (имя без 'id' — файл прежнего формата).
+    """
+
+    if last_id is None:
+        return f'users_history_{month:%Y-%m}.jsonl.gz'
+    return f'users_history_{month:%Y-%m}.{last_id}.jsonl.gz'
+
+
+def archive_parts(
+        archive_dir: Path
+) -> dict[datetime.date, list[tuple[int | None, Path]]]:
+    """Файлы архива по месяцам в порядке выгрузки."""
+
+    parts: dict[datetime.date, list[tuple[int | None, Path]]] = {}
+    if not archive_dir.exists():
+        return parts
+    for path in archive_dir.iterdir():
+        match = ARCHIVE_RE.match(path.name)
+        if match:
+            month = datetime.date(int(match[1]), int(match[2]), 1)
+            last_id = int(match[3]) if match[3] else None
+            parts.setdefault(month, []).append((last_id, path))
+    for files in parts.values():
+        files.sort(key=lambda item: -1 if item[0] is None else item[0])
+    return parts
+
+
+async def is_partitioned(connection: AsyncConnection) -> bool:
+    """Секционирована ли 'users_history' (ревизия 0003, только PostgreSQL)."""
+
+    if connection.dialect.name != 'postgresql':
+        return False
+    result = await connection.execute(text(
+        'SELECT 1 FROM pg_partitioned_table p '
+        'JOIN pg_class c ON c.oid = p.partrelid '
+        "WHERE c.relname = 'users_history'"
+    ))
+    return result.first() is not None
+
+
+async def list_partitions(connection: AsyncConnection) -> list[datetime.date]:
+    """Месяцы существующих помесячных секций 'users_history'."""
+
+    result = await connection.execute(text(
+        'SELECT c.relname FROM pg_inherits i '
+        'JOIN pg_class c ON c.oid = i.inhrelid '
+        'JOIN pg_class p ON p.oid = i.inhparent '
+        "WHERE p.relname = 'users_history'"
+    ))
+    months = []
+    for (name,) in result:
+        match = PARTITION_RE.match(name)
+        if match:
+            months.append(datetime.date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+async def ensure_partitions(
+        engine: AsyncEngine = engine,
+        months_ahead: int = setting.HISTORY_PARTITIONS_AHEAD,
+) -> list[str]:
+    """
+    Создание секций 'users_history' на текущий месяц
+    и 'months_ahead' месяцев вперёд. Возвращает имена созданных секций.
+
+    Секцию нельзя создать, если в секции по умолчанию уже есть строки
+    за этот месяц: такая ошибка только записывается в лог.
+    """
+
+    async with engine.connect() as connection:
+        if not await is_partitioned(connection):
+            return []
+        existing = set(await list_partitions(connection))
+
+    created = []
+    month = month_start(datetime.date.today())
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            name = partition_name(month)
+            try:
+                async with engine.begin() as connection:
+                    await connection.execute(text(
+                        f'CREATE TABLE IF NOT EXISTS {name} '
+                        f'PARTITION OF users_history FOR VALUES '
+                        f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+                    ))
+            except Exception as e:
+                db_logger.warning(f'Не удалось создать секцию {name}: {e}')
+            else:
+                created.append(name)
+        month = add_months(month, 1)
+    if created:
+        db_logger.info(f'Созданы секции истории: {", ".join(created)}')
+    return created
+
+
+class HistoryArchiver:
+    """
+    Архивация старой истории сообщений.
+
+    Фоновая задача раз в 'interval' секунд создаёт недостающие секции
+    и выгружает месяцы старше 'retention_months' полных месяцев
+    в файлы 'users_history_YYYY-MM.jsonl.gz' в 'archive_dir'.
+    Строки читаются потоком пачками по 'chunk_size', файл пишется
+    под временным именем и переименовывается после записи.
+    Только после этого секция отсоединяется и удаляется.
+    Без секционирования, а также для строк месяца в секции
+    по умолчанию выгруженные строки удаляются 'DELETE' по 'id'.
+
+    Каждая выгрузка пишет новый файл месяца и берёт только строки
+    с 'id' больше уже выгруженных, поэтому поздние строки месяца
+    дописываются в архив, а повтор после сбоя до удаления
+    не дублирует записи.
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine = engine,
+            archive_dir: Path = setting.HISTORY_ARCHIVE_DIR,
+            retention_months: int = setting.HISTORY_RETENTION_MONTHS,
+            interval: float = setting.HISTORY_ARCHIVE_INTERVAL,
+            chunk_size: int = 5000,
+    ):
+        self.engine = engine
+        self.archive_dir = Path(archive_dir)
+        self.retention_months = retention_months
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task: asyncio.Task | None = None
+
+        self.archived_months = 0
+        self.archived_rows = 0
+        self.failed = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Запуск фоновой задачи обслуживания секций и архивации."""
+
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'archived_months': self.archived_months,
+            'archived_rows': self.archived_rows,
+            'failed': self.failed,
+        }
+
+    async def archive_expired(self) -> list[Path]:
+        """Выгрузка всех месяцев старше срока хранения."""
+
+        if self.retention_months <= 0:
+            return []
+        cutoff = add_months(
+            month_start(datetime.date.today()),
+            -self.retention_months
+        )
+        paths = []
+        for month in await self._expired_months(cutoff):
+            try:
+                path = await self.archive_month(month)
+                if path is not None:
+                    paths.append(path)
+            except Exception as e:
+                self.failed += 1
+                db_logger.exception(
+                    f'Ошибка архивации истории за {month:%Y-%m}: {e}'
+                )
+                break
+        return paths
+
+    async def archive_month(self, month: datetime.date) -> Path | None:
+        """
+        Выгрузка месяца в архив и удаление его из бд.
+        Возвращает путь нового файла или None, если новых строк нет.
+        """
+
+        token = current_method.set('HistoryArchiver.archive_month')
+        try:
+            path, rows, last_id = await self._export(month)
+            async with self.engine.begin() as connection:
+                if (
+                        await is_partitioned(connection)
+                        and month in await list_partitions(connection)
+                ):
+                    name = partition_name(month)
+                    await connection.execute(text(
+                        f'ALTER TABLE users_history DETACH PARTITION {name}'
+                    ))
+                    await connection.execute(text(f'DROP TABLE {name}'))
+                elif last_id is not None:
+                    await connection.execute(
+                        delete(UsersHistory)
+                        .where(
+                            *self._month_filter(month),
+                            UsersHistory.id <= last_id
+                        )
+                    )
+        finally:
+            current_method.reset(token)
+
+        if path is None:
+            return None
+
+        self.archived_months += 1
+        self.archived_rows += rows
+        db_logger.info(
+            f'История за {month:%Y-%m} выгружена в архив: '
+            f'{rows} записей, {path}'
+        )
+        return path
+
+    async def _expired_months(
+            self,
+            cutoff: datetime.date
+    ) -> list[datetime.date]:
+        """
+        Месяцы старше 'cutoff': помесячные секции, а также месяцы строк
+        в секции по умолчанию (или в несекционированной таблице).
+        """
+
+        months = set()
+        async with self.engine.connect() as connection:
+            if await is_partitioned(connection):
+                months.update(
+                    month for month in await list_partitions(connection)
+                    if month < cutoff
+                )
+                oldest = (await connection.execute(
+                    text(
+                        f'SELECT min(created_at) FROM {DEFAULT_PARTITION} '
+                        'WHERE created_at < :cutoff'
+                    ),
+                    {'cutoff': month_datetime(cutoff)}
+                )).scalar()
+            else:
+                oldest = (await connection.execute(
+                    select(func.min(UsersHistory.created_at))
+                    .where(UsersHistory.created_at < month_datetime(cutoff))
+                )).scalar()
+        month = month_start(oldest) if oldest else cutoff
+        while month < cutoff:
+            months.add(month)
+            month = add_months(month, 1)
+        return sorted(months)
+
+    async def _export(
+            self,
+            month: datetime.date
+    ) -> tuple[Path | None, int, int | None]:
+        """
+        Выгрузка строк месяца с 'id' больше уже выгруженных в новый файл.
+        Возвращает путь файла (None, если новых строк нет), число строк
+        и наибольший выгруженный 'id' месяца.
+        """
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        after_id = max(
+            (
+                last_id for last_id, _
+                in archive_parts(self.archive_dir).get(month, [])
+                if last_id is not None
+            ),
+            default=None
+        )
+        partial = self.archive_dir / (archive_name(month) + '.partial')
+        filters = list(self._month_filter(month))
+        if after_id is not None:
+            filters.append(UsersHistory.id > after_id)
+        # Текст из словаря подставляется обратно, чтобы архив
+        # не зависел от 'message_contents'.
+        columns = [
+            column for column in UsersHistory.__table__.columns
+            if column.name not in ('message_content', 'content_id')
+        ] + [
+            func.coalesce(
+                UsersHistory.message_content,
+                MessageContent.content
+            ).label('message_content')
+        ]
+
+        rows = 0
+        last_id = after_id
+        archive = await asyncio.to_thread(gzip.open, partial, 'wt', 6, 'utf-8')
+        try:
+            async with self.engine.connect() as connection:
+                result = await connection.stream(
+                    select(*columns)
+                    .outerjoin(
+                        MessageContent,
+                        MessageContent.id == UsersHistory.content_id
+                    )
+                    .where(*filters)
+                    .order_by(UsersHistory.id)
+                    .execution_options(yield_per=self.chunk_size)
+                )
+                async for chunk in result.partitions():
+                    lines = ''.join(
+                        json.dumps(
+                            dict(row._mapping),
+                            ensure_ascii=False,
+                            default=datetime.datetime.isoformat
+                        ) + '\n'
+                        for row in chunk
+                    )
+                    await asyncio.to_thread(archive.write, lines)
+                    rows += len(chunk)
+                    last_id = chunk[-1].id
+        finally:
+            await asyncio.to_thread(archive.close)
+        if not rows:
+            partial.unlink()
+            return None, 0, last_id
+        path = self.archive_dir / archive_name(month, last_id)
+        partial.replace(path)
+        return path, rows, last_id
+
+    @staticmethod
+    def _month_filter(month: datetime.date) -> tuple:
+        return (
+            UsersHistory.created_at >= month_datetime(month),
+            UsersHistory.created_at < month_datetime(add_months(month, 1)),
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await ensure_partitions(self.engine)
+                await self.archive_expired()
+            except Exception as e:
+                db_logger.exception(f'Ошибка обслуживания истории: {e}')
+            await asyncio.sleep(self.interval)
+
+
+class HistoryArchive:
+    """
+    Чтение выгруженной истории из 'archive_dir'.
+
+    Файлы месяцев вне запрошенного периода не открываются.
+    Записи возвращаются в порядке месяцев и выгрузок, внутри файла —
+    по 'id',
+    'created_at' приводится обратно к datetime.
+    """
+
+    def __init__(self, archive_dir: Path = setting.HISTORY_ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+
+    def months(self) -> list[datetime.date]:
+        """Месяцы, выгруженные в архив."""
+
+        return sorted(archive_parts(self.archive_dir))
+
+    def read(
+            self,
+            user_id: int | None = None,
+            since: datetime.datetime | None = None,
+            until: datetime.datetime | None = None,
+    ) -> Iterator[dict]:
+        """
+        Записи истории пользователя 'user_id' (или всех пользователей)
+        с 'since' включительно до 'until' не включительно.
+        """
+
+        parts = archive_parts(self.archive_dir)
+        for month in sorted(parts):
+            if since is not None and (
+                    month_datetime(add_months(month, 1)) <= since):
+                continue
+            if until is not None and month_datetime(month) >= until:
+                continue
+            for _, path in parts[month]:
+                yield from self._read_file(path, user_id, since, until)
+
+    @staticmethod
+    def _read_file(
+            path: Path,
+            user_id: int | None,
+            since: datetime.datetime | None,
+            until: datetime.datetime | None,
+    ) -> Iterator[dict]:
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                record = json.loads(line)
+                if user_id is not None and record['user_id'] != user_id:
+                    continue
+                created_at = datetime.datetime.fromisoformat(
+                    record['created_at']
+                )
+                if since is not None and created_at < since:
+                    continue
+                if until is not None and created_at >= until:
+                    continue
+                record['created_at'] = created_at
+                yield record
+
+
+history_archiver = HistoryArchiver()
+history_archive = HistoryArchive()
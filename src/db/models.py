@@ -1,16 +1,21 @@
 import datetime
 
 from sqlalchemy import (
+    BigInteger,
     Column,
     DateTime,
     String,
     Integer,
     ForeignKey,
-    Text
+    Index,
+    SmallInteger,
+    Text,
+    UniqueConstraint,
+    text
 )
 from sqlalchemy.orm import relationship
 
-from src.db.base import BaseModel
+from src.db.base import Base, BaseModel
 
 
 class UsersProfile(BaseModel):
@@ -18,7 +23,7 @@ class UsersProfile(BaseModel):
     __tablename__ = 'users'
 
     telegram_id = Column(
-        String(50),
+        BigInteger,
         unique=True,
         nullable=False,
         index=True
@@ -41,7 +46,10 @@ class UsersProfile(BaseModel):
 
 
 class UsersHistory(BaseModel):
-    """ История запросов юзеров. """
+    """
+    История запросов юзеров.
+    В PostgreSQL секционирована по месяцам 'created_at' (ревизия 0003).
+    """
     __tablename__ = 'users_history'
 
     user_id = Column(
@@ -50,7 +58,7 @@ class UsersHistory(BaseModel):
         index=True,
     )
     chat_id = Column(
-        Integer
+        BigInteger
     )
     message_id = Column(
         Integer
@@ -59,6 +67,13 @@ class UsersHistory(BaseModel):
         Text,
         nullable=True,
     )
+    # Ссылка на текст в 'message_contents' при HISTORY_DEDUP_CONTENT,
+    # тогда 'message_content' пуст.
+    content_id = Column(
+        Integer,
+        ForeignKey('message_contents.id'),
+        nullable=True,
+    )
     state = Column(
         String,
         nullable=True,
@@ -73,3 +88,223 @@ class UsersHistory(BaseModel):
         back_populates='history'
     )
 
+
+class ActCounter(BaseModel):
+    """
+    Счётчики воронки квеста по 'act_code'.
+    Каждый счётчик разбит на 'shard' строк, чтобы переходы
+    разных пользователей не ждали блокировку одной строки.
+    """
+    __tablename__ = 'act_counters'
+    __table_args__ = (
+        UniqueConstraint(
+            'act_code',
+            'shard',
+            name='uq_act_counters_code_shard'
+        ),
+    )
+
+    act_code = Column(
+        String,
+        nullable=False
+    )
+    shard = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    # Пользователей с этим 'act_code' сейчас.
+    players = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    # Сколько раз пользователи переходили на этот 'act_code'.
+    reached = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.now,
+        onupdate=datetime.datetime.now
+    )
+
+
+class Broadcast(BaseModel):
+    """
+    Рассылка всем пользователям.
+    'last_user_id' — контрольная точка: пользователи с 'users.id'
+    не больше неё уже обработаны, после перезапуска рассылка
+    продолжается со следующего пользователя.
+    Отправляет рассылку только процесс 'owner' до 'lease_until';
+    выполняющаяся рассылка может быть только одна.
+    """
+    __tablename__ = 'broadcasts'
+    __table_args__ = (
+        Index(
+            'ux_broadcasts_running',
+            'status',
+            unique=True,
+            postgresql_where=text("status = 'running'"),
+            sqlite_where=text("status = 'running'"),
+        ),
+    )
+
+    text = Column(
+        Text,
+        nullable=False
+    )
+    # 'running', 'done' или 'cancelled'.
+    status = Column(
+        String(16),
+        nullable=False,
+        default='running',
+        index=True
+    )
+    created_by = Column(
+        BigInteger,
+        nullable=True
+    )
+    last_user_id = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    total = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    sent = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    blocked = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    failed = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    created_at = Column(
+        DateTime,
+        default=datetime.datetime.now
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.now,
+        onupdate=datetime.datetime.now
+    )
+    finished_at = Column(
+        DateTime,
+        nullable=True
+    )
+    owner = Column(
+        String(64),
+        nullable=True
+    )
+    lease_until = Column(
+        DateTime,
+        nullable=True
+    )
+
+
+class BroadcastDelivery(Base):
+    """
+    Результат доставки рассылки пользователю.
+    Без отдельного 'id': ключ — пара (рассылка, пользователь),
+    результат — код 'status' (см. 'src.manager.broadcast').
+    """
+    __tablename__ = 'broadcast_deliveries'
+
+    broadcast_id = Column(
+        Integer,
+        ForeignKey('broadcasts.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    user_id = Column(
+        Integer,
+        primary_key=True
+    )
+    status = Column(
+        SmallInteger,
+        nullable=False
+    )
+
+
+class MessageContent(BaseModel):
+    """ Словарь повторяющихся текстов сообщений истории. """
+    __tablename__ = 'message_contents'
+
+    content_hash = Column(
+        String(64),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    content = Column(
+        Text,
+        nullable=False
+    )
+
+
+class MediaFile(BaseModel):
+    """ Загруженные в Telegram медиафайлы. """
+    __tablename__ = 'media_files'
+
+    content_hash = Column(
+        String(64),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    file_name = Column(
+        String,
+        nullable=False
+    )
+    file_id = Column(
+        String,
+        nullable=False
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.now,
+        onupdate=datetime.datetime.now
+    )
+
+
+class FsmRecord(BaseModel):
+    """ Состояние и данные FSM/сцен пользователей. """
+    __tablename__ = 'fsm_storage'
+
+    key = Column(
+        String(255),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    state = Column(
+        String,
+        nullable=True
+    )
+    data = Column(
+        Text,
+        nullable=False,
+        default='{}'
+    )
+    version = Column(
+        Integer,
+        nullable=False,
+        default=1
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.now,
+        onupdate=datetime.datetime.now
+    )
@@ -0,0 +1,76 @@
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from src.db.core import replica_session
+import src.settings as setting
+
+
+class ReplicaRouter:
+    """
+    Выбор бд для чтения данных пользователя.
+
+    Чтения идут в реплику, если она настроена. После изменения данных
+    пользователя его чтения в течение 'sticky_seconds' идут в основную бд,
+    чтобы он видел свои изменения при задержке репликации
+    (read-your-writes). Отметки хранятся в памяти процесса, поэтому
+    изменение, сделанное другим экземпляром бота, может читаться
+    из реплики с задержкой репликации.
+    """
+
+    def __init__(
+            self,
+            session_factory: sessionmaker | None = replica_session,
+            sticky_seconds: float = setting.REPLICA_STICKY_SECONDS,
+            max_sticky: int = 100000,
+    ):
+        self.session_factory = session_factory
+        self.sticky_seconds = sticky_seconds
+        self.max_sticky = max_sticky
+        self._sticky: dict[int, float] = {}
+
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.session_factory is not None
+
+    def mark_write(self, tg_id: int | str) -> None:
+        """Отметка записи: чтения пользователя временно идут в основную бд."""
+
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if len(self._sticky) >= self.max_sticky:
+            self._sticky = {
+                key: expires for key, expires in self._sticky.items()
+                if expires > now
+            }
+        self._sticky[int(tg_id)] = now + self.sticky_seconds
+
+    def use_replica(self, tg_id: int | str | None = None) -> bool:
+        """Можно ли читать данные пользователя из реплики."""
+
+        if not self.enabled:
+            return False
+        if tg_id is not None:
+            expires = self._sticky.get(int(tg_id))
+            if expires is not None:
+                if expires > time.monotonic():
+                    self.primary_reads += 1
+                    return False
+                del self._sticky[int(tg_id)]
+        self.replica_reads += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'sticky': len(self._sticky),
+            'replica_reads': self.replica_reads,
+            'primary_reads': self.primary_reads,
+        }
+
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,280 @@
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, NamedTuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey
+)
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.db.core import async_session, current_session
+from src.db.models import FsmRecord
+from src.logs.config import db_logger
+from src.metrics.sql import current_method
+import src.settings as setting
+
+
+PENDING_KEY = 'fsm_pending'
+
+
+class CachedRecord(NamedTuple):
+    """Закэшированная запись FSM."""
+
+    state: str | None
+    data: str
+    version: int
+    expires_at: float
+
+
+class SqlStorage(BaseStorage):
+    """
+    FSM-хранилище aiogram в основной бд.
+
+    Состояние и данные сцен хранятся в таблице 'fsm_storage',
+    поэтому их видят все процессы бота и они переживают перезапуск.
+
+    Чтение идёт из write-through кэша процесса (LRU + TTL),
+    запись — условным 'UPDATE ... WHERE version = :version'.
+    Если запись изменил другой процесс, версия не совпадёт:
+    запись перечитывается из бд и изменение применяется заново.
+    TTL кэша ограничивает время, в течение которого процесс
+    может читать устаревшее состояние.
+
+    Внутри unit of work ('current_session') запись идёт в транзакцию апдейта,
+    а кэш обновляется только после её commit.
+    """
+
+    def __init__(
+            self,
+            session_factory: sessionmaker = async_session,
+            key_builder: KeyBuilder | None = None,
+            cache_size: int = setting.FSM_CACHE_SIZE,
+            cache_ttl: float = setting.FSM_CACHE_TTL,
+            max_retries: int = 5,
+    ):
+        self.session_factory = session_factory
+        self.key_builder = key_builder or DefaultKeyBuilder(
+            with_bot_id=True,
+            with_destiny=True
+        )
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_retries = max_retries
+        self._cache: OrderedDict[str, CachedRecord] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        await self._save(
+            self.key_builder.build(key),
+            lambda record: (state, record.data)
+        )
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = await self._get(self.key_builder.build(key))
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        raw_data = json.dumps(data, ensure_ascii=False)
+        await self._save(
+            self.key_builder.build(key),
+            lambda record: (record.state, raw_data)
+        )
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = await self._get(self.key_builder.build(key))
+        return json.loads(record.data)
+
+    async def update_data(
+            self,
+            key: StorageKey,
+            data: dict[str, Any]
+    ) -> dict[str, Any]:
+        """
+        Обновление данных с проверкой версии:
+        при конкурентной записи слияние повторяется
+        поверх актуальных данных из бд.
+        """
+
+        def merge(record: CachedRecord) -> tuple[str | None, str]:
+            current = json.loads(record.data)
+            current.update(data)
+            return record.state, json.dumps(current, ensure_ascii=False)
+
+        record = await self._save(self.key_builder.build(key), merge)
+        return json.loads(record.data)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """Метрики кэша и конфликтов версий."""
+
+        return {
+            'size': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'conflicts': self.conflicts,
+        }
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[AsyncSession]:
+        token = current_method.set(type(self).__name__)
+        try:
+            session = current_session.get()
+            if session is not None:
+                yield session
+                return
+            async with self.session_factory() as session:
+                yield session
+                await session.commit()
+        finally:
+            current_method.reset(token)
+
+    async def _get(self, key: str, fresh: bool = False) -> CachedRecord:
+        session = current_session.get()
+        if not fresh and session is not None:
+            pending = session.info.get(PENDING_KEY, {}).get(key)
+            if pending is not None:
+                return pending[1]
+
+        record = None if fresh else self._cache.get(key)
+        if record is not None and record.expires_at >= time.monotonic():
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        async with self._session() as session:
+            row = (await session.execute(
+                select(FsmRecord.state, FsmRecord.data, FsmRecord.version)
+                .where(FsmRecord.key == key)
+            )).first()
+        if row is None:
+            return self._remember(key, None, '{}', 0)
+        return self._remember(key, row.state, row.data, row.version)
+
+    async def _save(
+            self,
+            key: str,
+            build: Callable[[CachedRecord], tuple[str | None, str]]
+    ) -> CachedRecord:
+        record = await self._get(key)
+        for _ in range(self.max_retries):
+            state, data = build(record)
+            if await self._write(key, state, data, record.version):
+                return self._written(key, state, data, record.version + 1)
+            self.conflicts += 1
+            record = await self._get(key, fresh=True)
+
+        db_logger.error(
+            f'Не удалось записать состояние FSM {key}: '
+            f'превышено число попыток ({self.max_retries})'
+        )
+        raise RuntimeError(f'FSM version conflict for {key}')
+
+    async def _write(
+            self,
+            key: str,
+            state: str | None,
+            data: str,
+            version: int
+    ) -> bool:
+        async with self._session() as session:
+            if version == 0:
+                written = await self._insert(session, key, state, data)
+            else:
+                result = await session.execute(
+                    update(FsmRecord)
+                    .where(FsmRecord.key == key, FsmRecord.version == version)
+                    .values(state=state, data=data, version=version + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                written = result.rowcount == 1
+        return written
+
+    @staticmethod
+    async def _insert(session, key: str, state: str | None, data: str) -> bool:
+        values = {'key': key, 'state': state, 'data': data, 'version': 1}
+        insert_ = {
+            'postgresql': postgresql.insert,
+            'sqlite': sqlite.insert,
+        }.get(session.bind.dialect.name)
+        if insert_ is None:
+            try:
+                async with session.begin_nested():
+                    session.add(FsmRecord(**values))
+            except IntegrityError:
+                return False
+            return True
+
+        result = await session.execute(
+            insert_(FsmRecord)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=['key'])
+        )
+        return result.rowcount == 1
+
+    def _written(
+            self,
+            key: str,
+            state: str | None,
+            data: str,
+            version: int
+    ) -> CachedRecord:
+        session = current_session.get()
+        if session is None:
+            return self._remember(key, state, data, version)
+        record = CachedRecord(state, data, version, 0.0)
+        self._cache.pop(key, None)
+        session.info.setdefault(PENDING_KEY, {})[key] = (self, record)
+        return record
+
+    def _remember(
+            self,
+            key: str,
+            state: str | None,
+            data: str,
+            version: int
+    ) -> CachedRecord:
+        record = CachedRecord(
+            state,
+            data,
+            version,
+            time.monotonic() + self.cache_ttl
+        )
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return record
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session: Session) -> None:
+    """Перенос записанных в транзакции состояний FSM в кэш."""
+
+    pending = session.info.pop(PENDING_KEY, None)
+    for key, (storage, record) in (pending or {}).items():
+        storage._remember(key, record.state, record.data, record.version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending(session: Session) -> None:
+    """Сброс записанных в отменённой транзакции состояний FSM."""
+
+    session.info.pop(PENDING_KEY, None)
@@ -1,15 +1,20 @@
 import inspect
 import logging
-from typing import Callable
+from typing import Any, Callable
 
 from loguru import logger
 
+import src.settings as setting
+
 BOT_DEBUG_INFO_LOGS_PATH: str = 'logs/bot/debug_info.log'
 BOT_ERROR_LOGS_PATH: str = 'logs/bot/error.log'
 
 DB_DEBUG_INFO_LOGS_PATH: str = 'logs/db/debug_info.log'
 DB_ERROR_LOGS_PATH: str = 'logs/db/error.log'
 
+SQL_ECHO_LOGGER: str = 'sqlalchemy.engine.Engine'
+DEPTH_CACHE_SIZE: int = 4096
+
 LOGS_CATEGORY: dict = {
     'ALL_TYPES': ('INFO', 'DEBUG', 'WARNING', 'ERROR', 'CRITICAL'),
 }
@@ -19,29 +24,121 @@ class InterceptHandler(logging.Handler):
     """
     Хэндлер, который перехватывает сообщения от стандартных логгеров
     и направляет их в глобальный синк Loguru (`global_logger`).
+
+    Записи ниже 'level' отбрасываются до поиска кадра и форматирования.
+    Глубина кадра вызывающего кода кэшируется по месту вызова
+    (файл, строка), привязанные логгеры — по имени логгера.
     """
 
-    def emit(self, record: logging.LogRecord) -> None:
-        level: str | int
-        try:
-            level = bot_logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
+    def __init__(self, level: int | str = logging.NOTSET):
+        super().__init__(level)
+        self._levels: dict[str, str | int] = {}
+        self._depths: dict[tuple[str, int], int] = {}
+        self._loggers: dict[str, Any] = {}
 
-        frame, depth = inspect.currentframe(), 0
-        while frame and (depth == 0 or frame.f_code.co_filename == logging.__file__):
-            frame = frame.f_back
-            depth += 1
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno < self.level:
+            return
+
+        level = self._levels.get(record.levelname)
+        if level is None:
+            try:
+                level = bot_logger.level(record.levelname).name
+            except ValueError:
+                level = record.levelno
+            self._levels[record.levelname] = level
+
+        site = (record.pathname, record.lineno)
+        depth = self._depths.get(site)
+        if depth is None:
+            frame, depth = inspect.currentframe(), 0
+            while frame and (
+                    depth == 0 or frame.f_code.co_filename == logging.__file__
+            ):
+                frame = frame.f_back
+                depth += 1
+            if len(self._depths) < DEPTH_CACHE_SIZE:
+                self._depths[site] = depth
+
+        bound = self._loggers.get(record.name)
+        if bound is None:
+            bound = bot_logger.bind(logger_name=record.name)
+            self._loggers[record.name] = bound
 
         (
-            bot_logger
-            .bind(logger_name=record.name)
+            bound
             .opt(depth=depth, exception=record.exc_info)
             .log(level, record.getMessage())
         )
 
 
-logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+class SqlEchoSampler(logging.Filter):
+    """
+    Пропуск доли 'rate' записей эха SQL.
+
+    Выборка детерминированная (накопление доли), строка параметров
+    запроса разделяет решение, принятое для самого запроса.
+    """
+
+    PARAMS_MSG = '[%s] %r'
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._credit = 0.0
+        self._last = False
+
+        self.seen = 0
+        self.passed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.msg != self.PARAMS_MSG:
+            self.seen += 1
+            self._credit += self.rate
+            self._last = self._credit >= 1
+            if self._last:
+                self._credit -= 1
+                self.passed += 1
+        return self._last
+
+
+def configure_std_logging(
+        mode: str = setting.LOG_MODE,
+        level: str = setting.LOG_LEVEL,
+        category_levels: dict[str, str] | None = None,
+        sql_echo_rate: float = setting.SQL_ECHO_SAMPLE_RATE,
+) -> InterceptHandler:
+    """
+    Настройка моста стандартного logging в Loguru.
+
+    Уровни выставляются самим стандартным логгерам, поэтому отключённые
+    записи даже не создаются. Эхо SQL в режиме 'production'
+    идёт только через мост и сэмплируется с долей 'sql_echo_rate'.
+    """
+
+    handler = InterceptHandler(level)
+    logging.basicConfig(handlers=[handler], level=level, force=True)
+    for name, category_level in (
+            category_levels
+            if category_levels is not None
+            else setting.LOG_CATEGORY_LEVELS
+    ).items():
+        logging.getLogger(name).setLevel(category_level)
+
+    sql_logger = logging.getLogger(SQL_ECHO_LOGGER)
+    for old_filter in sql_logger.filters[:]:
+        if isinstance(old_filter, SqlEchoSampler):
+            sql_logger.removeFilter(old_filter)
+    if sql_echo_rate <= 0:
+        sql_logger.setLevel(logging.WARNING)
+    elif mode != 'debug':
+        sql_logger.setLevel(logging.INFO)
+    if 0 < sql_echo_rate < 1:
+        sql_logger.addFilter(SqlEchoSampler(sql_echo_rate))
+    return handler
+
+
+intercept_handler = configure_std_logging()
 
 
 def filter_category(name_category: str, logs_category: str) -> Callable:
@@ -57,7 +154,7 @@ bot_logger = logger.bind(category='bot')
 bot_logger.add(
     BOT_DEBUG_INFO_LOGS_PATH,
     rotation='10 MB',
-    level='DEBUG',
+    level=setting.LOG_LEVEL,
     enqueue=True,
     backtrace=True,
     filter=filter_category('bot', 'ALL_TYPES')
@@ -76,7 +173,7 @@ db_logger = logger.bind(category='db')
 db_logger.add(
     DB_DEBUG_INFO_LOGS_PATH,
     rotation='10 MB',
-    level='DEBUG',
+    level=setting.LOG_LEVEL,
     enqueue=True,
     backtrace=True,
     filter=filter_category('db', 'ALL_TYPES')
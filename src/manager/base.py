@@ -1,10 +1,12 @@
-from typing import TypeVar, Type
+from typing import Any, Callable, TypeVar, Type
 
-from sqlalchemy import select, delete
+from sqlalchemy import Executable, Result, select, delete
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import DeclarativeMeta
 
 import src.db.models as model
+from src.db.replica import replica_router
 from src.manager.handle_errors import handle_db_errors
 from src.logs.config import db_logger
 
@@ -14,9 +16,23 @@ class BaseRepository:
 
     USER_PROFILE_MODEL = model.UsersProfile
     USER_HISTORY_MODEL = model.UsersHistory
+    MEDIA_FILE_MODEL = model.MediaFile
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, autocommit: bool = True):
         self.session = session
+        self.autocommit = autocommit
+
+    async def commit(self) -> None:
+        """
+        Фиксация изменений.
+        При 'autocommit=False' сессией управляет внешний unit of work
+        (middleware), поэтому изменения только отправляются в бд через flush,
+        а commit выполняется один раз в конце обработки апдейта.
+        """
+        if self.autocommit:
+            await self.session.commit()
+        else:
+            await self.session.flush()
 
 
 class BaseManager(BaseRepository):
@@ -52,12 +68,61 @@ class BaseManager(BaseRepository):
                     f'Передано значение меньше или равное нулю: {variable}.'
                 )
 
+    @staticmethod
+    def bind_value(field: Any, variable: str | int) -> Any:
+        """
+        Приведение значения к python-типу колонки, чтобы параметр
+        запроса передавался в типе колонки, а не строкой.
+        Значение, которое нельзя привести, вызывает ValueError.
+        """
+
+        try:
+            python_type = field.type.python_type
+        except NotImplementedError:
+            return variable
+        if python_type not in (int, str) or isinstance(variable, python_type):
+            return variable
+        return python_type(variable)
+
+    def dialect_insert(self) -> Callable | None:
+        """
+        Конструктор 'INSERT' с поддержкой 'ON CONFLICT'
+        для диалекта текущей сессии или None, если диалект его не поддерживает.
+        """
+
+        return {
+            'postgresql': postgresql.insert,
+            'sqlite': sqlite.insert,
+        }.get(self.session.bind.dialect.name)
+
+    async def execute_read(
+            self,
+            stmt: Executable,
+            fetch: Callable[[Result], Any],
+            replica: bool = False
+    ) -> Any:
+        """
+        Выполнение запроса на чтение и получение результата через 'fetch'.
+
+        При 'replica=True' и настроенной реплике запрос выполняется
+        в отдельной короткой сессии реплики, а не в сессии менеджера.
+        Полученные объекты не привязаны к сессии менеджера,
+        поэтому изменять через них данные нельзя.
+        """
+
+        if not replica or not replica_router.enabled:
+            return fetch(await self.session.execute(stmt))
+
+        async with replica_router.session_factory() as session:
+            return fetch(await session.execute(stmt))
+
     @handle_db_errors
     async def is_exist(
             self,
             model: Type[ModelType],
             field_name: str,
             variable: str | int,
+            replica: bool = False,
     ) -> bool:
         """
         Проверяет, существует ли запись в бд для заданной модели,
@@ -67,11 +132,12 @@ class BaseManager(BaseRepository):
         self.check_variable(variable)
 
         field = getattr(model, field_name)
-        result = await self.session.execute(
+        variable_is_exist = await self.execute_read(
             select(model)
-            .where(field == str(variable))
+            .where(field == self.bind_value(field, variable)),
+            lambda result: result.scalars().first(),
+            replica
         )
-        variable_is_exist = result.scalars().first()
         return variable_is_exist is not None
 
     @handle_db_errors
@@ -97,6 +163,7 @@ class BaseManager(BaseRepository):
             model: Type[ModelType],
             field_name: str,
             variable: str | int,
+            replica: bool = False,
     ) -> ModelType | None:
         """
         Получает запись из бд для заданной модели,
@@ -105,11 +172,12 @@ class BaseManager(BaseRepository):
         self.check_variable(variable)
 
         field = getattr(model, field_name)
-        result = await self.session.execute(
+        value = await self.execute_read(
             select(model)
-            .where(field == str(variable))
+            .where(field == self.bind_value(field, variable)),
+            lambda result: result.scalars().first(),
+            replica
         )
-        value = result.scalars().first()
         return value
 
     @handle_db_errors
@@ -118,6 +186,7 @@ class BaseManager(BaseRepository):
             model: Type[ModelType],
             field_name: str,
             variable: str | int,
+            replica: bool = False,
     ) -> ModelType | None:
         """
         Получает все записи из бд для заданной модели,
@@ -126,11 +195,12 @@ class BaseManager(BaseRepository):
         self.check_variable(variable)
 
         field = getattr(model, field_name)
-        result = await self.session.execute(
+        all_value = await self.execute_read(
             select(model)
-            .where(field == str(variable))
+            .where(field == self.bind_value(field, variable)),
+            lambda result: result.scalars().all(),
+            replica
         )
-        all_value = result.scalars().all()
         return all_value
 
     @handle_db_errors
@@ -149,9 +219,9 @@ class BaseManager(BaseRepository):
         field = getattr(model, field_name)
         await self.session.execute(
             delete(model)
-            .where(field == str(variable))
+            .where(field == self.bind_value(field, variable))
         )
-        await self.session.commit()
+        await self.commit()
 
     @handle_db_errors
     async def add_instance(
@@ -162,6 +232,8 @@ class BaseManager(BaseRepository):
         """
         Добавление новой записи в базу данных
         для указанной модели с переданными полями.
+        При 'autocommit=False' ошибка пробрасывается: откат здесь
+        отменил бы всю работу апдейта, поэтому откатывает unit of work.
         """
         for field_name, value in fields.items():
             self.check_variable(value)
@@ -169,12 +241,14 @@ class BaseManager(BaseRepository):
         try:
             instance = model(**fields)
             self.session.add(instance)
-            await self.session.commit()
+            await self.commit()
         except Exception as e:
             db_logger.exception(
                 f'Неизвестная ошибка записи в бд '
                 f'{model.__name__}: {str(e)}'
             )
+            if not self.autocommit:
+                raise
             await self.session.rollback()
             return None
         else:
@@ -0,0 +1,302 @@
+import datetime
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.db.models import Broadcast, BroadcastDelivery
+from src.manager.base import BaseManager
+from src.manager.handle_errors import handle_db_errors
+
+# Коды 'broadcast_deliveries.status'.
+DELIVERY_SENT = 1
+DELIVERY_BLOCKED = 2
+DELIVERY_FAILED = 3
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_CANCELLED = 'cancelled'
+# Не статус в бд: аренду рассылки перехватил другой процесс.
+STATUS_LEASE_LOST = 'lease_lost'
+
+
+class BroadcastManager(BaseManager):
+    """
+    Рассылки и результаты доставки.
+
+    Пользователи выбираются страницами по 'users.id' (keyset):
+    'WHERE id > :after ORDER BY id LIMIT :limit' читает только
+    нужную страницу индекса при любом размере таблицы.
+
+    Отправляет рассылку процесс, владеющий арендой ('owner',
+    'lease_until'): аренда берётся условным 'UPDATE' и продлевается
+    каждой контрольной точкой, поэтому несколько процессов бота
+    не отправляют одни и те же страницы.
+    """
+
+    BROADCAST_MODEL = Broadcast
+    DELIVERY_MODEL = BroadcastDelivery
+
+    @handle_db_errors
+    async def create_broadcast(
+            self,
+            text: str,
+            created_by: int | None = None,
+            owner: str | None = None,
+            lease_until: datetime.datetime | None = None
+    ) -> Broadcast | None:
+        """
+        Новая рассылка; 'total' — число пользователей на момент запуска.
+        Возвращает None, если другая рассылка уже выполняется
+        (уникальный индекс 'ux_broadcasts_running').
+        """
+
+        total = (await self.session.execute(
+            select(func.count()).select_from(self.USER_PROFILE_MODEL)
+        )).scalar()
+        broadcast = self.BROADCAST_MODEL(
+            text=text,
+            created_by=created_by,
+            status=STATUS_RUNNING,
+            last_user_id=0,
+            total=total,
+            sent=0,
+            blocked=0,
+            failed=0,
+            owner=owner,
+            lease_until=lease_until,
+        )
+        self.session.add(broadcast)
+        try:
+            await self.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            return None
+        return broadcast
+
+    @handle_db_errors
+    async def claim_broadcast(
+            self,
+            owner: str,
+            lease_until: datetime.datetime
+    ) -> Broadcast | None:
+        """
+        Захват аренды выполняющейся рассылки, если она свободна,
+        истекла или уже принадлежит 'owner'.
+        Возвращает рассылку или None, если захватить нечего.
+        Транзакция начинается с 'UPDATE', а не с чтения: в SQLite
+        чтение с последующей записью взаимно блокируется
+        с сохранением прогресса другой задачи.
+        """
+
+        broadcast = self.BROADCAST_MODEL
+        result = await self.session.execute(
+            update(broadcast)
+            .where(
+                broadcast.status == STATUS_RUNNING,
+                or_(
+                    broadcast.owner == owner,
+                    broadcast.lease_until.is_(None),
+                    broadcast.lease_until < datetime.datetime.now(),
+                )
+            )
+            .values(owner=owner, lease_until=lease_until)
+        )
+        claimed = None
+        if result.rowcount:
+            claimed = (await self.session.execute(
+                select(broadcast)
+                .where(
+                    broadcast.status == STATUS_RUNNING,
+                    broadcast.owner == owner
+                )
+            )).scalars().first()
+        await self.commit()
+        return claimed
+
+    @handle_db_errors
+    async def release_broadcast(self, broadcast_id: int, owner: str) -> None:
+        """Освобождение аренды при остановке процесса."""
+
+        broadcast = self.BROADCAST_MODEL
+        await self.session.execute(
+            update(broadcast)
+            .where(broadcast.id == broadcast_id, broadcast.owner == owner)
+            .values(lease_until=None)
+        )
+        await self.commit()
+
+    @handle_db_errors
+    async def get_broadcast(
+            self,
+            broadcast_id: int | None = None
+    ) -> Broadcast | None:
+        """Рассылка по id или последняя, если id не передан."""
+
+        broadcast = self.BROADCAST_MODEL
+        stmt = select(broadcast)
+        if broadcast_id is None:
+            stmt = stmt.order_by(broadcast.id.desc()).limit(1)
+        else:
+            stmt = stmt.where(broadcast.id == broadcast_id)
+        return (await self.session.execute(stmt)).scalars().first()
+
+    @handle_db_errors
+    async def get_running_broadcast(self) -> Broadcast | None:
+        broadcast = self.BROADCAST_MODEL
+        return (await self.session.execute(
+            select(broadcast)
+            .where(broadcast.status == STATUS_RUNNING)
+            .order_by(broadcast.id)
+            .limit(1)
+        )).scalars().first()
+
+    @handle_db_errors
+    async def get_users_page(
+            self,
+            broadcast_id: int,
+            after_id: int,
+            limit: int
+    ) -> tuple[int | None, list[tuple[int, int]]]:
+        """
+        Страница пользователей после 'after_id': последний 'users.id'
+        страницы (None — пользователи закончились) и пары
+        ('users.id', 'telegram_id') тех, кому рассылка ещё не доставлялась.
+        """
+
+        users = self.USER_PROFILE_MODEL
+        page = (await self.session.execute(
+            select(users.id, users.telegram_id)
+            .where(users.id > after_id)
+            .order_by(users.id)
+            .limit(limit)
+        )).all()
+        if not page:
+            return None, []
+
+        # Результаты, сохранённые после контрольной точки
+        # при остановке посреди страницы.
+        delivery = self.DELIVERY_MODEL
+        delivered = set((await self.session.execute(
+            select(delivery.user_id)
+            .where(
+                delivery.broadcast_id == broadcast_id,
+                delivery.user_id > after_id,
+                delivery.user_id <= page[-1][0],
+            )
+        )).scalars())
+        return page[-1][0], [
+            (user_id, tg_id) for user_id, tg_id in page
+            if user_id not in delivered
+        ]
+
+    @handle_db_errors
+    async def save_progress(
+            self,
+            broadcast_id: int,
+            outcomes: dict[int, int],
+            last_user_id: int | None = None,
+            owner: str | None = None,
+            lease_until: datetime.datetime | None = None
+    ) -> str | None:
+        """
+        Запись результатов доставки ('users.id' -> код), счётчиков
+        и контрольной точки 'last_user_id' (None — не сдвигать)
+        в одной транзакции. Возвращает текущий статус рассылки.
+
+        Если передан 'owner', контрольная точка сдвигается и аренда
+        продлевается до 'lease_until' только у владельца аренды;
+        иначе возвращается STATUS_LEASE_LOST. Результаты уже
+        отправленных сообщений записываются в любом случае.
+        """
+
+        delivery = self.DELIVERY_MODEL
+        broadcast = self.BROADCAST_MODEL
+        codes = list(outcomes.values())
+        if outcomes:
+            rows = [
+                {'broadcast_id': broadcast_id, 'user_id': user_id,
+                 'status': status}
+                for user_id, status in sorted(outcomes.items())
+            ]
+            insert_ = self.dialect_insert()
+            if insert_ is None:
+                await self.session.execute(insert(delivery).values(rows))
+            elif self.session.bind.dialect.insert_returning:
+                # Счётчики учитывают только новые строки, поэтому
+                # повторное сохранение тех же результатов их не меняет.
+                codes = list((await self.session.execute(
+                    insert_(delivery).values(rows)
+                    .on_conflict_do_nothing()
+                    .returning(delivery.status)
+                )).scalars())
+            else:
+                await self.session.execute(
+                    insert_(delivery).values(rows).on_conflict_do_nothing()
+                )
+
+        values = {
+            'sent': broadcast.sent + codes.count(DELIVERY_SENT),
+            'blocked': broadcast.blocked + codes.count(DELIVERY_BLOCKED),
+            'failed': broadcast.failed + codes.count(DELIVERY_FAILED),
+        }
+        if owner is None and last_user_id is not None:
+            values['last_user_id'] = last_user_id
+        await self.session.execute(
+            update(broadcast)
+            .where(broadcast.id == broadcast_id)
+            .values(**values)
+        )
+        leased = True
+        if owner is not None:
+            lease = {'lease_until': lease_until}
+            if last_user_id is not None:
+                lease['last_user_id'] = last_user_id
+            result = await self.session.execute(
+                update(broadcast)
+                .where(broadcast.id == broadcast_id, broadcast.owner == owner)
+                .values(**lease)
+            )
+            leased = result.rowcount > 0
+        status = (await self.session.execute(
+            select(broadcast.status).where(broadcast.id == broadcast_id)
+        )).scalar()
+        await self.commit()
+        if status == STATUS_RUNNING and not leased:
+            return STATUS_LEASE_LOST
+        return status
+
+    @handle_db_errors
+    async def finish_broadcast(
+            self,
+            broadcast_id: int,
+            status: str = STATUS_DONE
+    ) -> bool:
+        """
+        Завершение рассылки, если она ещё выполняется.
+        Возвращает False, если рассылка уже завершена или отменена.
+        """
+
+        broadcast = self.BROADCAST_MODEL
+        result = await self.session.execute(
+            update(broadcast)
+            .where(
+                broadcast.id == broadcast_id,
+                broadcast.status == STATUS_RUNNING
+            )
+            .values(status=status, finished_at=datetime.datetime.now())
+        )
+        await self.commit()
+        return result.rowcount > 0
+
+    async def cancel_broadcast(self) -> Broadcast | None:
+        """
+        Отмена выполняющейся рассылки. Отправка останавливается
+        после сохранения текущей страницы.
+        """
+
+        broadcast = await self.get_running_broadcast()
+        if broadcast is None:
+            return None
+        if not await self.finish_broadcast(broadcast.id, STATUS_CANCELLED):
+            return None
+        return broadcast
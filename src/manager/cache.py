@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import src.settings as setting
+
+
+class CachedUser(NamedTuple):
+    """Закэшированный прогресс пользователя."""
+
+    id: int
+    act_code: str
+
+
+class ProgressCache:
+    """
+    Ограниченный кэш прогресса пользователей ('act_code') по 'telegram_id'.
+
+    Вытеснение по LRU при превышении 'maxsize'
+    и по TTL: запись старше 'ttl' секунд считается промахом.
+    TTL ограничивает время жизни устаревших данных,
+    если 'act_code' изменён в обход кэша (другим процессом):
+    при нескольких экземплярах бота он должен быть коротким
+    (см. PROGRESS_CACHE_TTL).
+    Кэш заполняется только зафиксированными значениями
+    ('UserManager.after_commit').
+    """
+
+    def __init__(
+            self,
+            maxsize: int = setting.PROGRESS_CACHE_SIZE,
+            ttl: float = setting.PROGRESS_CACHE_TTL,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, tg_id: int) -> CachedUser | None:
+        """Получение прогресса пользователя из кэша."""
+
+        key = int(tg_id)
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, tg_id: int, value: CachedUser) -> None:
+        """Запись прогресса пользователя в кэш."""
+
+        key = int(tg_id)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def update_act_code(self, tg_id: int, act_code: str) -> None:
+        """
+        Обновление 'act_code' в существующей записи кэша.
+        Отсутствующая или просроченная запись не создаётся.
+        """
+
+        key = int(tg_id)
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            return
+        self._data[key] = (item[0], item[1]._replace(act_code=act_code))
+
+    def invalidate(self, tg_id: int) -> None:
+        """Удаление прогресса пользователя из кэша."""
+
+        self._data.pop(int(tg_id), None)
+
+    def clear(self) -> None:
+        """Полная очистка кэша."""
+
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Метрики кэша."""
+
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+progress_cache = ProgressCache()
@@ -1,13 +1,19 @@
+from src.manager.broadcast import BroadcastManager
+from src.manager.media import MediaManager
 from src.manager.users import UserManager
 
 
 class CompositeManager(
     UserManager,
+    MediaManager,
+    BroadcastManager,
 ):
     """
     CompositeManager объединяет функционал нескольких менеджеров:
 
-    - UserManager: управление пользователями.
+    - UserManager: управление пользователями и счётчики воронки.
+    - MediaManager: 'file_id' загруженных в Telegram медиафайлов.
+    - BroadcastManager: рассылки и результаты доставки.
 
     """
     pass
@@ -0,0 +1,153 @@
+import hashlib
+from collections import OrderedDict
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import MessageContent
+import src.settings as setting
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class ContentDictionary:
+    """
+    Словарь текстов сообщений истории ('message_contents').
+
+    Короткие тексты (до 'max_length' символов) хранятся один раз,
+    а строки 'users_history' ссылаются на них по 'content_id'.
+    Соответствие текст -> id кэшируется в процессе (LRU на 'maxsize'
+    текстов), поэтому для частых слов запрос к бд не нужен.
+    Новые тексты добавляются одним 'INSERT ... ON CONFLICT DO NOTHING'
+    на пачку, id читаются следующим запросом.
+    В кэш id попадают только через 'remember' после commit,
+    поэтому откат транзакции не оставляет в нём несуществующих id.
+    """
+
+    def __init__(
+            self,
+            maxsize: int = setting.HISTORY_CONTENT_CACHE_SIZE,
+            max_length: int = setting.HISTORY_DEDUP_MAX_LENGTH,
+    ):
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self._ids: OrderedDict[str, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def accepts(self, content: str | None) -> bool:
+        """Хранится ли текст в словаре, а не в строке истории."""
+
+        return content is not None and len(content) <= self.max_length
+
+    async def compact(
+            self,
+            session: AsyncSession,
+            records: list[dict]
+    ) -> dict[str, int]:
+        """
+        Замена текстов записей истории ссылками на словарь.
+        Все записи получают ключ 'content_id', чтобы пачка
+        вставлялась одним запросом.
+        Возвращает использованные id для 'remember' после commit.
+        """
+
+        ids = await self.intern(session, (
+            record['message_content'] for record in records
+            if self.accepts(record['message_content'])
+        ))
+        for record in records:
+            content_id = ids.get(record['message_content'])
+            record['content_id'] = content_id
+            if content_id is not None:
+                record['message_content'] = None
+        return ids
+
+    async def intern(
+            self,
+            session: AsyncSession,
+            contents: Iterable[str]
+    ) -> dict[str, int]:
+        """
+        id текстов в словаре; недостающие тексты добавляются.
+        Изменения не фиксируются: commit выполняет вызывающий код,
+        после чего передаёт полученные id в 'remember'.
+        """
+
+        ids: dict[str, int] = {}
+        missing: dict[str, str] = {}
+        for content in set(contents):
+            content_id = self._ids.get(content)
+            if content_id is None:
+                missing[content_hash(content)] = content
+                self.misses += 1
+            else:
+                self._ids.move_to_end(content)
+                ids[content] = content_id
+                self.hits += 1
+        if not missing:
+            return ids
+
+        insert_ = {
+            'postgresql': postgresql.insert,
+            'sqlite': sqlite.insert,
+        }.get(session.bind.dialect.name)
+        found = await self._select(session, missing)
+        new = [
+            {'content_hash': digest, 'content': content}
+            for digest, content in missing.items()
+            if content not in found
+        ]
+        if new and insert_ is not None:
+            await session.execute(
+                insert_(MessageContent)
+                .values(new)
+                .on_conflict_do_nothing(index_elements=['content_hash'])
+            )
+            found.update(await self._select(session, missing))
+        elif new:
+            session.add_all(MessageContent(**fields) for fields in new)
+            await session.flush()
+            found.update(await self._select(session, missing))
+
+        ids.update(found)
+        return ids
+
+    def remember(self, ids: dict[str, int]) -> None:
+        """Кэширование id текстов, зафиксированных в бд."""
+
+        for content, content_id in ids.items():
+            self._ids[content] = content_id
+            self._ids.move_to_end(content)
+        while len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+
+    def clear(self) -> None:
+        self._ids.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._ids),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+    @staticmethod
+    async def _select(
+            session: AsyncSession,
+            missing: dict[str, str]
+    ) -> dict[str, int]:
+        result = await session.execute(
+            select(MessageContent.content_hash, MessageContent.id)
+            .where(MessageContent.content_hash.in_(missing))
+        )
+        return {missing[digest]: content_id for digest, content_id in result}
+
+
+content_dictionary = ContentDictionary()
@@ -0,0 +1,321 @@
+import asyncio
+import datetime
+from contextlib import suppress
+from typing import Iterable
+
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.orm import sessionmaker
+
+from src.db.core import async_session
+from src.db.models import ActCounter
+from src.logs.config import db_logger
+from src.manager.base import BaseManager
+from src.manager.handle_errors import handle_db_errors
+from src.metrics.histogram import stats_lines
+import src.settings as setting
+
+
+class FunnelManager(BaseManager):
+    """
+    Счётчики воронки квеста ('act_counters').
+
+    '/stats' читает готовые числа без подсчёта по 'users'.
+    Строка счётчика выбирается по 'telegram_id % shards'.
+    Внутри unit of work переходы копятся и применяются после commit
+    отдельной короткой транзакцией ('flush_counters'), поэтому строки
+    счётчиков не блокируются на время запросов к Bot API;
+    расхождение после сбоя исправляет 'FunnelReconciler'.
+    """
+
+    ACT_COUNTER_MODEL = ActCounter
+    COUNTER_SHARDS = setting.FUNNEL_COUNTER_SHARDS
+
+    async def move_counter(
+            self,
+            tg_id: int,
+            old_code: str | None,
+            new_code: str | None
+    ) -> None:
+        """
+        Переход пользователя с 'old_code' на 'new_code'
+        (None — пользователь появился или удалён).
+        Изменения не фиксируются: commit выполняет вызывающий метод.
+        """
+
+        await self.move_counters([(tg_id, old_code, new_code)])
+
+    async def move_counters(
+            self,
+            moves: Iterable[tuple[int, str | None, str | None]]
+    ) -> None:
+        """
+        Пачка переходов ('tg_id', 'old_code', 'new_code'),
+        сложенная в один запрос по строкам счётчиков.
+        Изменения не фиксируются: commit выполняет вызывающий метод.
+        """
+
+        deltas: dict[tuple[str, int], list[int]] = {}
+        for tg_id, old_code, new_code in moves:
+            if old_code == new_code:
+                continue
+            shard = int(tg_id) % self.COUNTER_SHARDS
+            if old_code is not None:
+                deltas.setdefault((old_code, shard), [0, 0])[0] -= 1
+            if new_code is not None:
+                delta = deltas.setdefault((new_code, shard), [0, 0])
+                delta[0] += 1
+                delta[1] += 1
+        # Строки блокируются в одном порядке во всех транзакциях.
+        rows = [
+            {
+                'act_code': code,
+                'shard': shard,
+                'players': players,
+                'reached': reached,
+            }
+            for (code, shard), (players, reached) in sorted(deltas.items())
+            if players or reached
+        ]
+        if not rows:
+            return
+
+        counter = self.ACT_COUNTER_MODEL
+        insert_ = self.dialect_insert()
+        if insert_ is None:
+            for row in rows:
+                await self._update_or_insert(
+                    row,
+                    players=counter.players + row['players'],
+                    reached=counter.reached + row['reached'],
+                )
+            return
+
+        stmt = insert_(counter).values(rows)
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=['act_code', 'shard'],
+                set_={
+                    'players': counter.players + stmt.excluded.players,
+                    'reached': counter.reached + stmt.excluded.reached,
+                    'updated_at': datetime.datetime.now(),
+                },
+            )
+        )
+
+    async def flush_counters(
+            self,
+            moves: list[tuple[int, str | None, str | None]]
+    ) -> None:
+        """
+        Применение переходов, накопленных за unit of work,
+        отдельной транзакцией после его commit. Ошибка логируется
+        и учитывается в метриках 'funnel_reconciler', но не
+        пробрасывается: 'act_code' уже зафиксирован, а счётчики
+        исправит следующая сверка.
+        """
+
+        if not moves:
+            return
+        try:
+            await self.move_counters(moves)
+            await self.session.commit()
+        except Exception as e:
+            await self.session.rollback()
+            funnel_reconciler.flush_failed(len(moves))
+            db_logger.exception(
+                f'Счётчики воронки не обновлены ({len(moves)} переходов), '
+                f'будут исправлены сверкой: {e}'
+            )
+
+    async def _update_or_insert(self, row: dict, **values) -> None:
+        """
+        Запись строки счётчика для диалектов без 'ON CONFLICT':
+        'UPDATE' существующей строки значениями 'values',
+        а если строки ('act_code', 'shard') ещё нет — 'INSERT' из 'row'.
+        """
+
+        counter = self.ACT_COUNTER_MODEL
+        result = await self.session.execute(
+            update(counter)
+            .where(
+                counter.act_code == row['act_code'],
+                counter.shard == row['shard']
+            )
+            .values(**values)
+        )
+        if result.rowcount == 0:
+            await self.session.execute(insert(counter).values(**row))
+
+    @handle_db_errors
+    async def get_funnel(self) -> dict[str, tuple[int, int]]:
+        """
+        Счётчики воронки: act_code -> (сейчас пользователей,
+        всего переходов на этот act_code).
+        """
+
+        counter = self.ACT_COUNTER_MODEL
+        result = await self.session.execute(
+            select(
+                counter.act_code,
+                func.sum(counter.players),
+                func.sum(counter.reached),
+            )
+            .group_by(counter.act_code)
+        )
+        return {
+            act_code: (int(players), int(reached))
+            for act_code, players, reached in result
+        }
+
+    @handle_db_errors
+    async def reconcile_counters(self) -> int:
+        """
+        Сверка 'players' с фактическим числом пользователей в 'users'.
+        Возвращает число исправленных строк счётчиков.
+
+        В PostgreSQL на время сверки 'act_counters' блокируется
+        от изменений: переходы, уже изменившие счётчики, успевают
+        зафиксироваться, а остальные применяют свои изменения после сверки.
+        """
+
+        counter = self.ACT_COUNTER_MODEL
+        users = self.USER_PROFILE_MODEL
+        if self.session.bind.dialect.name == 'postgresql':
+            await self.session.execute(
+                text('LOCK TABLE act_counters IN EXCLUSIVE MODE')
+            )
+        shard = users.telegram_id % self.COUNTER_SHARDS
+        actual = {
+            (act_code, int(number)): count
+            for act_code, number, count in await self.session.execute(
+                select(users.act_code, shard, func.count())
+                .group_by(users.act_code, shard)
+            )
+        }
+        result = await self.session.execute(
+            select(
+                counter.act_code,
+                counter.shard,
+                counter.players,
+                counter.reached
+            )
+        )
+        stored = {
+            (act_code, number): (players, reached)
+            for act_code, number, players, reached in result
+        }
+
+        fixed = []
+        for key in sorted(actual.keys() | stored.keys()):
+            players = actual.get(key, 0)
+            stored_players, reached = stored.get(key, (None, 0))
+            if players != stored_players:
+                fixed.append({
+                    'act_code': key[0],
+                    'shard': key[1],
+                    'players': players,
+                    'reached': max(reached, players),
+                })
+        if not fixed:
+            return 0
+
+        insert_ = self.dialect_insert()
+        if insert_ is None:
+            for row in fixed:
+                await self._update_or_insert(
+                    row, players=row['players'], reached=row['reached']
+                )
+        else:
+            stmt = insert_(counter).values(fixed)
+            await self.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=['act_code', 'shard'],
+                    set_={
+                        'players': stmt.excluded.players,
+                        'reached': stmt.excluded.reached,
+                        'updated_at': datetime.datetime.now(),
+                    },
+                )
+            )
+        await self.commit()
+        return len(fixed)
+
+
+class FunnelReconciler:
+    """Периодическая сверка счётчиков воронки в фоне."""
+
+    def __init__(
+            self,
+            session_factory: sessionmaker = async_session,
+            interval: float = setting.FUNNEL_RECONCILE_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.fixed = 0
+        self.failed_flushes = 0
+        self.lost_moves = 0
+
+    async def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def reconcile(self) -> int:
+        async with self.session_factory() as session:
+            fixed = await FunnelManager(session).reconcile_counters()
+        self.runs += 1
+        self.fixed += fixed or 0
+        if fixed:
+            db_logger.warning(
+                f'Сверка счётчиков воронки: исправлено строк: {fixed}'
+            )
+        return fixed
+
+    def flush_failed(self, moves: int) -> None:
+        """
+        Учёт неудачного 'flush_counters': 'moves' переходов
+        не попали в счётчики до следующей сверки.
+        """
+
+        self.failed_flushes += 1
+        self.lost_moves += moves
+
+    def stats(self) -> dict:
+        """Метрики сверки и неудачных применений переходов."""
+
+        return {
+            'runs': self.runs,
+            'fixed': self.fixed,
+            'failed_flushes': self.failed_flushes,
+            'lost_moves': self.lost_moves,
+        }
+
+    def collect(self) -> Iterable[str]:
+        """Метрики в текстовом формате Prometheus."""
+
+        yield from stats_lines(
+            'bot_funnel_counters',
+            self.stats(),
+            ('runs', 'fixed', 'failed_flushes', 'lost_moves')
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                db_logger.exception(f'Ошибка сверки счётчиков воронки: {e}')
+            await asyncio.sleep(self.interval)
+
+
+funnel_reconciler = FunnelReconciler()
@@ -10,6 +10,80 @@ from sqlalchemy.exc import (
 )
 
 from src.logs.config import db_logger
+from src.metrics.sql import current_method
+
+LOGGED_ATTR: str = '_db_logged'
+MAX_ARGS: int = 6
+MAX_REPR: int = 80
+
+
+def summarize(value) -> str:
+    """
+    Короткое описание аргумента: значения простых типов
+    (с ограничением длины), для сообщений — идентификаторы,
+    для остальных объектов — только имя типа.
+    """
+
+    if value is None or isinstance(value, (bool, int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        text = repr(value)
+        return text if len(text) <= MAX_REPR else text[:MAX_REPR] + '...'
+    chat = getattr(value, 'chat', None)
+    if chat is not None and hasattr(value, 'message_id'):
+        return (
+            f'{type(value).__name__}'
+            f'(chat_id={chat.id}, message_id={value.message_id})'
+        )
+    return type(value).__name__
+
+
+def summarize_args(args: tuple, kwargs: dict) -> str:
+    """Ограниченный набор полей аргументов вызова (без 'self')."""
+
+    fields = [summarize(value) for value in args[1:MAX_ARGS + 1]]
+    fields += [
+        f'{key}={summarize(value)}'
+        for key, value in list(kwargs.items())[:MAX_ARGS - len(fields)]
+    ]
+    if len(args) - 1 + len(kwargs) > MAX_ARGS:
+        fields.append('...')
+    return ', '.join(fields)
+
+
+def log_error(
+        error: BaseException,
+        func,
+        args: tuple,
+        kwargs: dict,
+        title: str,
+        level: str = 'ERROR'
+) -> None:
+    """
+    Запись ошибки один раз — в самом глубоком декорированном вызове.
+    Внешние обработчики видят отметку на исключении и не пишут его повторно.
+    Аргументы описываются лениво: только если запись принимает хотя бы один синк.
+    """
+
+    if getattr(error, LOGGED_ATTR, False):
+        return
+    try:
+        setattr(error, LOGGED_ATTR, True)
+    except AttributeError:
+        pass
+
+    (
+        db_logger
+        .opt(lazy=True, exception=level == 'ERROR', depth=2)
+        .log(
+            level,
+            '{} in {}({}): {}',
+            lambda: title,
+            lambda: func.__qualname__,
+            lambda: summarize_args(args, kwargs),
+            lambda: str(error),
+        )
+    )
 
 
 def handle_db_errors(func):
@@ -17,65 +91,75 @@ def handle_db_errors(func):
     Обработка исключений, которые могут возникнуть
     при работе с бд. Декоратор применяется к
     асинхронным функциям.
+    Имя функции на время вызова попадает в 'current_method'
+    для метрик SQL-запросов.
     """
 
+    method = func.__qualname__
+
     @wraps(func)
     async def wrapper(*args, **kwargs):
+        token = current_method.set(method)
         try:
             return await func(*args, **kwargs)
         except StatementError as e:
-            db_logger.exception(
-                f'Передаются некорректные параметры\n'
-                f'StatementError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Передаются некорректные параметры\n'
+                'StatementError'
             )
             raise
         except NoResultFound as e:
-            db_logger.exception(
-                f'NoResultFound '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'NoResultFound'
             )
             raise
         except InvalidRequestError as e:
-            db_logger.exception(
-                f'Запрос выполнен с нарушением '
-                f'логики SQLAlchemy\n'
-                f'InvalidRequestError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Запрос выполнен с нарушением '
+                'логики SQLAlchemy\n'
+                'InvalidRequestError'
             )
             raise
         except SQLAlchemyError as e:
-            db_logger.exception(
-                f'SQLAlchemyError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'SQLAlchemyError'
             )
             raise
         except IntegrityError as e:
-            db_logger.warning(
-                f'IntegrityError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'IntegrityError',
+                level='WARNING'
             )
             raise
         except ValueError as e:
-            db_logger.warning(
-                f'ValueError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'ValueError',
+                level='WARNING'
             )
             raise
         except ConnectionError as e:
-            db_logger.critical(
-                f'Потеря соединения с базой данных '
-                f'или проблемы на стороне сервера,\n'
-                f'ConnectionError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Потеря соединения с базой данных '
+                'или проблемы на стороне сервера,\n'
+                'ConnectionError',
+                level='CRITICAL'
             )
             raise
         except Exception as e:
-            db_logger.exception(
-                f'Неизвестная ошибка '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Неизвестная ошибка'
             )
             raise
+        finally:
+            current_method.reset(token)
 
     return wrapper
 
@@ -92,53 +176,54 @@ def handle_json_errors(func):
         try:
             return await func(*args, **kwargs)
         except FileNotFoundError as e:
-            db_logger.exception(
-                f'Файл по указанному пути не найден или '
-                f'не может быть создан\n'
-                f'FileNotFoundError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Файл по указанному пути не найден или '
+                'не может быть создан\n'
+                'FileNotFoundError'
             )
             raise
         except TypeError as e:
-            db_logger.exception(
-                f'Объект, который не поддерживается JSON\n'
-                f'TypeError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Объект, который не поддерживается JSON\n'
+                'TypeError'
             )
             raise
         except PermissionError as e:
-            db_logger.exception(
-                f'Нет прав доступа для чтения/записи файла\n'
-                f'PermissionError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Нет прав доступа для чтения/записи файла\n'
+                'PermissionError'
             )
             raise
         except UnicodeDecodeError as e:
-            db_logger.exception(
-                f'Файл содержит символы, '
-                f'которые не могут быть декодированы в utf-8\n'
-                f'UnicodeDecodeError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Файл содержит символы, '
+                'которые не могут быть декодированы в utf-8\n'
+                'UnicodeDecodeError'
             )
             raise
         except json.JSONDecodeError as e:
-            db_logger.exception(
-                f'Попытка десериализовать строку, '
-                f'которая не является корректным JSON\n'
-                f'json.JSONDecodeError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Попытка десериализовать строку, '
+                'которая не является корректным JSON\n'
+                'json.JSONDecodeError'
             )
             raise
         except IntegrityError as e:
-            db_logger.warning(
-                f'IntegrityError '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'IntegrityError',
+                level='WARNING'
             )
             raise
         except Exception as e:
-            db_logger.exception(
-                f'Неизвестная ошибка '
-                f'in {func.__name__} {args}, {kwargs}: {str(e)}'
+            log_error(
+                e, func, args, kwargs,
+                'Неизвестная ошибка'
             )
             raise
 
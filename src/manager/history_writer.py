@@ -0,0 +1,253 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import Iterable
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from src.db.core import async_session
+from src.db.models import UsersHistory
+from src.logs.config import db_logger
+from src.manager.content_dictionary import (
+    ContentDictionary,
+    content_dictionary
+)
+from src.metrics.histogram import stats_lines
+from src.metrics.sql import current_method
+import src.settings as setting
+
+
+class HistoryWriter:
+    """
+    Фоновая запись истории сообщений пользователей.
+
+    Хэндлеры кладут записи в ограниченную очередь и сразу возвращаются,
+    а фоновая задача пачками вставляет их в 'users_history'.
+    Пачка сбрасывается при наборе 'batch_size' записей
+    или по истечении 'flush_interval' секунд.
+    Если очередь заполнена, 'put' ждёт освобождения места
+    (backpressure), время ожидания попадает в метрики.
+    Неудачная пачка повторяется 'retries' раз с растущей паузой,
+    затем записи вставляются по одной, и теряются только
+    записи, которые вставить нельзя.
+    При 'dedup=True' короткие тексты пачки заменяются ссылками
+    на 'message_contents' в той же транзакции.
+    """
+
+    def __init__(
+            self,
+            session_factory: sessionmaker,
+            queue_size: int = setting.HISTORY_QUEUE_SIZE,
+            batch_size: int = setting.HISTORY_BATCH_SIZE,
+            flush_interval: float = setting.HISTORY_FLUSH_INTERVAL,
+            dedup: bool = setting.HISTORY_DEDUP_CONTENT,
+            contents: ContentDictionary = content_dictionary,
+            retries: int = setting.HISTORY_FLUSH_RETRIES,
+            retry_backoff: float = setting.HISTORY_RETRY_BACKOFF,
+    ):
+        self.session_factory = session_factory
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.dedup = dedup
+        self.contents = contents
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._batch: list[dict] = []
+        self._flushing: asyncio.Future | None = None
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.retried = 0
+        self.inline = 0
+        self.max_depth = 0
+        self.backpressure_waits = 0
+        self.backpressure_wait_time = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Запуск фоновой задачи сброса истории."""
+
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        db_logger.info('HistoryWriter запущен')
+
+    async def stop(self) -> None:
+        """
+        Остановка фоновой задачи.
+        Гарантированно сбрасывает в бд все записи из очереди.
+        """
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+        if self._flushing is not None:
+            with suppress(Exception):
+                await self._flushing
+            self._flushing = None
+
+        batch, self._batch = self._batch, []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+        db_logger.info(f'HistoryWriter остановлен: {self.stats()}')
+
+    async def put(self, record: dict) -> None:
+        """
+        Постановка записи истории в очередь.
+        Если фоновая задача не запущена или уже остановлена,
+        запись сразу вставляется в бд, чтобы не остаться в очереди,
+        которую никто не сбросит.
+        """
+
+        if not self.is_running:
+            self.inline += 1
+            await self._flush([record])
+            return
+        if self._queue.full():
+            self.backpressure_waits += 1
+            started = time.perf_counter()
+            await self._queue.put(record)
+            self.backpressure_wait_time += time.perf_counter() - started
+        else:
+            self._queue.put_nowait(record)
+        self.enqueued += 1
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def stats(self) -> dict:
+        """Метрики очереди и сброса истории."""
+
+        return {
+            'depth': self._queue.qsize() if self._queue else 0,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'flushed': self.flushed,
+            'failed': self.failed,
+            'batches': self.batches,
+            'retried': self.retried,
+            'inline': self.inline,
+            'backpressure_waits': self.backpressure_waits,
+            'backpressure_wait_time': round(self.backpressure_wait_time, 6),
+        }
+
+    def collect(self) -> Iterable[str]:
+        """Метрики в текстовом формате Prometheus."""
+
+        yield from stats_lines(
+            'bot_history_writer',
+            self.stats(),
+            ('enqueued', 'flushed', 'failed', 'batches', 'retried', 'inline',
+             'backpressure_waits', 'backpressure_wait_time')
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+            while len(self._batch) < self.batch_size:
+                try:
+                    self._batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._batch = self._batch, []
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    async def _flush(self, batch: list[dict]) -> None:
+        token = current_method.set('HistoryWriter._flush')
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    await self._insert(batch)
+                except Exception as e:
+                    if attempt == self.retries:
+                        db_logger.exception(
+                            f'Ошибка пакетной записи истории '
+                            f'({len(batch)} записей), запись по одной: '
+                            f'{str(e)}'
+                        )
+                        break
+                    self.retried += 1
+                    db_logger.warning(
+                        f'Ошибка пакетной записи истории '
+                        f'({len(batch)} записей), повтор: {str(e)}'
+                    )
+                    await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+                else:
+                    self.flushed += len(batch)
+                    self.batches += 1
+                    return
+
+            for record in batch:
+                try:
+                    await self._insert([record])
+                except Exception as e:
+                    self.failed += 1
+                    db_logger.error(
+                        f'Запись истории отброшена '
+                        f'(user_id={record.get("user_id")}, '
+                        f'message_id={record.get("message_id")}): {str(e)}'
+                    )
+                else:
+                    self.flushed += 1
+        finally:
+            current_method.reset(token)
+
+    async def _insert(self, batch: list[dict]) -> None:
+        """
+        Вставка пачки в одной транзакции. Записи копируются,
+        чтобы при повторе вставлялись исходные тексты, а не ссылки
+        на словарь из откатанной транзакции.
+        """
+
+        rows = [dict(record) for record in batch]
+        session: AsyncSession
+        async with self.session_factory() as session:
+            try:
+                ids = {}
+                if self.dedup:
+                    ids = await self.contents.compact(session, rows)
+                await session.execute(insert(UsersHistory), rows)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        self.contents.remember(ids)
+
+
+history_writer = HistoryWriter(async_session)
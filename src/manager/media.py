@@ -0,0 +1,77 @@
+import datetime
+
+from src.db.models import MediaFile
+from src.manager.base import BaseManager
+from src.manager.handle_errors import handle_db_errors
+
+
+class MediaManager(BaseManager):
+    """
+    Управление 'file_id' медиафайлов, уже загруженных в Telegram.
+    Файлы идентифицируются хэшем содержимого.
+    """
+
+    async def get_media(
+            self,
+            content_hash: str,
+            replica: bool = True
+    ) -> MediaFile | None:
+        """
+        Получение медиафайла по хэшу содержимого.
+        'file_id' меняются редко, поэтому по умолчанию чтение идёт в реплику.
+        """
+
+        return await self.get_by_field(
+            self.MEDIA_FILE_MODEL,
+            'content_hash',
+            content_hash,
+            replica=replica
+        )
+
+    @handle_db_errors
+    async def save_media(
+            self,
+            content_hash: str,
+            file_name: str,
+            file_id: str
+    ) -> None:
+        """
+        Сохранение 'file_id' для хэша содержимого.
+        Если запись уже есть, 'file_id' перезаписывается.
+        """
+        self.check_variable(content_hash, file_name, file_id)
+
+        insert_ = self.dialect_insert()
+        if insert_ is None:
+            media = await self.get_media(content_hash, replica=False)
+            if media:
+                media.file_name = file_name
+                media.file_id = file_id
+                await self.commit()
+            else:
+                await self.add_instance(
+                    self.MEDIA_FILE_MODEL,
+                    {
+                        'content_hash': content_hash,
+                        'file_name': file_name,
+                        'file_id': file_id,
+                    }
+                )
+            return
+
+        stmt = insert_(self.MEDIA_FILE_MODEL).values(
+            content_hash=content_hash,
+            file_name=file_name,
+            file_id=file_id,
+        )
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=['content_hash'],
+                set_={
+                    'file_name': stmt.excluded.file_name,
+                    'file_id': stmt.excluded.file_id,
+                    'updated_at': datetime.datetime.now(),
+                },
+            )
+        )
+        await self.commit()
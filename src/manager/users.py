@@ -1,42 +1,236 @@
+import datetime
+
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.models import UsersProfile, UsersHistory
-from src.manager.base import BaseManager
+from src.db.models import MessageContent, UsersProfile, UsersHistory
+from src.db.replica import replica_router
+from src.manager.cache import CachedUser, progress_cache
+from src.manager.content_dictionary import content_dictionary
+from src.manager.funnel import FunnelManager
 from src.manager.handle_errors import handle_db_errors
+from src.manager.history_writer import history_writer
+import src.settings as setting
 
 
-class UserManager(BaseManager):
+class UserManager(FunnelManager):
     """
     Управление действиями, связанными с пользователями в бд:
     добавление, получение информации о пользователе и
     запись истории взаимодействия пользователя с ботом.
+    Изменения 'act_code' отражаются в счётчиках воронки
+    (в unit of work — после commit, см. 'FunnelManager').
     """
 
+    def __init__(self, session: AsyncSession, autocommit: bool = True):
+        super().__init__(session, autocommit)
+        self._pending_history: list[dict] = []
+        self._pending_progress: dict[int, CachedUser | str] = {}
+        self._pending_contents: dict[str, int] = {}
+        self._pending_counters: list[tuple[int, str | None, str | None]] = []
+        self._touched_users: set[int] = set()
+
+    async def after_commit(self) -> None:
+        """
+        Вызывается unit of work после commit:
+        отложенные записи истории передаются в 'history_writer',
+        прогресс пользователей записывается в 'progress_cache',
+        id новых текстов — в кэш 'content_dictionary',
+        а переходы применяются к счётчикам воронки.
+        """
+        progress, self._pending_progress = self._pending_progress, {}
+        for tg_id, value in progress.items():
+            self._apply_progress(tg_id, value)
+        counters, self._pending_counters = self._pending_counters, []
+        await self.flush_counters(counters)
+        contents, self._pending_contents = self._pending_contents, {}
+        content_dictionary.remember(contents)
+        pending, self._pending_history = self._pending_history, []
+        for record in pending:
+            await history_writer.put(record)
+        self._touched_users.clear()
+
+    def after_rollback(self) -> None:
+        """
+        Вызывается unit of work после rollback:
+        отложенная история отбрасывается, а прогресс затронутых
+        пользователей удаляется из 'progress_cache'.
+        """
+        for tg_id in self._touched_users:
+            progress_cache.invalidate(tg_id)
+        self._touched_users.clear()
+        self._pending_history.clear()
+        self._pending_progress.clear()
+        self._pending_contents.clear()
+        self._pending_counters.clear()
+
+    async def _count_move(
+            self,
+            tg_id: int,
+            old_code: str | None,
+            new_code: str | None
+    ) -> None:
+        """
+        Переход для счётчиков воронки: без unit of work — в текущей
+        транзакции, иначе откладывается до 'after_commit'.
+        """
+
+        if self.autocommit:
+            await self.move_counter(tg_id, old_code, new_code)
+        else:
+            self._pending_counters.append((int(tg_id), old_code, new_code))
+
+    def _cache_progress(self, tg_id: int, value: CachedUser | str) -> None:
+        """
+        Запись прогресса в 'progress_cache' (или только 'act_code',
+        если передана строка). Внутри unit of work запись откладывается
+        до commit, чтобы другие апдейты не видели незафиксированный
+        'act_code'.
+        """
+
+        if self.autocommit:
+            self._apply_progress(tg_id, value)
+            return
+        key = int(tg_id)
+        pending = self._pending_progress.get(key)
+        if isinstance(value, str) and isinstance(pending, CachedUser):
+            value = pending._replace(act_code=value)
+        self._pending_progress[key] = value
+
+    @staticmethod
+    def _apply_progress(tg_id: int, value: CachedUser | str) -> None:
+        if isinstance(value, CachedUser):
+            progress_cache.set(tg_id, value)
+        else:
+            progress_cache.update_act_code(tg_id, value)
+
     async def get_user_by_id(
             self,
-            tg_id: int
+            tg_id: int,
+            replica: bool = True
     ) -> UsersProfile | None:
-        """Получение 'user' из бд по 'user_tg_id'."""
+        """
+        Получение 'user' из бд по 'user_tg_id'.
+        При 'replica=True' чтение идёт в реплику, если пользователь
+        недавно не изменял свои данные в этом процессе (см. 'replica_router':
+        read-your-writes соблюдается только в пределах одного процесса).
+        Значение из реплики может отставать, поэтому в 'progress_cache'
+        попадают только чтения из основной бд.
+        """
 
-        return await self.get_by_field(
+        from_replica = replica and replica_router.use_replica(tg_id)
+        user = await self.get_by_field(
             self.USER_PROFILE_MODEL,
             'telegram_id',
-            tg_id
+            tg_id,
+            replica=from_replica
         )
+        if user and not (from_replica and replica_router.enabled):
+            self._cache_progress(tg_id, CachedUser(user.id, user.act_code))
+        return user
+
+    async def get_act_code(
+            self,
+            tg_id: int
+    ) -> str | None:
+        """
+        Получение 'act_code' пользователя.
+        Сначала проверяется 'progress_cache', в бд запрос идёт только при промахе.
+        Изменение, ещё не зафиксированное в текущем unit of work,
+        видно только этому апдейту.
+        """
+
+        pending = self._pending_progress.get(int(tg_id))
+        if pending is not None:
+            return pending if isinstance(pending, str) else pending.act_code
+        cached = progress_cache.get(tg_id)
+        if cached:
+            return cached.act_code
+        user = await self.get_user_by_id(tg_id)
+        return user.act_code if user else None
+
+    @handle_db_errors
+    async def set_act_code(
+            self,
+            tg_id: int,
+            act_code: str
+    ) -> None:
+        """
+        Запись нового 'act_code' пользователя в бд и после commit —
+        в 'progress_cache'.
+        Прежний 'act_code' для счётчиков воронки читается без блокировки,
+        а обновление выполняется только при неизменном прежнем значении;
+        если его успел изменить другой апдейт, чтение повторяется.
+        """
+        self.check_variable(tg_id, act_code)
+
+        users = self.USER_PROFILE_MODEL
+        while True:
+            old_code = (await self.session.execute(
+                select(users.act_code)
+                .where(users.telegram_id == int(tg_id))
+            )).scalar()
+            if old_code is None:
+                return
+            if old_code == act_code:
+                break
+            result = await self.session.execute(
+                update(users)
+                .where(
+                    users.telegram_id == int(tg_id),
+                    users.act_code == old_code
+                )
+                .values(act_code=act_code)
+            )
+            if result.rowcount:
+                await self._count_move(tg_id, old_code, act_code)
+                break
+        await self.commit()
+        self._touched_users.add(int(tg_id))
+        replica_router.mark_write(tg_id)
+        self._cache_progress(tg_id, act_code)
+
+    def invalidate_progress(self, tg_id: int) -> None:
+        """Сброс закэшированного прогресса пользователя."""
+
+        self._pending_progress.pop(int(tg_id), None)
+        progress_cache.invalidate(tg_id)
 
     @handle_db_errors
     async def del_user_by_id(
             self,
             tg_id: int
     ) -> None:
-        """Удаление 'user' из бд по 'user_tg_id'."""
+        """
+        Удаление 'user' из бд по 'user_tg_id'.
+        Как и в 'set_act_code', строка удаляется только
+        при неизменном прочитанном 'act_code'.
+        """
+        self.check_variable(tg_id)
 
-        return await self.delete_instance(
-            self.USER_PROFILE_MODEL,
-            'telegram_id',
-            tg_id
-        )
+        self.invalidate_progress(tg_id)
+        replica_router.mark_write(tg_id)
+        users = self.USER_PROFILE_MODEL
+        while True:
+            old_code = (await self.session.execute(
+                select(users.act_code)
+                .where(users.telegram_id == int(tg_id))
+            )).scalar()
+            if old_code is None:
+                return
+            result = await self.session.execute(
+                delete(users)
+                .where(
+                    users.telegram_id == int(tg_id),
+                    users.act_code == old_code
+                )
+            )
+            if result.rowcount:
+                await self._count_move(tg_id, old_code, None)
+                break
+        await self.commit()
 
     async def is_exist_user(
             self,
@@ -47,7 +241,8 @@ class UserManager(BaseManager):
         return await self.is_exist(
             self.USER_PROFILE_MODEL,
             'telegram_id',
-            tg_id)
+            tg_id,
+            replica=replica_router.use_replica(tg_id))
 
     @handle_db_errors
     async def add_user(
@@ -61,24 +256,78 @@ class UserManager(BaseManager):
         return await self.add_instance(
             self.USER_PROFILE_MODEL,
             {
-                'telegram_id': str(tg_id)
+                'telegram_id': int(tg_id)
             }
         )
 
     @handle_db_errors
-    async def get_or_create_user(self, tg_id):
+    async def get_or_create_user(
+            self,
+            tg_id: int
+    ) -> UsersProfile | None:
         """
         Получает пользователя по его Telegram ID, если такой пользователь существует.
         Если пользователь не найден, создаёт нового пользователя с указанным Telegram ID
         и возвращает его.
+
+        Для PostgreSQL и SQLite выполняется одним атомарным запросом
+        'INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING',
+        что исключает гонку при одновременных сообщениях.
+        Новый пользователь узнаётся по 'created_at' из RETURNING:
+        у существующего он отличается от переданного во вставку.
         """
-        user = await self.get_user_by_id(tg_id)
-        if user:
-            return user
-        else:
-            await self.add_user(tg_id)
-            user = await self.get_user_by_id(tg_id)
-            return user
+        self.check_variable(tg_id)
+
+        dialect = self.session.bind.dialect
+        insert_ = self.dialect_insert()
+
+        if insert_ is None:
+            user = await self.get_user_by_id(tg_id, replica=False)
+            if user:
+                return user
+            user = await self.add_user(tg_id)
+            if user:
+                await self._count_move(tg_id, None, user.act_code)
+                await self.commit()
+            replica_router.mark_write(tg_id)
+            return await self.get_user_by_id(tg_id, replica=False)
+
+        created_at = datetime.datetime.now()
+        stmt = insert_(self.USER_PROFILE_MODEL).values(
+            telegram_id=int(tg_id),
+            act_code=setting.ACT_CODE['default'],
+            created_at=created_at,
+        )
+        if not dialect.insert_returning:
+            result = await self.session.execute(
+                stmt.on_conflict_do_nothing(index_elements=['telegram_id'])
+            )
+            if result.rowcount == 1:
+                await self._count_move(
+                    tg_id, None, setting.ACT_CODE['default']
+                )
+            await self.commit()
+            self._touched_users.add(int(tg_id))
+            replica_router.mark_write(tg_id)
+            return await self.get_user_by_id(tg_id, replica=False)
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['telegram_id'],
+            set_={'telegram_id': stmt.excluded.telegram_id},
+        ).returning(self.USER_PROFILE_MODEL)
+        result = await self.session.execute(
+            select(self.USER_PROFILE_MODEL)
+            .from_statement(stmt)
+            .execution_options(populate_existing=True)
+        )
+        user = result.scalars().one()
+        if user.created_at == created_at:
+            await self._count_move(tg_id, None, user.act_code)
+        await self.commit()
+        self._touched_users.add(int(tg_id))
+        replica_router.mark_write(tg_id)
+        self._cache_progress(tg_id, CachedUser(user.id, user.act_code))
+        return user
 
     @handle_db_errors
     async def write_history(
@@ -89,35 +338,92 @@ class UserManager(BaseManager):
         """
         Запись информации о сообщениях пользователей в бд,
         сохраняя историю взаимодействий с ботом.
-        Проверяет, существует ли пользователь в базе данных,
-        и добавляет его, если его нет.
+        Пользователь берётся из 'progress_cache', а при промахе
+        получается или создаётся одним запросом через 'get_or_create_user'.
+
+        Если запущен 'history_writer', запись ставится в очередь
+        и сбрасывается в бд пачкой в фоне. Внутри unit of work
+        запись попадает в очередь только после commit.
         """
         user_id = message.from_user.id
         chat_id = message.chat.id
         message_id = message.message_id
         message_content = message.text
 
-        if not await self.is_exist_user(user_id):
-            await self.add_user(user_id)
-
         if isinstance(state, FSMContext):
             state = str(await state.get_data())
 
-        user = await self.get_user_by_id(user_id)
+        user = progress_cache.get(user_id)
+        if not user:
+            user = await self.get_or_create_user(user_id)
 
         if not user:
             raise ValueError(
                 'Передано пустое значение в \'user\'.'
             )
 
-        await self.add_instance(
-            self.USER_HISTORY_MODEL,
-            {
-                'user_id': user.id,
-                'chat_id': chat_id,
-                'message_id': message_id,
-                'message_content': message_content,
-                'state': state or '',
-            }
-        )
+        record = {
+            'user_id': user.id,
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'message_content': message_content,
+            'state': state or '',
+            'created_at': datetime.datetime.now(),
+        }
+        if history_writer.is_running and not self.autocommit:
+            self._pending_history.append(record)
+        elif history_writer.is_running:
+            await history_writer.put(record)
+        else:
+            contents = {}
+            if history_writer.dedup:
+                contents = await content_dictionary.compact(
+                    self.session, [record]
+                )
+                for key in ('content_id', 'message_content'):
+                    if record[key] is None:
+                        del record[key]
+            await self.add_instance(self.USER_HISTORY_MODEL, record)
+            if self.autocommit:
+                content_dictionary.remember(contents)
+            else:
+                self._pending_contents.update(contents)
         return None
+
+    @handle_db_errors
+    async def get_history(
+            self,
+            tg_id: int,
+            limit: int = 50
+    ) -> list[dict]:
+        """
+        Последние записи истории пользователя, новые первыми.
+        Текст берётся из строки истории или из 'message_contents',
+        как в представлении 'users_history_full'.
+        """
+        self.check_variable(tg_id, limit)
+
+        history = self.USER_HISTORY_MODEL
+        stmt = (
+            select(
+                history.id,
+                history.chat_id,
+                history.message_id,
+                func.coalesce(
+                    history.message_content,
+                    MessageContent.content
+                ).label('message_content'),
+                history.state,
+                history.created_at,
+            )
+            .join(self.USER_PROFILE_MODEL)
+            .outerjoin(MessageContent, MessageContent.id == history.content_id)
+            .where(self.USER_PROFILE_MODEL.telegram_id == int(tg_id))
+            .order_by(history.created_at.desc(), history.id.desc())
+            .limit(limit)
+        )
+        return await self.execute_read(
+            stmt,
+            lambda result: [dict(row) for row in result.mappings()],
+            replica=replica_router.use_replica(tg_id)
+        )
@@ -0,0 +1,184 @@
+import random
+from bisect import bisect_left
+from typing import Iterable
+
+# Границы бакетов в секундах (как принято в Prometheus).
+BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+QUANTILES: tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными бакетами.
+    Наблюдение — поиск бакета и три сложения, без выделения памяти.
+    """
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> Iterable[tuple[str, int]]:
+        """Накопительные значения бакетов с верхней границей '+Inf'."""
+
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield repr(bound), total
+        yield '+Inf', total + self.counts[-1]
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    """Метки в формате Prometheus с экранированием значений."""
+
+    return ','.join(
+        '{}="{}"'.format(
+            key,
+            str(value)
+            .replace('\\', '\\\\')
+            .replace('"', '\\"')
+            .replace('\n', '\\n')
+        )
+        for key, value in labels.items()
+    )
+
+
+def histogram_lines(
+        name: str,
+        description: str,
+        series: Iterable[tuple[dict[str, str], Histogram]]
+) -> Iterable[str]:
+    """Строки гистограммы в текстовом формате Prometheus."""
+
+    yield f'# HELP {name} {description}'
+    yield f'# TYPE {name} histogram'
+    for labels, histogram in series:
+        label_text = format_labels(labels)
+        prefix = f'{label_text},' if label_text else ''
+        suffix = f'{{{label_text}}}' if label_text else ''
+        for bound, total in histogram.cumulative():
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {total}'
+        yield f'{name}_sum{suffix} {histogram.sum}'
+        yield f'{name}_count{suffix} {histogram.count}'
+
+
+def gauge_lines(
+        name: str,
+        description: str,
+        series: Iterable[tuple[dict[str, str], float]]
+) -> Iterable[str]:
+    """Строки gauge в текстовом формате Prometheus."""
+
+    yield f'# HELP {name} {description}'
+    yield f'# TYPE {name} gauge'
+    for labels, value in series:
+        label_text = format_labels(labels)
+        yield f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}'
+
+
+def counter_lines(
+        name: str,
+        description: str,
+        series: Iterable[tuple[dict[str, str], float]]
+) -> Iterable[str]:
+    """Строки счётчика в текстовом формате Prometheus."""
+
+    yield f'# HELP {name} {description}'
+    yield f'# TYPE {name} counter'
+    for labels, value in series:
+        label_text = format_labels(labels)
+        yield f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}'
+
+
+def stats_lines(
+        prefix: str,
+        stats: dict[str, float],
+        counters: Iterable[str] = ()
+) -> Iterable[str]:
+    """
+    Числовые поля словаря 'stats()' компонента: поля из 'counters'
+    как счётчики ('<prefix>_<поле>_total'), остальные как gauge.
+    """
+
+    counters = set(counters)
+    for field, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        description = f'{prefix} {field.replace("_", " ")}.'
+        if field in counters:
+            yield from counter_lines(
+                f'{prefix}_{field}_total', description, [({}, value)]
+            )
+        else:
+            yield from gauge_lines(
+                f'{prefix}_{field}', description, [({}, value)]
+            )
+
+
+class Reservoir:
+    """
+    Ограниченная равномерная выборка значений (алгоритм R)
+    для оценки перцентилей без хранения всех наблюдений.
+    """
+
+    __slots__ = ('size', 'values', 'seen', 'sum', '_random')
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self.values: list[float] = []
+        self.seen = 0
+        self.sum = 0.0
+        self._random = random.Random()
+
+    def observe(self, value: float) -> None:
+        self.seen += 1
+        self.sum += value
+        if len(self.values) < self.size:
+            self.values.append(value)
+            return
+        position = self._random.randrange(self.seen)
+        if position < self.size:
+            self.values[position] = value
+
+    def percentiles(
+            self,
+            quantiles: tuple[float, ...] = QUANTILES
+    ) -> dict[float, float]:
+        if not self.values:
+            return {quantile: 0.0 for quantile in quantiles}
+        ordered = sorted(self.values)
+        last = len(ordered) - 1
+        return {
+            quantile: ordered[min(last, int(quantile * len(ordered)))]
+            for quantile in quantiles
+        }
+
+
+def summary_lines(
+        name: str,
+        description: str,
+        series: Iterable[tuple[dict[str, str], Reservoir]]
+) -> Iterable[str]:
+    """Строки summary в текстовом формате Prometheus."""
+
+    yield f'# HELP {name} {description}'
+    yield f'# TYPE {name} summary'
+    for labels, reservoir in series:
+        label_text = format_labels(labels)
+        prefix = f'{label_text},' if label_text else ''
+        suffix = f'{{{label_text}}}' if label_text else ''
+        for quantile, value in reservoir.percentiles().items():
+            yield f'{name}{{{prefix}quantile="{quantile}"}} {value}'
+        yield f'{name}_sum{suffix} {reservoir.sum}'
+        yield f'{name}_count{suffix} {reservoir.seen}'
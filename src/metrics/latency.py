@@ -0,0 +1,130 @@
+import time
+from contextvars import ContextVar
+from typing import Iterable
+
+from src.logs.config import bot_logger
+from src.metrics.histogram import Reservoir, summary_lines
+import src.settings as setting
+
+PARTS: tuple[str, ...] = ('total', 'db', 'api', 'own')
+
+
+class HandlerTiming:
+    """Время одного хэндлера внутри апдейта."""
+
+    __slots__ = ('name', 'scene', 'total', 'db', 'api')
+
+    def __init__(self, name: str, scene: str):
+        self.name = name
+        self.scene = scene
+        self.total = 0.0
+        self.db = 0.0
+        self.api = 0.0
+
+
+class UpdateTiming:
+    """
+    Накопитель времени одного апдейта.
+    Время бд добавляют события движка, время Bot API — middleware сессии бота.
+    """
+
+    __slots__ = ('event_type', 'update_id', 'started', 'db', 'api', 'handlers')
+
+    def __init__(self, event_type: str, update_id: int):
+        self.event_type = event_type
+        self.update_id = update_id
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.api = 0.0
+        self.handlers: list[HandlerTiming] = []
+
+
+current_timing: ContextVar[UpdateTiming | None] = ContextVar(
+    'current_timing',
+    default=None
+)
+
+
+class LatencyStats:
+    """
+    Перцентили времени апдейтов, хэндлеров и сцен
+    с разбивкой на бд, Bot API и собственное время.
+    """
+
+    def __init__(
+            self,
+            reservoir_size: int = setting.LATENCY_RESERVOIR_SIZE,
+            slow_threshold: float = setting.SLOW_UPDATE_THRESHOLD,
+    ):
+        self.reservoir_size = reservoir_size
+        self.slow_threshold = slow_threshold
+        self._series: dict[tuple[str, str, str], Reservoir] = {}
+        self.slow_updates = 0
+
+    def observe(
+            self,
+            kind: str,
+            name: str,
+            total: float,
+            db: float,
+            api: float
+    ) -> None:
+        own = max(total - db - api, 0.0)
+        for part, value in zip(PARTS, (total, db, api, own)):
+            key = (kind, name, part)
+            reservoir = self._series.get(key)
+            if reservoir is None:
+                reservoir = Reservoir(self.reservoir_size)
+                self._series[key] = reservoir
+            reservoir.observe(value)
+
+    def observe_handler(self, timing: HandlerTiming) -> None:
+        self.observe('handler', timing.name, timing.total, timing.db, timing.api)
+        self.observe('scene', timing.scene, timing.total, timing.db, timing.api)
+
+    def observe_update(self, timing: UpdateTiming) -> None:
+        total = time.perf_counter() - timing.started
+        self.observe('update', timing.event_type, total, timing.db, timing.api)
+        if self.slow_threshold and total >= self.slow_threshold:
+            self.slow_updates += 1
+            bot_logger.warning(self._slow_message(timing, total))
+
+    def stats(self) -> dict:
+        """Перцентили по всем сериям: {(вид, имя, часть): {квантиль: с}}."""
+
+        return {
+            key: reservoir.percentiles()
+            for key, reservoir in list(self._series.items())
+        }
+
+    def collect(self) -> Iterable[str]:
+        """Метрики в текстовом формате Prometheus."""
+
+        yield from summary_lines(
+            'bot_latency_seconds',
+            'Update, handler and scene latency split into db, api and own time.',
+            (
+                ({'kind': kind, 'name': name, 'part': part}, reservoir)
+                for (kind, name, part), reservoir
+                in list(self._series.items())
+            )
+        )
+        yield '# TYPE bot_slow_updates_total counter'
+        yield f'bot_slow_updates_total {self.slow_updates}'
+
+    @staticmethod
+    def _slow_message(timing: UpdateTiming, total: float) -> str:
+        handlers = '; '.join(
+            f'{handler.name} [{handler.scene}] {handler.total:.3f} c '
+            f'(бд {handler.db:.3f} c, api {handler.api:.3f} c)'
+            for handler in timing.handlers
+        ) or 'нет'
+        return (
+            f'Медленный апдейт {timing.update_id} ({timing.event_type}): '
+            f'{total:.3f} c, бд {timing.db:.3f} c, api {timing.api:.3f} c, '
+            f'собственное {max(total - timing.db - timing.api, 0.0):.3f} c; '
+            f'хэндлеры: {handlers}'
+        )
+
+
+latency_stats = LatencyStats()
@@ -0,0 +1,54 @@
+from typing import Callable, Iterable
+
+from aiohttp import web
+
+from src.logs.config import bot_logger
+import src.settings as setting
+
+Collector = Callable[[], Iterable[str]]
+
+CONTENT_TYPE: str = 'text/plain; version=0.0.4; charset=utf-8'
+
+_collectors: list[Collector] = []
+
+
+def register_collector(collector: Collector) -> None:
+    """Регистрация источника метрик для '/metrics'."""
+
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def render() -> str:
+    """Все зарегистрированные метрики в текстовом формате Prometheus."""
+
+    lines = []
+    for collector in _collectors:
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=render().encode(),
+        headers={'Content-Type': CONTENT_TYPE}
+    )
+
+
+async def start_metrics_server(
+        host: str = setting.METRICS_HOST,
+        port: int = setting.METRICS_PORT
+) -> web.AppRunner | None:
+    """
+    Запуск HTTP-сервера метрик. При 'METRICS_PORT=0' сервер не запускается.
+    """
+
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    bot_logger.info(f'Метрики доступны на http://{host}:{port}/metrics')
+    return runner
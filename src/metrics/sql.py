@@ -0,0 +1,199 @@
+import re
+import time
+from contextvars import ContextVar
+from typing import Iterable
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.metrics.histogram import (
+    Histogram,
+    counter_lines,
+    gauge_lines,
+    histogram_lines
+)
+from src.metrics.latency import current_timing
+
+# Метод менеджера, выполняющий запрос (выставляется в '@handle_db_errors').
+current_method: ContextVar[str | None] = ContextVar(
+    'current_method',
+    default=None
+)
+
+LABEL_CACHE_SIZE: int = 2048
+STARTED_ATTR: str = '_metrics_started'
+
+_OPERATION = re.compile(r'\s*(\w+)(?:\s+"?(\w+))?')
+_TABLE = re.compile(r'\b(?:FROM|INTO)\s+"?(\w+)', re.IGNORECASE)
+
+
+def statement_label(statement: str) -> str:
+    """
+    Нормализованное имя запроса: операция и основная таблица,
+    например 'SELECT users'. Число меток ограничено схемой бд,
+    а не текстом запросов.
+    """
+
+    match = _OPERATION.match(statement)
+    if match is None:
+        return 'OTHER'
+    operation = match.group(1).upper()
+    if operation == 'UPDATE':
+        table = match.group(2)
+    else:
+        found = _TABLE.search(statement)
+        table = found.group(1) if found else None
+    return f'{operation} {table}' if table else operation
+
+
+class SqlMetrics:
+    """
+    Гистограммы времени SQL-запросов по паре (метод менеджера, запрос)
+    и времени ожидания соединения из пула.
+
+    Метки запросов кэшируются по тексту: SQLAlchemy переиспользует
+    одни и те же строки скомпилированных запросов.
+    """
+
+    def __init__(self):
+        self._engines: dict[str, AsyncEngine] = {}
+        self._roles: dict[Engine, str] = {}
+        self._labels: dict[str, str] = {}
+        self._queries: dict[tuple[str, str, str], Histogram] = {}
+        self._errors: dict[tuple[str, str, str], int] = {}
+        self.checkout = Histogram()
+
+    def instrument(self, engine: AsyncEngine, role: str = 'primary') -> None:
+        """
+        Подписка на события выполнения запросов движка.
+        'role' ('primary', 'replica') попадает в метки метрик.
+        """
+
+        self._engines[role] = engine
+        sync_engine = engine.sync_engine
+        self._roles[sync_engine] = role
+        event.listen(sync_engine, 'before_cursor_execute', self._before)
+        event.listen(sync_engine, 'after_cursor_execute', self._after)
+        event.listen(sync_engine, 'handle_error', self._error)
+
+    def observe_checkout(self, seconds: float) -> None:
+        self.checkout.observe(seconds)
+
+    def collect(self) -> Iterable[str]:
+        """Метрики в текстовом формате Prometheus."""
+
+        yield from histogram_lines(
+            'bot_sql_query_duration_seconds',
+            'SQL statement latency by manager method and statement.',
+            (
+                ({'role': role, 'method': method, 'statement': label}, histogram)
+                for (role, method, label), histogram
+                in list(self._queries.items())
+            )
+        )
+        yield from counter_lines(
+            'bot_sql_query_errors_total',
+            'Failed SQL statements by manager method and statement.',
+            (
+                ({'role': role, 'method': method, 'statement': label}, count)
+                for (role, method, label), count in list(self._errors.items())
+            )
+        )
+        yield from histogram_lines(
+            'bot_sql_pool_checkout_seconds',
+            'Time spent waiting for a pooled connection.',
+            [({}, self.checkout)]
+        )
+        pools = {
+            role: engine.pool.stats()
+            for role, engine in self._engines.items()
+            if isinstance(engine.pool, InstrumentedQueuePool)
+        }
+        if pools:
+            for name in next(iter(pools.values())):
+                yield from gauge_lines(
+                    f'bot_sql_pool_{name}',
+                    f'Connection pool {name.replace("_", " ")}.',
+                    (({'role': role}, stats[name]) for role, stats in pools.items())
+                )
+
+    def _key(self, conn, statement: str) -> tuple[str, str, str]:
+        label = self._labels.get(statement)
+        if label is None:
+            label = statement_label(statement)
+            if len(self._labels) < LABEL_CACHE_SIZE:
+                self._labels[statement] = label
+        return (
+            self._roles.get(getattr(conn, 'engine', None), '-'),
+            current_method.get() or '-',
+            label
+        )
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            setattr(context, STARTED_ATTR, time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, STARTED_ATTR, None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        timing = current_timing.get()
+        if timing is not None:
+            timing.db += elapsed
+        key = self._key(conn, statement)
+        histogram = self._queries.get(key)
+        if histogram is None:
+            histogram = self._queries[key] = Histogram()
+        histogram.observe(elapsed)
+
+    def _error(self, exception_context) -> None:
+        statement = exception_context.statement
+        if statement is None:
+            return
+        key = self._key(exception_context.connection, statement)
+        self._errors[key] = self._errors.get(key, 0) + 1
+
+
+sql_metrics = SqlMetrics()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, измеряющий время выдачи соединения
+    и число ожидающих соединения запросов.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiters = 0
+        self.max_waiters = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        self.waiters += 1
+        self.max_waiters = max(self.max_waiters, self.waiters)
+        try:
+            return super().connect()
+        finally:
+            self.waiters -= 1
+            sql_metrics.observe_checkout(time.perf_counter() - started)
+
+    def recreate(self) -> 'InstrumentedQueuePool':
+        pool = super().recreate()
+        pool.max_waiters = self.max_waiters
+        return pool
+
+    def stats(self) -> dict:
+        """Текущее состояние пула."""
+
+        return {
+            'size': self.size(),
+            'checked_out': self.checkedout(),
+            'checked_in': self.checkedin(),
+            'overflow': max(self.overflow(), 0),
+            'waiters': self.waiters,
+            'max_waiters': self.max_waiters,
+        }
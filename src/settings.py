@@ -10,6 +10,33 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 TELEGRAM_TOKEN: Optional[str] = os.getenv('TELEGRAM_TOKEN')
 
+BOT_MODE: str = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL: Optional[str] = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH: str = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_HOST: str = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT: int = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_SECRET: Optional[str] = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_MAX_IN_FLIGHT: int = int(os.getenv('WEBHOOK_MAX_IN_FLIGHT', 100))
+# Одновременных HTTPS-соединений Telegram к вебхуку (1–100).
+WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+# Retry-After ответа 503, когда заняты все WEBHOOK_MAX_IN_FLIGHT мест.
+WEBHOOK_RETRY_AFTER: int = int(os.getenv('WEBHOOK_RETRY_AFTER', 1))
+
+FSM_STORAGE: str = os.getenv('FSM_STORAGE', 'memory')
+FSM_CACHE_SIZE: int = int(os.getenv('FSM_CACHE_SIZE', 10000))
+FSM_CACHE_TTL: float = float(os.getenv('FSM_CACHE_TTL', 5))
+
+RATE_LIMIT_GLOBAL: float = float(os.getenv('RATE_LIMIT_GLOBAL', 30))
+RATE_LIMIT_GLOBAL_BURST: int = int(os.getenv('RATE_LIMIT_GLOBAL_BURST', 30))
+RATE_LIMIT_CHAT: float = float(os.getenv('RATE_LIMIT_CHAT', 1))
+RATE_LIMIT_CHAT_BURST: int = int(os.getenv('RATE_LIMIT_CHAT_BURST', 3))
+RATE_LIMIT_MAX_RETRIES: int = int(os.getenv('RATE_LIMIT_MAX_RETRIES', 3))
+
+FUZZY_THRESHOLD: int = int(os.getenv('FUZZY_THRESHOLD', 80))
+FUZZY_MIN_LENGTH: int = int(os.getenv('FUZZY_MIN_LENGTH', 4))
+
+MEDIA_DIR: Path = BASE_DIR / 'src' / 'bot' / 'media'
+
 DATABASES = {
     'APP': {
         'NAME': os.getenv('DB_NAME'),
@@ -18,9 +45,126 @@ DATABASES = {
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
         'URL': os.getenv('DATABASE_URL')
-    }
+    },
+    # Реплика для чтения (необязательно).
+    'REPLICA': {
+        'URL': os.getenv('DATABASE_REPLICA_URL')
+    },
+}
+# Сколько секунд после изменения данных пользователя его чтения идут
+# в основную бд (read-your-writes при задержке репликации).
+REPLICA_STICKY_SECONDS: float = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+LOG_MODE: str = os.getenv('LOG_MODE', 'debug')
+LOG_LEVEL: str = os.getenv(
+    'LOG_LEVEL',
+    'DEBUG' if LOG_MODE == 'debug' else 'INFO'
+)
+# Уровни отдельных стандартных логгеров: 'aiogram.event=WARNING,aiohttp=ERROR'.
+LOG_CATEGORY_LEVELS: dict[str, str] = dict(
+    item.strip().split('=', 1)
+    for item in os.getenv(
+        'LOG_CATEGORY_LEVELS',
+        '' if LOG_MODE == 'debug' else 'aiogram.event=WARNING'
+    ).split(',')
+    if '=' in item
+)
+SQL_ECHO_SAMPLE_RATE: float = float(
+    os.getenv('SQL_ECHO_SAMPLE_RATE', 1.0 if LOG_MODE == 'debug' else 0.0)
+)
+
+METRICS_HOST: str = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT: int = int(os.getenv('METRICS_PORT', 0))
+LATENCY_RESERVOIR_SIZE: int = int(os.getenv('LATENCY_RESERVOIR_SIZE', 1024))
+SLOW_UPDATE_THRESHOLD: float = float(os.getenv('SLOW_UPDATE_THRESHOLD', 1.0))
+
+DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE: int = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING: bool = (
+    os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+)
+DB_POOL_WARMUP: int = int(os.getenv('DB_POOL_WARMUP', DB_POOL_SIZE))
+# Кэш подготовленных запросов asyncpg на соединение (0 — отключить).
+DB_STATEMENT_CACHE_SIZE: int = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+# statement_timeout PostgreSQL в миллисекундах (0 — без ограничения).
+DB_STATEMENT_TIMEOUT: int = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+
+HISTORY_QUEUE_SIZE: int = int(os.getenv('HISTORY_QUEUE_SIZE', 10000))
+HISTORY_BATCH_SIZE: int = int(os.getenv('HISTORY_BATCH_SIZE', 500))
+HISTORY_FLUSH_INTERVAL: float = float(
+    os.getenv('HISTORY_FLUSH_INTERVAL', 1.0)
+)
+# Повторы неудачной пачки истории и начальная пауза между ними,
+# секунды (удваивается с каждым повтором).
+HISTORY_FLUSH_RETRIES: int = int(os.getenv('HISTORY_FLUSH_RETRIES', 3))
+HISTORY_RETRY_BACKOFF: float = float(
+    os.getenv('HISTORY_RETRY_BACKOFF', 0.5)
+)
+# Тексты истории длиной до HISTORY_DEDUP_MAX_LENGTH хранятся один раз
+# в 'message_contents', а строка истории ссылается на них по 'content_id'.
+HISTORY_DEDUP_CONTENT: bool = (
+    os.getenv('HISTORY_DEDUP_CONTENT', 'false').lower() in ('1', 'true', 'yes')
+)
+HISTORY_DEDUP_MAX_LENGTH: int = int(os.getenv('HISTORY_DEDUP_MAX_LENGTH', 64))
+HISTORY_CONTENT_CACHE_SIZE: int = int(
+    os.getenv('HISTORY_CONTENT_CACHE_SIZE', 10000)
+)
+# Помесячные секции 'users_history' (PostgreSQL) создаются
+# на HISTORY_PARTITIONS_AHEAD месяцев вперёд.
+HISTORY_PARTITIONS_AHEAD: int = int(os.getenv('HISTORY_PARTITIONS_AHEAD', 2))
+# История старше HISTORY_RETENTION_MONTHS полных месяцев выгружается
+# в архив и удаляется из бд (0 — не архивировать).
+HISTORY_RETENTION_MONTHS: int = int(os.getenv('HISTORY_RETENTION_MONTHS', 0))
+HISTORY_ARCHIVE_DIR: Path = Path(
+    os.getenv('HISTORY_ARCHIVE_DIR', BASE_DIR / 'archive' / 'history')
+)
+# Период проверки секций и архивации, секунды.
+HISTORY_ARCHIVE_INTERVAL: float = float(
+    os.getenv('HISTORY_ARCHIVE_INTERVAL', 6 * 60 * 60)
+)
+
+# Число строк на счётчик воронки и период сверки счётчиков
+# с таблицей 'users', секунды (0 — не сверять).
+FUNNEL_COUNTER_SHARDS: int = int(os.getenv('FUNNEL_COUNTER_SHARDS', 8))
+FUNNEL_RECONCILE_INTERVAL: float = float(
+    os.getenv('FUNNEL_RECONCILE_INTERVAL', 60 * 60)
+)
+
+# Рассылка: пользователей на страницу (после каждой страницы
+# сохраняется контрольная точка), одновременных отправок и сообщений
+# в секунду. Скорость ниже RATE_LIMIT_GLOBAL оставляет запас
+# для ответов игрокам.
+BROADCAST_PAGE_SIZE: int = int(os.getenv('BROADCAST_PAGE_SIZE', 200))
+BROADCAST_CONCURRENCY: int = int(os.getenv('BROADCAST_CONCURRENCY', 20))
+BROADCAST_RATE: float = float(os.getenv('BROADCAST_RATE', 20))
+# Пауза перед повтором после ошибки бд во время рассылки, секунды:
+# удваивается с каждой ошибкой подряд до BROADCAST_RETRY_MAX.
+BROADCAST_RETRY_BACKOFF: float = float(
+    os.getenv('BROADCAST_RETRY_BACKOFF', 1)
+)
+BROADCAST_RETRY_MAX: float = float(os.getenv('BROADCAST_RETRY_MAX', 60))
+# Аренда рассылки процессом бота, секунды: продлевается после каждой
+# страницы, поэтому должна быть заметно больше времени отправки страницы
+# (BROADCAST_PAGE_SIZE / BROADCAST_RATE). Рассылку остановленного
+# процесса продолжает другой после истечения аренды.
+BROADCAST_LEASE: float = float(os.getenv('BROADCAST_LEASE', 120))
+
+# Telegram ID администраторов через запятую: доступ к '/stats'
+# и '/broadcast'.
+ADMIN_IDS: set[int] = {
+    int(value) for value in os.getenv('ADMIN_IDS', '').split(',')
+    if value.strip()
 }
 
+PROGRESS_CACHE_SIZE: int = int(os.getenv('PROGRESS_CACHE_SIZE', 10000))
+# Кэш 'act_code' у каждого процесса свой. С FSM_STORAGE=sql бот может
+# работать в нескольких экземплярах, поэтому TTL по умолчанию — секунды.
+PROGRESS_CACHE_TTL: float = float(os.getenv(
+    'PROGRESS_CACHE_TTL', 300 if FSM_STORAGE == 'memory' else 5
+))
+
 ACT_CODE = {
     'default': '000',
     '1': '100',